@@ -3,7 +3,8 @@ import shutil
 from pathlib import Path
 from parsers import CitiParser, CTBCParser, MegaParser, FubonParser, SinopacParser, ESunParser, BankParserBase
 from fuzzy_matcher import match_entries_interactive, match_entries_debug
-from utils import log_skipped
+from utils import log_skipped, log_decisions
+from recurrence_index import RecurrenceIndex
 
 PARSER_REGISTRY = {
     "花旗": CitiParser,
@@ -24,6 +25,7 @@ def make_parser(path: Path) -> BankParserBase:
 
 
 import argparse
+import sys
 import pandas as pd
 import openpyxl
 from datetime import datetime
@@ -78,6 +80,11 @@ def parse_args():
         action="store_true",
         help="Start a new versioned file for this date instead of appending to the latest one."
     )
+    p.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not use earlier voucher outputs to resolve blank/garbled descriptions."
+    )
     return p.parse_args()
 
 def detect_bank(stem, bank_map):
@@ -391,6 +398,13 @@ def main():
     print(f"[ARGS] file={args.file} date={args.date or datetime.today().strftime('%Y%m%d')} new_run={args.new_run}")
 
     post_date = args.date or datetime.today().strftime("%Y%m%d")
+    try:
+        if not (len(post_date) == 8 and post_date.isdigit()):
+            raise ValueError
+        post_day = datetime.strptime(post_date, "%Y%m%d").day
+    except ValueError:
+        print(f"[ERROR] --date must be a valid date as YYYYMMDD (e.g. 20250715), got {post_date!r}", file=sys.stderr)
+        sys.exit(2)
 
     bank_path = Path(args.file).expanduser()
     parser    = make_parser(bank_path)
@@ -406,9 +420,22 @@ def main():
 
     # # 4) Match
     # matches = match_entries_debug(entries, db, FUZZY_THRESHOLD)
-    matches, skipped = match_entries_interactive(entries, db, FUZZY_THRESHOLD)
+    # Recurring fixed-amount payers from earlier outputs (blank/garbled descriptions)
+    history = None if args.no_history else RecurrenceIndex.from_ledgers(
+        BASE_DIR, exclude=enumerate_existing_outputs(post_date)
+    )
+    sources = []
+    matches, skipped = match_entries_interactive(
+        entries, db, FUZZY_THRESHOLD, history=history, post_day=post_day, sources=sources
+    )
+    if history is not None:
+        for (_, amt, db_row), source in zip(matches, sources):
+            if source == "history":
+                history.record_auto(post_date, db_row["F"], amt)
     if skipped:
         log_skipped(skipped, filepath="skipped.csv")
+    if matches:
+        log_decisions(matches, bank_display, sources, filepath="decisions.csv")
 
     print(f"DEBUG  → matches found: {len(matches)}")
 
@@ -0,0 +1,196 @@
+"""
+Offline evaluation of the keyword / fuzzy matcher against labeled history.
+
+Replays labeled bank rows (raw_text → confirmed customer ID, e.g. the
+decisions.csv written by bank.py) through the same exact-substring +
+fuzzy fallback used in fuzzy_matcher.py and reports, for every scorer and
+threshold, what would have been auto-accepted, how often it was right and
+how many rows would still need a prompt.
+
+Only rows an operator resolved count as labels: in decisions.csv those with
+source fuzzy (suggestion accepted) or manual (ID typed in). Exact and
+history matches were made by the matcher itself; scoring it against them
+would only measure agreement with its own output.
+
+    python evaluate_matcher.py --labels decisions.csv
+    python evaluate_matcher.py --labels decisions.csv --scorers partial_ratio,WRatio --thresholds 70:100:5
+"""
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from rapidfuzz import process, fuzz
+
+from bank import BANK_MAP, DB_FILE, DB_SHEET, FUZZY_THRESHOLD, load_and_filter_db
+
+# decisions.csv sources an operator confirmed (see fuzzy_matcher.match_entries_interactive)
+CONFIRMED_SOURCES = ("fuzzy", "manual")
+
+SCORERS = {
+    "partial_ratio":           fuzz.partial_ratio,
+    "ratio":                   fuzz.ratio,
+    "token_set_ratio":         fuzz.token_set_ratio,
+    "partial_token_set_ratio": fuzz.partial_token_set_ratio,
+    "WRatio":                  fuzz.WRatio,
+}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Grid-evaluate fuzzy matcher thresholds/scorers on labeled history.")
+    p.add_argument("--labels", "-l", required=True,
+                   help="CSV with columns raw_text, cust_id and bank (bank key like 中信, or display name)")
+    p.add_argument("--db", default=str(DB_FILE), help="Customer DB (.xls) to match against")
+    p.add_argument("--sources", default=",".join(CONFIRMED_SOURCES),
+                   help="Comma-separated decision sources used as labels when the CSV has a source column "
+                        f"(default: {','.join(CONFIRMED_SOURCES)}; 'all' keeps every row)")
+    p.add_argument("--scorers", default=",".join(SCORERS),
+                   help=f"Comma-separated scorers (default: all of {', '.join(SCORERS)})")
+    p.add_argument("--thresholds", default="60:100:5",
+                   help="start:stop:step (inclusive) or comma-separated list. Default: 60:100:5")
+    p.add_argument("--out", help="Optional CSV path for the result grid")
+    return p.parse_args()
+
+def parse_thresholds(spec: str) -> list[float]:
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        return list(np.arange(start, stop + step / 2, step))
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+def _norm_id(x) -> str:
+    s = str(x).strip()
+    return s[:-2] if s.endswith(".0") else s
+
+def load_labels(path: Path, sources=CONFIRMED_SOURCES) -> pd.DataFrame:
+    """
+    Labeled rows of `path`. With a source column (decisions.csv), only rows
+    whose source is in `sources` are kept (None keeps all); files without one
+    are taken as hand-made labels.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    missing = [c for c in ("raw_text", "cust_id", "bank") if c not in df.columns]
+    if missing:
+        raise ValueError(f"{path.name} is missing column(s): {', '.join(missing)}")
+    if sources is not None and "source" in df.columns:
+        df = df[df["source"].isin(sources)].reset_index(drop=True)
+    df["key_clean"] = df["raw_text"].str.replace(" ", "", regex=False)
+    df["cust_id"] = df["cust_id"].map(_norm_id)
+    # Accept either the short key (中信) or the BANK_MAP display text
+    df["bank_display"] = df["bank"].map(lambda b: BANK_MAP.get(b, b))
+    return df
+
+
+def exact_hits(queries: list[str], db: pd.DataFrame) -> np.ndarray:
+    """
+    Index (into db) of the first keyword contained in each query, -1 if none —
+    same rule as the exact-substring step of match_entries_interactive.
+    """
+    kws = [str(k).replace(" ", "") for k in db["E"]]
+    out = np.full(len(queries), -1, dtype=np.int64)
+    for i, q in enumerate(queries):
+        for j, k in enumerate(kws):
+            if q.find(k) >= 0:
+                out[i] = j
+                break
+    return out
+
+
+def evaluate_bank(labels: pd.DataFrame, db: pd.DataFrame, scorers: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    One cdist pass per scorer → per-row (predicted cust_id, best score, exact flag).
+    """
+    queries  = labels["key_clean"].tolist()
+    keywords = db["E"].astype(str).str.strip().tolist()
+    db_ids   = db["F"].map(_norm_id).to_numpy()
+
+    t0 = time.perf_counter()
+    exact = exact_hits(queries, db)
+    exact_secs = time.perf_counter() - t0
+
+    per_scorer = {}
+    for name in scorers:
+        t0 = time.perf_counter()
+        scores = process.cdist(queries, keywords, scorer=SCORERS[name], workers=-1)
+        secs = exact_secs + time.perf_counter() - t0
+
+        best = scores.argmax(axis=1)
+        best_score = scores[np.arange(len(queries)), best].astype(float)
+        pred_idx = np.where(exact >= 0, exact, best)
+        per_scorer[name] = pd.DataFrame({
+            "exact": exact >= 0,
+            "score": np.where(exact >= 0, 100.0, best_score),
+            "correct": db_ids[pred_idx] == labels["cust_id"].to_numpy(),
+        }).assign(_secs=secs)
+    return per_scorer
+
+
+def summarize(rows: pd.DataFrame, threshold: float, secs: float) -> dict:
+    n = len(rows)
+    auto = rows["exact"] | (rows["score"] >= threshold)
+    auto_ok = auto & rows["correct"]
+    n_auto = int(auto.sum())
+    return {
+        "threshold": threshold,
+        "rows": n,
+        "auto_accepted": n_auto,
+        "misposted": int(n_auto - auto_ok.sum()),
+        "precision": float(auto_ok.sum() / n_auto) if n_auto else float("nan"),
+        "recall": float(auto_ok.sum() / n) if n else float("nan"),
+        "prompt_rate": float(1 - n_auto / n) if n else float("nan"),
+        "rows_per_sec": float(n / secs) if secs else float("inf"),
+    }
+
+
+def main():
+    args = parse_args()
+    scorers = [s.strip() for s in args.scorers.split(",") if s.strip()]
+    unknown = [s for s in scorers if s not in SCORERS]
+    if unknown:
+        raise SystemExit(f"Unknown scorer(s): {', '.join(unknown)}. Choose from {', '.join(SCORERS)}")
+    thresholds = parse_thresholds(args.thresholds)
+
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    labels = load_labels(Path(args.labels), None if "all" in sources else sources)
+    print(f"Loaded {len(labels)} labeled rows from {args.labels}")
+
+    # Score each bank against its own filtered DB, like bank.py does
+    by_scorer = {s: [] for s in scorers}
+    secs = {s: 0.0 for s in scorers}
+    for bank_display, grp in labels.groupby("bank_display"):
+        db = load_and_filter_db(Path(args.db), DB_SHEET, bank_display)
+        if db.empty:
+            print(f"[WARN] No DB rows for '{bank_display}'; {len(grp)} labeled rows skipped.")
+            continue
+        for name, res in evaluate_bank(grp, db, scorers).items():
+            secs[name] += float(res.pop("_secs").iloc[0])
+            by_scorer[name].append(res)
+
+    records = []
+    for name in scorers:
+        if not by_scorer[name]:
+            continue
+        rows = pd.concat(by_scorer[name], ignore_index=True)
+        for thr in thresholds:
+            records.append({"scorer": name, **summarize(rows, thr, secs[name])})
+
+    result = pd.DataFrame(records)
+    if result.empty:
+        print("Nothing to evaluate.")
+        return
+    with pd.option_context("display.max_rows", None, "display.width", 160,
+                           "display.float_format", "{:.3f}".format):
+        print(result.to_string(index=False))
+
+    current = result[(result["scorer"] == "partial_ratio") & (result["threshold"] == FUZZY_THRESHOLD)]
+    if not current.empty:
+        c = current.iloc[0]
+        print(f"\nCurrent setting (partial_ratio @ {FUZZY_THRESHOLD}): "
+              f"precision {c['precision']:.3f}, prompt rate {c['prompt_rate']:.3f}")
+
+    if args.out:
+        result.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -55,11 +55,35 @@ def match_entries_debug(entries, db, threshold=80):
     return matches
 
 
-def match_entries_interactive(entries, db, threshold=80):
+def _history_hit(history, db, amt, post_day):
+    """
+    Ask the recurrence index who usually pays `amt` into this bank.
+    Returns (db_row, hits, auto) or None if the customer is unknown / not in db.
+    """
+    if history is None:
+        return None
+    found = history.lookup(db["C"].unique(), amt, post_day)
+    if not found:
+        return None
+    cust_id, hits, auto = found
+    row = db[db["F"].astype(str).str.strip().str.replace(r"\.0$", "", regex=True) == cust_id]
+    if row.empty:
+        return None
+    return row.iloc[0], hits, auto
+
+
+def match_entries_interactive(entries, db, threshold=80, history=None, post_day=None, sources=None):
     """
     entries: list of (raw_txt, amt)
-    db: DataFrame with columns E (keyword), F (cust_id), G (clean_name)
+    db: DataFrame with columns C (bank G/L), E (keyword), F (cust_id), G (clean_name)
+    history: optional RecurrenceIndex; consulted for blank descriptions and
+             for rows whose best fuzzy score is below `threshold`
+    post_day: day-of-month of the posting date, for the history cadence check
+    sources: optional list; gets one entry per match saying how it was made:
+             "exact" / "history" (no one was asked), "fuzzy" (suggestion
+             accepted at the prompt) or "manual" (customer ID typed in)
     """
+    sources = [] if sources is None else sources
 
     keywords = db["E"].astype(str).str.strip().tolist()
     matches = []
@@ -81,6 +105,7 @@ def match_entries_interactive(entries, db, threshold=80):
             print("  Exact match:")
             print(f"     → {hit['E']!r}  [{hit['F']}] {hit['G']}")
             matches.append((raw_txt, amt, hit))
+            sources.append("exact")
             continue
 
         # 3) fuzzy fallback
@@ -91,11 +116,24 @@ def match_entries_interactive(entries, db, threshold=80):
         idx = keywords.index(best)
         hit = db.iloc[idx]
 
+        # 3b) blank / garbled text → recurring payer of this amount?
+        if not key_clean or score < threshold:
+            past = _history_hit(history, db, amt, post_day)
+            if past is not None:
+                hit, hits, auto = past
+                print(f"  History: [{hit['F']}] {hit['G']} paid this amount {hits}x before")
+                if auto:
+                    print("  Auto-assigned from history")
+                    matches.append((raw_txt, amt, hit))
+                    sources.append("history")
+                    continue
+
         # 4) ask user
         # ans = input(f"    接受 (y/n) ").strip().lower()
         ans = _prompt_yes_no("接受這個配對嗎？(y/n)")
         if ans in ("", "y", "yes"):
             matches.append((raw_txt, amt, hit))
+            sources.append("fuzzy")
         else:
             # manual override
             # manual = input("    請輸入客戶ID（或留空以跳過）：").strip()
@@ -106,6 +144,7 @@ def match_entries_interactive(entries, db, threshold=80):
                 if not row.empty:
                     hit2 = row.iloc[0]
                     matches.append((raw_txt, amt, hit2))
+                    sources.append("manual")
                 else:
                     print(f"    ID {manual!r} not found—skipping.")
                     skipped.append((raw_txt, amt))
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from pathlib import Path
+import json
+import openpyxl
+import pandas as pd
+
+# Past ledger outputs live next to the template: 會計憑證導入模板 - YYYYMMDD[-N].xls[x]
+LEDGER_GLOB     = "會計憑證導入模板 - *.xls*"
+LEDGER_SKIP     = ("空白檔案", "客戶資料")   # template + customer DB share the prefix
+DAY_TOLERANCE   = 3    # ± days around a customer's usual day-of-month
+MIN_AUTO_HITS   = 2    # need at least this many past postings to auto-assign
+INDEX_CACHE     = "recurrence_index.json"   # next to the ledgers: rows per ledger + auto-assigns
+INDEX_CACHE_VERSION = 1
+
+
+def _norm_id(x) -> str:
+    if x is None or (isinstance(x, float) and pd.isna(x)):
+        return ""
+    s = str(x).strip()
+    if s.endswith(".0"):
+        s = s[:-2]
+    return s
+
+def _amount_key(x):
+    """Amounts are keyed in cents so 1500 / '1,500' / 1500.0 all collide."""
+    try:
+        return int(round(float(str(x).replace(",", "")) * 100))
+    except (TypeError, ValueError):
+        return None
+
+def _day_of(ymd) -> int | None:
+    s = _norm_id(ymd)
+    if len(s) == 8 and s.isdigit():
+        return int(s[6:])
+    return None
+
+def _day_distance(a: int, b: int) -> int:
+    """Circular distance on a 31-day month, so the 30th and the 2nd are close."""
+    d = abs(a - b)
+    return min(d, 31 - d)
+
+
+def _iter_ledger_rows(p: Path):
+    """
+    Yield (E posting_date, O hkont, S amount, U cust_id) for every DZ row
+    (first row of each 2-row block, starting at Excel row 5).
+    """
+    if p.suffix.lower() == ".xlsx":
+        wb = openpyxl.load_workbook(p, data_only=True, read_only=True)
+        ws = wb["Sheet1"]
+        for r, row in enumerate(ws.iter_rows(min_row=5, max_col=21, values_only=True), start=5):
+            if (r - 5) % 2:
+                continue
+            row = tuple(row) + (None,) * (21 - len(row))
+            yield row[4], row[14], row[18], row[20]
+        wb.close()
+    elif p.suffix.lower() == ".xls":
+        df = pd.read_excel(p, sheet_name="Sheet1", header=None, engine="xlrd")
+        # zero-based cols: E=4, O=14, S=18, U=20; start row index 4 (Excel row 5), step by 2
+        for r in range(4, len(df), 2):
+            get = lambda c: df.iat[r, c] if df.shape[1] > c else None
+            yield get(4), get(14), get(18), get(20)
+
+
+class RecurrenceIndex:
+    """
+    (bank G/L account, amount) → {customer ID: [day-of-month, ...]} built from
+    earlier voucher outputs. Used to resolve credits whose bank description is
+    blank or too garbled for the keyword / fuzzy match.
+
+    The rows read from each ledger are kept in a cache file (INDEX_CACHE) keyed
+    by the ledger's size and mtime, so a run only reads new or changed ledgers.
+    Rows that were themselves auto-assigned from history (record_auto) are left
+    out, so a wrong auto-assign does not become evidence for the next one.
+    """
+
+    def __init__(self, cache_path: Path | None = None):
+        self._index = defaultdict(lambda: defaultdict(list))
+        self.files_read = 0
+        self.cache_path = cache_path
+        self._files = {}    # ledger name → {"size", "mtime_ns", "rows": [[hkont, amount key, cust, yyyymmdd]]}
+        self._auto = []     # [yyyymmdd, cust, amount key] of every row auto-assigned from history
+
+    def add(self, hkont, amount, cust_id, day: int | None):
+        amt_key = _amount_key(amount)
+        cust = _norm_id(cust_id)
+        if amt_key is None or amt_key <= 0 or not cust:
+            return
+        self._index[(_norm_id(hkont), amt_key)][cust].append(day)
+
+    @classmethod
+    def from_ledgers(cls, base_dir: Path, exclude: list[Path] = (),
+                     cache_path: Path | None = None) -> "RecurrenceIndex":
+        """
+        Index the earlier ledgers in `base_dir` (except `exclude`), reading only
+        those not in the cache (default: base_dir / INDEX_CACHE) as they are now.
+        """
+        idx = cls(Path(cache_path) if cache_path else Path(base_dir) / INDEX_CACHE)
+        cached = idx._load_cache()
+        idx._auto = cached.get("auto", [])
+        skip = {Path(p).resolve() for p in exclude}
+        for p in sorted(Path(base_dir).glob(LEDGER_GLOB)):
+            if any(tok in p.stem for tok in LEDGER_SKIP) or p.resolve() in skip:
+                continue
+            st = p.stat()
+            entry = cached.get("files", {}).get(p.name)
+            if entry is None or (entry["size"], entry["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+                try:
+                    rows = [[_norm_id(o_val), _amount_key(s_val), _norm_id(u_val), _norm_id(e_val)]
+                            for e_val, o_val, s_val, u_val in _iter_ledger_rows(p)]
+                except Exception as e:
+                    print(f"[WARN] Could not index earlier ledger {p.name}: {e}; skipping.")
+                    continue
+                entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "rows": rows}
+                idx.files_read += 1
+            idx._files[p.name] = entry
+        idx._build()
+        idx.save()
+        print(f"[HISTORY] Indexed {len(idx._index)} (account, amount) keys from {len(idx._files)} ledger files "
+              f"({idx.files_read} read, the rest cached)")
+        return idx
+
+    def _build(self):
+        self._index.clear()
+        auto = {tuple(a) for a in self._auto}
+        for entry in self._files.values():
+            for hkont, amt_key, cust, ymd in entry["rows"]:
+                if (ymd, cust, amt_key) in auto:        # written by an auto-assign: not evidence
+                    continue
+                self.add(hkont, None if amt_key is None else amt_key / 100, cust, _day_of(ymd))
+
+    def record_auto(self, post_date: str, cust_id, amount):
+        """Remember a row auto-assigned from history, so it is never indexed as history itself."""
+        key = [_norm_id(post_date), _norm_id(cust_id), _amount_key(amount)]
+        if key not in self._auto:       # re-running a bank file writes nothing new
+            self._auto.append(key)
+            self.save()
+
+    def _load_cache(self) -> dict:
+        try:
+            cached = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return cached if cached.get("version") == INDEX_CACHE_VERSION else {}
+
+    def save(self):
+        if self.cache_path is None:
+            return
+        tmp = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": INDEX_CACHE_VERSION, "files": self._files, "auto": self._auto},
+                                  ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.cache_path)
+
+    def lookup(self, hkonts, amount, day: int | None):
+        """
+        Return (cust_id, hits, auto) for the best historical payer of `amount`
+        into any of `hkonts`, or None.  `auto` is True only when exactly one
+        customer has paid this amount, at least MIN_AUTO_HITS times, and
+        `day` falls within DAY_TOLERANCE of one of their past posting days.
+        """
+        amt_key = _amount_key(amount)
+        if amt_key is None:
+            return None
+        candidates = defaultdict(list)
+        for hk in hkonts:
+            for cust, days in self._index.get((_norm_id(hk), amt_key), {}).items():
+                candidates[cust].extend(days)
+        if not candidates:
+            return None
+
+        def on_cadence(days):
+            return day is not None and any(
+                d is not None and _day_distance(d, day) <= DAY_TOLERANCE for d in days
+            )
+
+        cust, days = max(candidates.items(), key=lambda kv: (on_cadence(kv[1]), len(kv[1])))
+        auto = len(candidates) == 1 and len(days) >= MIN_AUTO_HITS and on_cadence(days)
+        return cust, len(days), auto
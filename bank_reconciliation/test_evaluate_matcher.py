@@ -0,0 +1,50 @@
+"""
+Matcher evaluation tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from evaluate_matcher import evaluate_bank, exact_hits, load_labels, parse_thresholds, summarize
+
+DB = pd.DataFrame({"E": ["台積電", "聯發 科", "鴻海精密"], "F": ["1001.0", "1002", "1003"]})
+
+
+def test_exact_hits_uses_the_first_contained_keyword():
+    assert exact_hits(["匯款台積電股份", "聯發科技", "未知"], DB).tolist() == [0, 1, -1]
+
+
+def test_summarize_metrics():
+    rows = pd.DataFrame({"exact": [True, False, False, False],
+                         "score": [100.0, 90.0, 85.0, 50.0],
+                         "correct": [True, True, False, True]})
+    got = summarize(rows, 80, secs=2.0)
+    assert got == {"threshold": 80, "rows": 4, "auto_accepted": 3, "misposted": 1,
+                   "precision": pytest.approx(2 / 3), "recall": 0.5, "prompt_rate": 0.25, "rows_per_sec": 2.0}
+    assert summarize(rows, 95, secs=0)["precision"] == 1.0
+
+
+def test_evaluate_bank_scores_every_row():
+    labels = pd.DataFrame({"key_clean": ["台積電", "鴻海精蜜", "xyz"], "cust_id": ["1001", "1003", "1002"]})
+    res = evaluate_bank(labels, DB, ["partial_ratio"])["partial_ratio"]
+    assert res["exact"].tolist() == [True, False, False]
+    assert res["correct"].tolist() == [True, True, False]
+    assert res["score"].iloc[0] == 100.0 and 50 < res["score"].iloc[1] < 100
+
+
+def test_load_labels_keeps_operator_resolved_rows(tmp_path):
+    path = tmp_path / "decisions.csv"
+    path.write_text("raw_text,amount,cust_id,bank,source\n"
+                    "台積 電,1,1001.0,中信,fuzzy\n鴻海,2,1003,中信,manual\n"
+                    "聯發科,3,1002,中信,exact\n,4,1002,中信,history\n", encoding="utf-8")
+    labels = load_labels(path)
+    assert labels["cust_id"].tolist() == ["1001", "1003"]
+    assert labels["key_clean"].iloc[0] == "台積電"
+    assert labels["bank_display"].iloc[0] == "中信營業 NTD 0800"
+    assert len(load_labels(path, None)) == 4
+
+
+def test_parse_thresholds():
+    assert parse_thresholds("70:80:5") == [70, 75, 80]
+    assert parse_thresholds("65, 90") == [65.0, 90.0]
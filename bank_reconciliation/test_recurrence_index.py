@@ -0,0 +1,78 @@
+"""
+History index tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+
+import openpyxl
+import pytest
+
+from recurrence_index import INDEX_CACHE, RecurrenceIndex
+
+
+@pytest.fixture
+def index():
+    idx = RecurrenceIndex()
+    for day in (5, 6):
+        idx.add("1113001", 1500, "C1", day)
+    idx.add("1113001", 2000, "C2", 30)
+    idx.add("1113001", 2000, "C2", 1)
+    idx.add("1113002", 800, "C3", 10)
+    idx.add("1113002", 800, "C4", 20)
+    idx.add("1113002", 800, "C4", 21)
+    return idx
+
+
+def test_single_recurring_payer_on_cadence_is_auto(index):
+    assert index.lookup(["1113001"], "1,500", 7) == ("C1", 2, True)
+    assert index.lookup(["1113001.0"], 1500.0, 7) == ("C1", 2, True)
+
+
+def test_off_cadence_or_unknown_day_is_only_suggested(index):
+    assert index.lookup(["1113001"], 1500, 20) == ("C1", 2, False)
+    assert index.lookup(["1113001"], 1500, None) == ("C1", 2, False)
+
+
+def test_cadence_wraps_around_the_month_end(index):
+    assert index.lookup(["1113001"], 2000, 2) == ("C2", 2, True)
+
+
+def test_several_payers_are_never_auto(index):
+    assert index.lookup(["1113002"], 800, 11) == ("C3", 1, False)       # on cadence beats more hits
+    assert index.lookup(["1113002"], 800, 1) == ("C4", 2, False)
+
+
+def test_unknown_account_or_amount(index):
+    assert index.lookup(["1113002"], 1500, 5) is None
+    assert index.lookup(["1113001"], "n/a", 5) is None
+
+
+def write_ledger(base, ymd, rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Sheet1"
+    for r, (hkont, amount, cust) in enumerate(rows):
+        for col, value in ((5, ymd), (15, hkont), (19, amount), (21, cust)):
+            ws.cell(5 + 2 * r, col, value)          # DZ rows; the row below is the N row
+    path = base / f"會計憑證導入模板 - {ymd}.xlsx"
+    wb.save(path)
+    return path
+
+
+def test_ledgers_are_cached_and_auto_assigns_left_out(tmp_path):
+    write_ledger(tmp_path, "20250105", [("1113001", 1500, "C1")])
+    write_ledger(tmp_path, "20250205", [("1113001", 1500, "C1"), ("1113002", 800, "C3")])
+    today = write_ledger(tmp_path, "20250605", [("1113002", 800, "C3")])
+
+    idx = RecurrenceIndex.from_ledgers(tmp_path, exclude=[today])
+    assert idx.files_read == 2 and (tmp_path / INDEX_CACHE).exists()
+    assert idx.lookup(["1113001"], 1500, 5) == ("C1", 2, True)
+    idx.record_auto("20250305", "C1", 1500)
+    write_ledger(tmp_path, "20250305", [("1113001", 1500, "C1")])
+
+    idx = RecurrenceIndex.from_ledgers(tmp_path, exclude=[today])
+    assert idx.files_read == 1                              # only the new ledger
+    assert idx.lookup(["1113001"], 1500, 5) == ("C1", 2, True)
+
+    write_ledger(tmp_path, "20250205", [("1113001", 1500, "C1")])     # corrected: read again
+    idx = RecurrenceIndex.from_ledgers(tmp_path, exclude=[today])
+    assert idx.files_read == 1 and idx.lookup(["1113002"], 800, 5) is None
@@ -25,6 +25,36 @@ def log_skipped(skipped, filepath="skipped.csv"):
         writer.writerows(skipped)
     print(f"Skipped entries written to {filepath}")
 
+DECISION_COLUMNS = ["raw_text", "amount", "cust_id", "bank", "source"]
+
+def log_decisions(matches, bank, sources, filepath="decisions.csv"):
+    """
+    Append matches as labeled history for evaluate_matcher.py.
+
+    matches: list of (raw_txt, amt, db_row)
+    bank: bank display name (BANK_MAP value) the rows were matched under
+    sources: how each match was made (exact / history / fuzzy / manual, see
+             match_entries_interactive); only fuzzy and manual were confirmed
+             by an operator, and evaluate_matcher.py scores those by default
+    """
+    p = Path(filepath)
+    new_file = not p.exists()
+    if not new_file:
+        with open(p, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        if rows and rows[0] != DECISION_COLUMNS:    # written before sources were kept: unknown
+            with open(p, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(DECISION_COLUMNS)
+                writer.writerows(r + [""] for r in rows[1:])
+    with open(p, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(DECISION_COLUMNS)
+        for (raw_txt, amt, row), source in zip(matches, sources):
+            writer.writerow([raw_txt, amt, row["F"], bank, source])
+    print(f"Appended {len(matches)} decisions to {filepath}")
+
 def load_sheet(path: Union[str, Path],
                sheet: Union[int, str] = 0,
                header: Union[int, None] = None) -> Union[openpyxl.worksheet.worksheet.Worksheet, pd.DataFrame]:
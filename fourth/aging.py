@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Posting-age engine for the 說明 checks and aging trends.
+
+Every export row is reduced once to integer day numbers (posting day, day it
+was cleared), from the typed export (export_schema.typed_export), so ages
+against any cutoff are plain array subtraction. One
+cutoff gives the masks the 說明 sections use (> 30 / > 90 days, 未結清);
+a list of cutoffs gives a per-account aging matrix in one pass, e.g. a
+12-month trend:
+
+    python aging.py --export combined.xlsx --cutoff 2025-06-30 --months 12
+"""
+from __future__ import annotations
+import argparse
+import sys
+from datetime import date, datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from export_schema import AMOUNT_COL, CLEARED_COL, DATE_COL, typed_export
+
+BUCKET_EDGES = np.array([30, 90, 365])                  # upper bounds (inclusive) of all but the last bucket
+BUCKET_LABELS = ["0-30", "31-90", "91-365", ">365"]
+
+_NEVER = 1 << 40      # day number for "no posting date" / "not cleared": after every cutoff
+
+
+def _day_numbers(values) -> np.ndarray:
+    """Dates (any pandas-parsable form) → days since 1970-01-01; unparsable → _NEVER."""
+    dt = pd.to_datetime(pd.Series(values), errors="coerce")
+    days = (dt.dt.normalize() - pd.Timestamp(0)).dt.days
+    return days.fillna(_NEVER).to_numpy(dtype=np.int64)
+
+def day_number(d) -> int:
+    return (pd.Timestamp(d).normalize() - pd.Timestamp(0)).days
+
+def row_aging(typed: pd.DataFrame) -> dict[str, np.ndarray]:
+    """
+    Per-row arrays, aligned with the typed export:
+      posted  – posting day number (_NEVER when missing)
+      open    – 未結清 now (結清文件 blank)
+      cleared – day number the row was cleared: _NEVER while open, and before
+                every cutoff when it is cleared without a clearing date (結清日期)
+    """
+    is_open = ~typed["cleared"].to_numpy(dtype=bool)
+    cleared = _day_numbers(typed["cleared_on"])
+    cleared[cleared == _NEVER] = -_NEVER
+    cleared[is_open] = _NEVER
+    return {"posted": _day_numbers(typed["posted"]), "open": is_open, "cleared": cleared}
+
+def ages_at(aging: dict[str, np.ndarray], cutoff) -> np.ndarray:
+    """Age in days of every row at `cutoff` (negative: posted after it, or no posting date)."""
+    return day_number(cutoff) - aging["posted"]
+
+
+def month_end_cutoffs(last, months: int) -> list[date]:
+    """`months` cutoffs ending at `last`: the month-ends before it, then `last` itself."""
+    last = pd.Timestamp(last)
+    return [(last - pd.offsets.MonthEnd(i)).date() for i in range(months - 1, 0, -1)] + [last.date()]
+
+def aging_matrix(aging: dict[str, np.ndarray], codes, cutoffs, amounts=None) -> pd.DataFrame:
+    """
+    Open rows per (cutoff, account) and age bucket, for all cutoffs at once.
+    A row counts at a cutoff when it was posted on/before it and not yet
+    cleared (clearing date after the cutoff). Columns: ("rows", bucket) and,
+    with `amounts`, ("amount", bucket). Accounts with no open rows at a
+    cutoff are left out.
+    """
+    cutoffs = list(cutoffs)
+    code_idx, code_names = pd.factorize(pd.Series(codes), sort=True)
+    cut = np.array([day_number(c) for c in cutoffs], dtype=np.int64)[:, None]
+
+    age = cut - aging["posted"][None, :]                        # cutoffs × rows
+    live = (age >= 0) & (aging["cleared"][None, :] > cut) & (code_idx >= 0)[None, :]
+    bucket = np.searchsorted(BUCKET_EDGES, age, side="left")
+    n_codes, n_buckets = len(code_names), len(BUCKET_LABELS)
+    cell = ((np.arange(len(cutoffs))[:, None] * n_codes + code_idx[None, :]) * n_buckets + bucket)[live]
+
+    size = len(cutoffs) * n_codes * n_buckets
+    blocks = {"rows": np.bincount(cell, minlength=size)}
+    if amounts is not None:
+        w = pd.to_numeric(pd.Series(amounts), errors="coerce").fillna(0).to_numpy(dtype=float)
+        blocks["amount"] = np.bincount(cell, weights=np.broadcast_to(w, live.shape)[live], minlength=size)
+
+    index = pd.MultiIndex.from_product([cutoffs, list(code_names)], names=["cutoff", "code"])
+    out = pd.concat({name: pd.DataFrame(b.reshape(-1, n_buckets), index=index, columns=BUCKET_LABELS)
+                     for name, b in blocks.items()}, axis=1)
+    return out[out["rows"].sum(axis=1) > 0]
+
+
+# ---------------- CLI ----------------
+
+def main():
+    from group_by_gl import find_gl_column, load_export_frame, load_mapping
+
+    p = argparse.ArgumentParser(description="Aging trend of open items per G/L account across month-end cutoffs.")
+    p.add_argument("--export", required=True, help="Merged export workbook (its .parquet/.pkl sidecar is used when current)")
+    p.add_argument("--mapping", default=None, help="Optional 會計科目對照表.xlsx for account names")
+    p.add_argument("--cutoff", default=None, help="Last cutoff, YYYY-MM-DD (default: today)")
+    p.add_argument("--months", type=int, default=12, help="Number of cutoffs: month-ends before --cutoff, then --cutoff (default: 12)")
+    p.add_argument("--out", default=None, help="Output workbook (default: <export>_aging.xlsx)")
+    args = p.parse_args()
+
+    try:
+        last = datetime.strptime(args.cutoff, "%Y-%m-%d").date() if args.cutoff else date.today()
+    except ValueError:
+        print("[ERROR] --cutoff must be YYYY-MM-DD (e.g., 2025-06-30)", file=sys.stderr)
+        sys.exit(2)
+
+    export_path = Path(args.export).expanduser().resolve()
+    df, _ = load_export_frame(export_path, None)
+    missing = [c for c in (DATE_COL, CLEARED_COL) if c not in df.columns]
+    if missing:
+        print(f"[ERROR] Export is missing column(s): {', '.join(missing)}", file=sys.stderr)
+        sys.exit(2)
+
+    cutoffs = month_end_cutoffs(last, max(args.months, 1))
+    typed = typed_export(df, find_gl_column(df))
+    amounts = typed["amount"] if AMOUNT_COL in df.columns else None
+    matrix = aging_matrix(row_aging(typed), typed["code"], cutoffs, amounts)
+
+    names = load_mapping(Path(args.mapping)) if args.mapping else {}
+    out_path = Path(args.out) if args.out else export_path.with_name(export_path.stem + "_aging.xlsx")
+    with pd.ExcelWriter(out_path) as xw:
+        for block, sheet in (("amount", "金額"), ("rows", "筆數")):
+            if block not in matrix.columns.get_level_values(0):
+                continue
+            t = matrix[block].copy()
+            t["合計"] = t.sum(axis=1)
+            t = t.reset_index()
+            t.insert(2, "科目名稱", t["code"].map(names).fillna(""))
+            t.to_excel(xw, sheet_name=sheet, index=False)
+
+    print(f"[OK] {len(cutoffs)} cutoffs ({cutoffs[0]} … {cutoffs[-1]}), "
+          f"{matrix.index.get_level_values('code').nunique()} accounts → {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing (and, with --trace-memory, peak Python memory) of the
+merge and grouping pipeline on synthetic or real SAP exports.
+
+The merge runs the merge_excels CLI path: inputs decoded in a process pool
+(iter_inputs) and streamed chunk by chunk through RowDeduper into the
+write-only workbook (write_merged_streaming). Its stages interleave; each
+one's time is added up over all chunks: read (decode), merge (project onto
+the reference columns), dedup, write (rows + sidecar) and save.
+Grouping stages come from group_export_by_account itself: read, prepare
+(normalize, account frames, highlight index), 說明, copy sheets,
+account sheets (styles and highlight flags are applied as rows are
+written) and save.
+
+    python benchmark.py --rows 200000 --files 4 --format xlsx
+    python benchmark.py --rows 1000000 --files 2 --accounts 80 --trace-memory --out bench.csv
+    python benchmark.py --inputs export1.xlsx export2.xls
+"""
+from __future__ import annotations
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from itertools import chain
+from pathlib import Path
+import pandas as pd
+
+from group_by_gl import group_export_by_account
+from merge_excels import RowDeduper, iter_inputs, write_merged_streaming
+from synthetic_export import FORMATS, generate
+
+
+class StageClock:
+    """
+    Time (and peak traced memory) per stage. Each call books the time since
+    the previous call to `stage`, so a stage reported once per chunk still
+    gets one record: seconds and rows summed, the highest peak.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.records: list[dict] = []
+        self._by_stage: dict[tuple, dict] = {}
+        self.step = "merge"
+        self.restart()
+
+    def restart(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+
+    def __call__(self, stage: str, rows: int):
+        secs = time.perf_counter() - self.t0
+        peak = tracemalloc.get_traced_memory()[1] / 2**20 if self.trace_memory else float("nan")
+        rec = self._by_stage.get((self.step, stage))
+        if rec is None:
+            rec = self._by_stage[self.step, stage] = {"step": self.step, "stage": stage, "seconds": 0.0,
+                                                      "peak_mb": peak, "rows": 0}
+            self.records.append(rec)
+        rec["seconds"] += secs
+        rec["peak_mb"] = max(rec["peak_mb"], peak)
+        rec["rows"] += rows
+        self.restart()
+
+
+def bench_merge(inputs: list[Path], out_path: Path, clock: StageClock, workers: int | None) -> int:
+    decoded = iter_inputs(inputs, workers=workers)
+    first = next(decoded)           # reference columns: the first input's, as without --ref
+    ref_cols = list(first[1].columns)
+
+    def frames():
+        for p, df in chain([first], decoded):
+            clock("read", len(df))
+            yield p.name, df
+
+    with RowDeduper() as deduper:
+        return write_merged_streaming(frames(), ref_cols, out_path, deduper=deduper, on_stage=clock)
+
+
+def bench_group(merged_path: Path, mapping: Path, cutoff: date, clock: StageClock,
+                workers: int | None) -> dict:
+    return group_export_by_account(
+        export_path=merged_path,
+        mapping_path=mapping,
+        output_path=merged_path.with_name(merged_path.stem + "_grouped.xlsx"),
+        sheet_name=None,
+        inplace=False,
+        drop_original_titles=["Sheet1", "Sheet2", "Sheet3"],
+        date_columns=["文件日期", "過帳日期"],
+        cutoff_date=cutoff,
+        workers=workers,
+        on_stage=clock,
+    )
+
+
+def main():
+    p = argparse.ArgumentParser(description="Per-stage cost of merge_excels + group_by_gl at scale.")
+    p.add_argument("--inputs", nargs="*", default=None, help="Existing exports to merge (default: synthetic ones)")
+    p.add_argument("--rows", type=int, default=100_000, help="Synthetic rows in total (default: 100,000)")
+    p.add_argument("--files", type=int, default=2, help="Synthetic exports to merge (default: 2)")
+    p.add_argument("--format", choices=list(FORMATS), default="xlsx", help="Synthetic export format (default: xlsx)")
+    p.add_argument("--accounts", type=int, default=30, help="Distinct G/L科目 (default: 30)")
+    p.add_argument("--suppliers", type=int, default=500, help="Distinct supplier numbers (default: 500)")
+    p.add_argument("--cleared-ratio", type=float, default=0.15, help="Share of cleared rows (default: 0.15)")
+    p.add_argument("--mapping", default="會計科目對照表.xlsx", help="Mapping workbook (default: ./會計科目對照表.xlsx)")
+    p.add_argument("--cutoff", default="2025-06-30", help="Cutoff for grouping, YYYY-MM-DD (default: 2025-06-30)")
+    p.add_argument("--workers", type=int, default=None, help="Processes for reading / account sheets (default: CPU count)")
+    p.add_argument("--trace-memory", action="store_true", help="Also report peak Python memory per stage (slower)")
+    p.add_argument("--keep", default=None, help="Keep the generated and output files in this folder")
+    p.add_argument("--out", default=None, help="Optional CSV path for the stage table")
+    args = p.parse_args()
+
+    cutoff = datetime.strptime(args.cutoff, "%Y-%m-%d").date()
+    mapping = Path(args.mapping)
+    work = Path(args.keep) if args.keep else Path(tempfile.mkdtemp(prefix="gl_bench_"))
+    work.mkdir(parents=True, exist_ok=True)
+    try:
+        if args.inputs:
+            inputs = [Path(x) for x in args.inputs]
+        else:
+            t0 = time.perf_counter()
+            inputs = generate(work, args.rows, max(args.files, 1), args.format, args.accounts,
+                              args.suppliers, args.cleared_ratio, mapping=mapping)
+            print(f"Generated {len(inputs)} {args.format} exports ({args.rows:,} rows) "
+                  f"in {time.perf_counter() - t0:.1f}s → {work}")
+
+        if args.trace_memory:
+            tracemalloc.start()
+        clock = StageClock(args.trace_memory)
+        merged_path = work / "bench_merged.xlsx"
+        bench_merge(inputs, merged_path, clock, args.workers)
+        clock.step = "group"
+        clock.restart()
+        stats = bench_group(merged_path, mapping, cutoff, clock, args.workers)
+    finally:
+        if args.trace_memory:
+            tracemalloc.stop()
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    result = pd.DataFrame(clock.records)
+    result["rows_per_sec"] = result["rows"] / result["seconds"]
+    if not args.trace_memory:
+        result = result.drop(columns="peak_mb")
+    with pd.option_context("display.width", 160, "display.float_format", "{:,.2f}".format):
+        print(result.to_string(index=False))
+    totals = result.groupby("step", sort=False)["seconds"].sum()
+    print("\n" + ", ".join(f"{step} {secs:.1f}s" for step, secs in totals.items())
+          + f" ({stats['unique_accounts']} accounts)")
+
+    if args.out:
+        result.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
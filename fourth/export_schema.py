@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Typed, compact columns of an SAP export.
+
+The export frame keeps its cell values as read, since they are written back
+to the grouped sheets unchanged. Text columns whose values repeat are held
+as categoricals instead of one Python string per cell (compact_frame). The
+columns that filters and groupings look at are converted once, column-wise,
+into a typed frame aligned with the export (typed_export):
+
+  code        G/L科目 normalized as norm_code does; categorical, missing when blank
+  supplier    supplier number as stripped text; categorical, missing when blank
+  posted      過帳日期, datetime64 (NaT when missing or unparsable)
+  doc_date    文件日期, datetime64
+  cleared_on  結清日期, datetime64
+  amount      以本國貨幣計算之金額, float64 (NaN when not numeric)
+  cleared     結清文件 filled in (False → 未結清)
+
+A column missing from the export gives all-missing values (never cleared).
+"""
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+DATE_COL = "過帳日期"
+DOC_DATE_COL = "文件日期"
+CLEARED_COL = "結清文件"          # blank → 未結清
+CLEARED_DATE_COL = "結清日期"
+AMOUNT_COL = "以本國貨幣計算之金額"
+SUPPLIER_COLS = ["供應商號碼", "供應商代碼", "供應商", "Vendor", "Vendor Code"]
+
+
+def find_supplier_column(df: pd.DataFrame) -> str | None:
+    return next((c for c in SUPPLIER_COLS if c in df.columns), None)
+
+def norm_codes(s: pd.Series) -> pd.Series:
+    """norm_code over a column: stripped text without thousands commas or one trailing .0; blank → missing."""
+    txt = s.astype(str).str.strip().str.replace(",", "", regex=False).str.replace(r"\.0$", "", regex=True)
+    return txt.where(s.notna() & (txt != "")).astype("category")
+
+def supplier_ids(s: pd.Series) -> pd.Series:
+    """Supplier numbers as stripped text (as a categorical); blank → missing."""
+    txt = s.astype(str).str.strip()
+    return txt.where(s.notna() & (txt != "")).astype("category")
+
+def blank_mask(s: pd.Series) -> np.ndarray:
+    """Empty cells: missing, whitespace only, or the text nan / NaT."""
+    txt = s.astype(str).str.strip()
+    return (s.isna() | (txt == "") | txt.str.lower().isin(["nan", "nat"])).to_numpy(dtype=bool)
+
+def _cells(s: pd.Series) -> pd.Series:
+    return pd.Series(np.asarray(s, dtype=object), index=s.index)     # categorical → the cell values
+
+def parse_dates(s: pd.Series) -> pd.Series:
+    """Dates in any pandas-parsable form → datetime64; anything else → NaT."""
+    return pd.to_datetime(_cells(s), errors="coerce")
+
+def amounts(s: pd.Series) -> pd.Series:
+    return pd.to_numeric(_cells(s), errors="coerce").astype(float)
+
+
+def compact_frame(df: pd.DataFrame, max_distinct: float = 0.5) -> pd.DataFrame:
+    """
+    Text columns (str or blank only) with at most `max_distinct` × rows distinct
+    values become categoricals, in place. Cell values are unchanged.
+    """
+    for j in range(df.shape[1]):
+        col = df.iloc[:, j]
+        if (col.dtype == object and pd.api.types.infer_dtype(col, skipna=True) == "string"
+                and col.nunique() <= max_distinct * len(col)):
+            df.isetitem(j, col.astype("category"))
+    return df
+
+def typed_export(df: pd.DataFrame, gl_col: str, supplier_col: str | None = None) -> pd.DataFrame:
+    """The typed columns listed above, one row per export row (same index)."""
+    def column(name, convert, missing):
+        return convert(df[name]) if name in df.columns else pd.Series(missing, index=df.index)
+
+    no_date = np.full(len(df), np.datetime64("NaT"), dtype="datetime64[ns]")
+    return pd.DataFrame({
+        "code": norm_codes(df[gl_col]),
+        "supplier": supplier_ids(df[supplier_col]) if supplier_col else pd.Series(np.nan, index=df.index,
+                                                                                  dtype="category"),
+        "posted": column(DATE_COL, parse_dates, no_date),
+        "doc_date": column(DOC_DATE_COL, parse_dates, no_date),
+        "cleared_on": column(CLEARED_DATE_COL, parse_dates, no_date),
+        "amount": column(AMOUNT_COL, amounts, np.nan),
+        "cleared": column(CLEARED_COL, lambda s: ~blank_mask(s), False),
+    }, index=df.index)
@@ -1,25 +1,52 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 import argparse
+import hashlib
+import json
+import zipfile
+from contextlib import nullcontext
+from copy import copy, deepcopy
+from itertools import chain
 from pathlib import Path
-from copy import copy as copy_style
+from types import SimpleNamespace
+from typing import Callable, NamedTuple
 from datetime import datetime, date
-from openpyxl.styles import Alignment
-from openpyxl.styles import PatternFill
 from openpyxl.styles import Font
+import os
 import re
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+from pandas.io.parsers import TextParser
 import openpyxl
 from datetime import datetime, date
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import TIME_FORMATS, TIME_TYPES, Cell, get_time_format
+from openpyxl.styles import is_date_format
+from openpyxl.styles.cell_style import StyleArray
 from openpyxl.utils import get_column_letter
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet._writer import ALL_TEMP_FILES      # private, like the style tables: see sheet_styles.py
+from aging import ages_at, row_aging
+from export_schema import compact_frame, find_supplier_column, norm_codes, typed_export
+from shuoming import all_rules, load_rules, match_rules, supplier_incidence, supplier_overlap
+from sheet_styles import (
+    AMOUNT_STYLE, BOLD, DATE_STYLE, FLAG_HEADER, add_flag_highlight, copy_cell_look, copy_cell_style, discard_write_only,
+    extract_sheet_parts, frame_column_widths, highlight_dxf_id, named_style_array, new_arial_workbook, read_column_widths,
+    replace_sheet_parts, set_style, share_styles,
+)
+
+# Account sheets are rendered in parallel (--workers) from this many grouped rows
+PARALLEL_MIN_ROWS = 20_000
 
-YELLOW_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
 # ---------------- helpers ----------------
 
 def write_title(ws, row_ptr, text, blank_lines_after=1):
     cell = ws.cell(row=row_ptr, column=1, value=text)
-    cell.font = Font(bold=True)
+    cell.font = BOLD
     return row_ptr + 1 + blank_lines_after
 
 
@@ -43,13 +70,234 @@ def choose_output_path(export_path: Path, inplace: bool, output: str | None) ->
         return Path(output)
     return export_path.with_name(export_path.stem + "_grouped.xlsx")
 
-def read_export_frame(export_path: Path, sheet_name: str | None) -> tuple[pd.DataFrame, str]:
-    if sheet_name is None:
-        xls = pd.ExcelFile(export_path)
-        sheet_name = xls.sheet_names[0]
-    df = pd.read_excel(export_path, sheet_name=sheet_name, dtype=object)
+def _parser_value(cell):
+    """A read-only cell as pandas' openpyxl reader hands it to the parser."""
+    v = cell.value
+    if v is None:
+        return ""
+    if cell.data_type == "e":
+        return np.nan
+    if cell.data_type == "n" and not isinstance(v, bool) and int(v) == v:
+        return int(v)
+    return v
+
+def read_sheet_rows(ws, data: bool = True) -> tuple[tuple, pd.DataFrame | None]:
+    """
+    One pass over read-only sheet `ws`: the header row's cells (values and
+    formatting) and, with `data`, the rows below it typed like
+    pd.read_excel(dtype=object) – the same cell conversion and trimming,
+    then pandas' own parser.
+    """
+    ws.reset_dimensions()      # exports often carry a stale <dimension>
+    rows = ws.iter_rows()
+    header = next(rows, ())
+    if not data:
+        return header, None
+    table, last = [], -1
+    for n, row in enumerate(chain([header], rows)):
+        values = [_parser_value(c) for c in row]
+        while values and values[-1] == "":
+            values.pop()
+        if values:
+            last = n
+        table.append(values)
+    table = table[:last + 1]
+    if not table:
+        return header, pd.DataFrame()
+    width = max((len(r) for r in table), default=0)
+    table = [r + [""] * (width - len(r)) for r in table]
+    with TextParser(table, header=0, dtype=object) as tp:
+        df = tp.read()
     df.columns = [str(c).strip() for c in df.columns]
-    return df, sheet_name
+    return header, df
+
+
+class ExportSource(NamedTuple):
+    wb: object          # read-only workbook: sheet list, kept sheets
+    sheet: str          # sheet the rows come from
+    header: tuple       # its row-1 cells (header looks)
+    df: pd.DataFrame    # export rows, as read_excel(dtype=object) gives them
+
+
+# Columnar copy of a merged workbook's rows, written next to it by merge_excels
+# as <name>.parquet. pyarrow is optional: without it no sidecar is written or
+# read, and the workbook itself is parsed. The sidecar records the workbook's
+# size, mtime and SHA-256 and is picked up automatically while size and mtime
+# match, or, once the file was touched or copied, while the content hash does.
+# A pickled frame (.pkl) is read only when named with --sidecar: unpickling runs code.
+SIDECAR_SUFFIX = ".parquet"
+SIDECAR_SOURCE_KEY = b"group_by_gl.source"
+
+def file_identity(path: Path) -> dict:
+    st = Path(path).stat()
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+
+class SidecarWriter:
+    """
+    Appends the rows of a workbook being written to its Parquet sidecar, one
+    chunk at a time, so no second copy of the rows is held. A chunk pyarrow
+    cannot type like the first one (mixed-type columns), or a missing pyarrow,
+    drops the sidecar; grouping then parses the workbook. close() stamps the
+    identity of the saved workbook, abort() removes the partial file.
+    """
+    def __init__(self, export_path: Path):
+        self.export_path = Path(export_path)
+        self.path = self.export_path.with_suffix(SIDECAR_SUFFIX)
+        self.path.unlink(missing_ok=True)       # never leave one describing an older workbook
+        self._writer = None
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            self._pa, self._pq = pyarrow, pyarrow.parquet
+        except ImportError:
+            self._pa = None
+
+    def write(self, chunk: pd.DataFrame):
+        pa = self._pa
+        if pa is None:
+            return
+        try:
+            if self._writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                # all-blank columns would be typed null and reject later text
+                schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                    for f in table.schema], metadata=table.schema.metadata)
+                self._writer = self._pq.ParquetWriter(self.path, schema)
+                table = table.cast(schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            print(f"[INFO] No sidecar for {self.export_path.name} (rows re-read when grouping): {e}")
+            self.abort()
+
+    def close(self) -> Path | None:
+        """Call once the workbook is saved for good; returns the sidecar, if any."""
+        if self._writer is None:
+            return None
+        self._writer.add_key_value_metadata(
+            {SIDECAR_SOURCE_KEY: json.dumps(file_identity(self.export_path))})
+        self._writer.close()
+        self._writer = None
+        return self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.path.unlink(missing_ok=True)
+        self._pa = None
+
+def read_sidecar(path: Path) -> pd.DataFrame:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if path.suffix == ".pkl":
+        return pd.read_pickle(path)
+    raise ValueError(f"Sidecar must be .parquet or .pkl: {path}")
+
+def sidecar_for(export_path: Path) -> Path | None:
+    """The Parquet sidecar of `export_path` if it was written for the workbook as it is now."""
+    p = export_path.with_suffix(SIDECAR_SUFFIX)
+    if not p.exists():
+        return None
+    try:
+        import pyarrow.parquet as pq
+        source = json.loads(pq.read_metadata(p).metadata[SIDECAR_SOURCE_KEY])
+    except (ImportError, OSError, KeyError, TypeError, ValueError):
+        return None
+    st = export_path.stat()
+    if (source.get("size"), source.get("mtime_ns")) == (st.st_size, st.st_mtime_ns):
+        return p
+    if source.get("size") != st.st_size:
+        return None
+    # same size, other mtime (touched, copied): hash to tell whether the content changed
+    return p if source.get("sha256") == file_identity(export_path)["sha256"] else None
+
+# Fingerprints of the account sheets in a grouped output, kept next to it as
+# <output>.groups.json, so a re-run re-renders only the accounts whose rows changed.
+GROUPING_META_SUFFIX = ".groups.json"
+GROUPING_META_VERSION = 1
+
+def grouping_meta_path(output_path: Path) -> Path:
+    return Path(output_path).with_suffix(GROUPING_META_SUFFIX)
+
+def write_grouping_meta(output_path: Path, layout: str, sheets: dict[str, dict]):
+    """sheets: {title: {"fingerprint": ..., "part": worksheet part name}} of the saved output."""
+    st = Path(output_path).stat()
+    meta = {"version": GROUPING_META_VERSION, "layout": layout,
+            "output": {"size": st.st_size, "mtime_ns": st.st_mtime_ns}, "sheets": sheets}
+    grouping_meta_path(output_path).write_text(json.dumps(meta, ensure_ascii=False, indent=1), encoding="utf-8")
+
+def read_grouping_meta(output_path: Path, layout: str) -> dict[str, dict]:
+    """
+    Sheet fingerprints of the previous output at `output_path`; empty when
+    there is none, it was saved with a different layout (style table, columns,
+    code version) or the workbook changed since (e.g. edited in Excel).
+    """
+    p = grouping_meta_path(output_path)
+    try:
+        meta = json.loads(p.read_text(encoding="utf-8"))
+        st = Path(output_path).stat()
+    except (OSError, ValueError):
+        return {}
+    if (meta.get("version") != GROUPING_META_VERSION or meta.get("layout") != layout
+            or meta.get("output") != {"size": st.st_size, "mtime_ns": st.st_mtime_ns}):
+        return {}
+    return meta.get("sheets", {})
+
+def _as_excel_values(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The frame as read_excel(dtype=object) would return it from the saved
+    workbook: object columns, whole floats as ints, blanks as NaN.
+    """
+    out = df.astype(object)
+    out = out.where(out.notna(), np.nan)
+    for j in range(df.shape[1]):
+        col = df.iloc[:, j]
+        if pd.api.types.is_float_dtype(col):
+            whole = (col.notna() & (col % 1 == 0)).to_numpy()
+            if whole.any():
+                vals = out.iloc[:, j].to_numpy(copy=True)
+                vals[whole] = [int(v) for v in col.to_numpy()[whole]]
+                out.isetitem(j, vals)
+    out.columns = [str(c).strip() for c in out.columns]
+    out.index = pd.RangeIndex(len(out))
+    return out
+
+def open_export(export_path: Path, sheet_name: str | None,
+                frame: pd.DataFrame | Path | str | None = None) -> ExportSource:
+    """
+    Open the export once (read-only) for everything taken from it: sheet
+    list, header row and rows. The rows come from `frame` (a DataFrame or
+    sidecar path) when given, else from a current sidecar next to the
+    workbook; the sheet body is parsed only when neither is available.
+    Repetitive text columns come back as categoricals (compact_frame).
+    The caller closes .wb.
+    """
+    if frame is None and sheet_name is None:
+        frame = sidecar_for(export_path)
+    if frame is not None and not isinstance(frame, pd.DataFrame):
+        frame = read_sidecar(frame)
+    wb = openpyxl.load_workbook(export_path, read_only=True)
+    try:
+        sheet = sheet_name if sheet_name is not None else wb.sheetnames[0]
+        header, df = read_sheet_rows(wb[sheet], data=frame is None)
+    except Exception:
+        wb.close()
+        raise
+    return ExportSource(wb, sheet, header, compact_frame(df if frame is None else _as_excel_values(frame)))
+
+def load_export_frame(export_path: Path, sheet_name: str | None,
+                      frame: pd.DataFrame | Path | str | None = None) -> tuple[pd.DataFrame, str]:
+    """Export rows and the sheet they come from (see open_export)."""
+    src = open_export(export_path, sheet_name, frame)
+    src.wb.close()
+    return src.df, src.sheet
 
 def find_gl_column(df: pd.DataFrame) -> str:
     for c in df.columns:
@@ -60,7 +308,7 @@ def find_gl_column(df: pd.DataFrame) -> str:
 def load_mapping(mapping_path: Path) -> dict[str, str]:
     df_map_raw = pd.read_excel(mapping_path, sheet_name=0, dtype=object, usecols=[0, 1], header=0)
     df_map_raw = df_map_raw.rename(columns={df_map_raw.columns[0]: "number", df_map_raw.columns[1]: "name"})
-    df_map_raw["number_norm"] = df_map_raw["number"].apply(norm_code)
+    df_map_raw["number_norm"] = norm_codes(df_map_raw["number"])
     df_map = df_map_raw.dropna(subset=["number_norm"]).copy()
     return dict(zip(df_map["number_norm"], df_map["name"].fillna("").astype(str)))
 
@@ -93,6 +341,17 @@ def to_date_value(v):
     except Exception:
         return v
 
+def to_date_values(s: pd.Series, memo: dict | None = None) -> pd.Series:
+    """
+    to_date_value over a whole column, parsing each distinct value once (once
+    per run when the calls share `memo`).
+    """
+    memo = {} if memo is None else memo
+    for v in pd.unique(s):
+        if v not in memo:
+            memo[v] = to_date_value(v)
+    return s.map(memo)
+
 
 def copy_header_style(src_ws, src_col_indexes: list[int], dst_ws, dst_row: int = 1):
     """
@@ -103,12 +362,7 @@ def copy_header_style(src_ws, src_col_indexes: list[int], dst_ws, dst_row: int =
         src_cell = src_ws.cell(row=1, column=src_col_idx)
         dst_cell = dst_ws.cell(row=dst_row, column=j)   # <-- use dst_row here
         if src_cell.has_style:
-            dst_cell.font = copy_style(src_cell.font)
-            dst_cell.fill = copy_style(src_cell.fill)
-            dst_cell.border = copy_style(src_cell.border)
-            dst_cell.alignment = copy_style(src_cell.alignment)
-            dst_cell.number_format = src_cell.number_format
-            dst_cell.protection = copy_style(src_cell.protection)
+            copy_cell_style(src_cell, dst_cell)   # same workbook → share style ids
         # column width copy stays the same (width is per-column)
         try:
             src_letter = openpyxl.utils.get_column_letter(src_col_idx)
@@ -165,38 +419,15 @@ def _group_cols(ws, start_idx: int, end_idx: int, hidden=True, outline_level=1):
     ws.sheet_properties.outlinePr.summaryRight = True
 
 
-def _apply_common_sheet_format(ws):
-    """Freeze top row + enable filter on the whole used range."""
-    # Freeze first row
-    ws.freeze_panes = "A2"
-    # AutoFilter over the full used range
-    last_col = get_column_letter(ws.max_column or 1)
-    last_row = ws.max_row or 1
-    ws.auto_filter.ref = f"A1:{last_col}{last_row}"
-
 def _format_column_N(ws):
     """Number format for column N: #,##0;[Red](#,##0) on data rows (row ≥ 2)."""
     if ws.max_column < 14:
         return
-    fmt = '#,##0;[Red](#,##0)'
     for r in range(2, ws.max_row + 1):
-        ws.cell(row=r, column=14).number_format = fmt
+        set_style(ws.cell(row=r, column=14), AMOUNT_STYLE)
 
-def _apply_groupings(ws):
-    """
-    Group columns with outline (+/−):
-      A–B, D–E, G, K–L, U–W (best-effort if sheet has fewer columns).
-    """
-    # A–B
-    _group_cols(ws, 1, 2, hidden=True)
-    # D–E
-    _group_cols(ws, 4, 5, hidden=True)
-    # G (single column)
-    _group_cols(ws, 7, 7, hidden=True)
-    # K–L
-    _group_cols(ws, 11, 12, hidden=True)
-    # U–W (21–23). Will silently skip if not present.
-    _group_cols(ws, 21, 23, hidden=True)
+# Account sheets: columns grouped with outline (+/−) and hidden — A–B, D–E, G, K–L, U–W
+ACCOUNT_GROUPS = [(1, 2), (4, 5), (7, 7), (11, 12), (21, 23)]
 
 
 def append_shuoming_column(ws):
@@ -210,11 +441,7 @@ def append_shuoming_column(ws):
     new_cell  = ws.cell(row=1, column=new_col)
 
     if prev_cell.has_style:
-        new_cell.font = copy_style(prev_cell.font)
-        new_cell.fill = copy_style(prev_cell.fill)
-        new_cell.border = copy_style(prev_cell.border)
-        new_cell.alignment = copy_style(prev_cell.alignment)
-        new_cell.number_format = prev_cell.number_format
+        copy_cell_style(prev_cell, new_cell)
 
 def _apply_groupings_shuoming(ws):
     """
@@ -244,11 +471,7 @@ def _append_shuoming_to_block(ws, header_row: int, rows_count: int, start_col: i
     prev_header = ws.cell(row=header_row, column=dest_col - 1)
     new_header  = ws.cell(row=header_row, column=dest_col)
     if prev_header.has_style:
-        new_header.font         = copy_style(prev_header.font)
-        new_header.fill         = copy_style(prev_header.fill)
-        new_header.border       = copy_style(prev_header.border)
-        new_header.alignment    = copy_style(prev_header.alignment)
-        new_header.number_format= prev_header.number_format
+        copy_cell_style(prev_header, new_header)
 
     # Data rows: leave blank (optional: align style with the column on the left)
     for r in range(header_row + 1, header_row + 1 + rows_count):
@@ -256,641 +479,628 @@ def _append_shuoming_to_block(ws, header_row: int, rows_count: int, start_col: i
         left_cell = ws.cell(row=r, column=dest_col - 1)
         c         = ws.cell(row=r, column=dest_col, value=None)
         if left_cell.has_style:
-            c.font         = copy_style(left_cell.font)
-            c.fill         = copy_style(left_cell.fill)
-            c.border       = copy_style(left_cell.border)
-            c.alignment    = copy_style(left_cell.alignment)
-            c.number_format= left_cell.number_format
+            copy_cell_style(left_cell, c)
+
+
+# ---------------- write-only output ----------------
+
+def header_template(src: ExportSource, wb, max_col: int):
+    """
+    Row 1 of the export sheet rebuilt in scratch workbook `wb` (values,
+    formatting, column widths): the header source for copy_header_style().
+    """
+    tpl = wb.create_sheet("_header")
+    for c in src.header[:max_col]:
+        if c.value is None and not getattr(c, "has_style", False):
+            continue
+        copy_cell_look(c, tpl.cell(row=1, column=c.column, value=c.value))
+    for idx, width in read_column_widths(src.wb[src.sheet]).items():
+        if idx <= max_col:
+            tpl.column_dimensions[get_column_letter(idx)].width = width
+    return tpl
+
+def _clone(cell, ws, copy_style):
+    if not getattr(cell, "has_style", False):
+        return cell.value
+    c = WriteOnlyCell(ws, cell.value)
+    copy_style(cell, c)
+    return c
+
+def stream_copy_sheet(src_ws, dst_ws):
+    """
+    Copy a finished sheet of the scratch workbook (which shares dst's style
+    tables) into write-only dst_ws: layout and views first, then the rows.
+    """
+    for key, cd in src_ws.column_dimensions.items():
+        d = dst_ws.column_dimensions[key]
+        d.width, d.hidden, d.outlineLevel = cd.width, cd.hidden, cd.outlineLevel
+    dst_ws.views = deepcopy(src_ws.views)
+    dst_ws.sheet_properties = deepcopy(src_ws.sheet_properties)
+    if src_ws.auto_filter.ref:
+        dst_ws.auto_filter.ref = src_ws.auto_filter.ref
+    for row in src_ws.iter_rows():
+        dst_ws.append([_clone(c, dst_ws, copy_cell_style) for c in row])
+
+def stream_copy_readonly(src_ro, dst_ws):
+    """Copy a read-only source sheet (values, cell formatting, column widths) into write-only dst_ws."""
+    for idx, width in read_column_widths(src_ro).items():
+        dst_ws.column_dimensions[get_column_letter(idx)].width = width
+    for row in src_ro.iter_rows():
+        dst_ws.append([_clone(c, dst_ws, copy_cell_look) for c in row])
+
+def account_looks(wb, col_styles: list[str]) -> dict:
+    """
+    named style → style ids in `wb`; plain Normal cells need none.
+    (named style, time format) → the ids a date/time value gets under a
+    style without a date format, worked out here so writing a sheet never
+    adds styles (sheets rendered in other processes rely on it).
+    """
+    looks = {}
+    probe = SimpleNamespace(parent=wb)      # lets a detached cell resolve wb's number formats
+    for name in sorted(set(col_styles) | {"Normal"}):     # fixed order → same style ids every run
+        style = named_style_array(wb, name) if name != "Normal" else None
+        looks[name] = style
+        for fmt in sorted(set(TIME_FORMATS.values())):
+            c = Cell(probe, style_array=copy(style) if style is not None else None)
+            if not is_date_format(c.number_format):
+                c.number_format = fmt
+                looks[name, fmt] = c._style
+    return looks
+
+def account_fingerprint(title: str, body: pd.DataFrame, highlighted_rows: set[int], columns: list[tuple]) -> str:
+    """
+    Digest of everything an account sheet is written from besides the shared
+    layout: title, rows (values and their types), highlighted rows, column widths.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([title, list(body.columns), sorted(highlighted_rows), columns],
+                        ensure_ascii=False).encode())
+    for j in range(body.shape[1]):
+        col = body.iloc[:, j]
+        kind = pd.api.types.infer_dtype(col, skipna=True)
+        h.update(kind.encode())
+        if kind.startswith("mixed"):    # 1 and "1" look alike as text but are written differently
+            col = col.map(lambda v: f"{type(v).__name__}:{v}")
+        h.update(pd.util.hash_pandas_object(col.astype(str), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def account_filter_ref(n_cols: int, n_rows: int, flagged: bool) -> str:
+    """Autofilter range of an account sheet: header + rows, flag column included."""
+    return f"A1:{get_column_letter(n_cols + 1 if flagged else max(n_cols, 1))}{n_rows + 1}"
+
+def write_account_sheet(ws, header: list[str], header_styles: list, body: pd.DataFrame,
+                        col_styles: list[str], looks: dict, highlighted_rows: set[int],
+                        columns: list[tuple], highlight_dxf: int):
+    """
+    Stream one account sheet into write-only `ws`. Everything that is per
+    sheet or per column is set up front (widths, groupings, freeze panes),
+    then rows go out with their column's style ids; the filter is added last.
+    Highlighted rows get a 1 in a hidden flag column after the data, and one
+    conditional format (differential style `highlight_dxf`) colours them.
+      header_styles: style ids per header cell (or None)
+      col_styles:    named style per column (column L: amount only when numeric)
+      looks:         account_looks() of the output workbook
+      columns:       (width, hidden) per column
+    """
+    n_cols = len(header)
+    flag_col = n_cols + 1 if highlighted_rows else None
+    grouped = False
+    for j, (width, hidden) in enumerate(columns, start=1):
+        cd = ws.column_dimensions[get_column_letter(j)]
+        if width:
+            cd.width = width
+        if hidden:
+            cd.hidden, cd.outlineLevel = True, 1
+            grouped = True
+    if flag_col:
+        ws.column_dimensions[get_column_letter(flag_col)].hidden = True
+    if grouped:
+        ws.sheet_view.showOutlineSymbols = True
+        ws.sheet_properties.outlinePr.summaryBelow = True
+        ws.sheet_properties.outlinePr.summaryRight = True
+    ws.freeze_panes = "A2"
+
+    row = []
+    names = [*header, FLAG_HEADER] if flag_col else header
+    styles = [*header_styles, header_styles[-1] if header_styles else None] if flag_col else header_styles
+    for name, style in zip(names, styles):
+        c = WriteOnlyCell(ws, str(name))
+        if style is not None:
+            c._style = copy(style)
+        row.append(c)
+    ws.append(row)
+
+    numeric_only = 11 if len(col_styles) >= 12 and col_styles[11] == AMOUNT_STYLE else None
+    for r, values in enumerate(body.itertuples(index=False, name=None), start=2):
+        row = []
+        for j, v in enumerate(values):
+            name = col_styles[j]
+            if j == numeric_only and not isinstance(v, (int, float)):
+                name = "Normal"
+            style = looks[name]
+            if isinstance(v, TIME_TYPES):
+                style = looks.get((name, get_time_format(type(v))), style)
+            if style is None:
+                row.append(v)
+                continue
+            c = WriteOnlyCell(ws, v)
+            c._style = copy(style)
+            row.append(c)
+        if r in highlighted_rows:
+            row.append(1)
+        ws.append(row)
+
+    if flag_col:
+        add_flag_highlight(ws, n_cols, len(body) + 1, flag_col, highlight_dxf)
+    ws.auto_filter.ref = account_filter_ref(n_cols, len(body), bool(flag_col))
+
+def render_account_part(cell_styles: list[tuple], title: str, header: list[str], header_styles: list,
+                        body: pd.DataFrame, col_styles: list[str], looks: dict,
+                        highlighted_rows: set[int], columns: list[tuple], highlight_dxf: int) -> str:
+    """
+    Worker side of the parallel path: write one account sheet to a temporary
+    worksheet XML part and return its path. `cell_styles` is the output
+    workbook's cellXfs list, so every s= index written here points into the
+    output's style table; style ids come in as plain tuples.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    wb._cell_styles = IndexedList(StyleArray(t) for t in cell_styles)
+    ws = wb.create_sheet(title)
+    header_styles = [StyleArray(t) if t is not None else None for t in header_styles]
+    looks = {k: StyleArray(t) if t is not None else None for k, t in looks.items()}
+    write_account_sheet(ws, header, header_styles, body, col_styles, looks, highlighted_rows,
+                        columns, highlight_dxf)
+    ws.close()
+    # openpyxl deletes its temp files when this process exits (spawn-started pool
+    # workers do, on Windows / macOS), so hand back a file of our own instead
+    fd, part = tempfile.mkstemp(suffix=".xml")
+    os.close(fd)
+    shutil.move(ws._writer.out, part)
+    ALL_TEMP_FILES.remove(ws._writer.out)
+    return part
 
 
 # ---------------- core ----------------
 
 def group_export_by_account(
     export_path: Path,
-    mapping_path: Path,
+    mapping_path: Path | dict[str, str],
     output_path: Path,
     sheet_name: str | None,
     inplace: bool,
     drop_original_titles: list[str],
     date_columns: list[str],
     cutoff_date: date | None = None, 
+    frame: pd.DataFrame | Path | str | None = None,
+    rules: dict | Path | str | None = None,
+    workers: int | None = None,
+    on_stage: Callable[[str, int], None] | None = None,
+    incremental: bool = True,
 ) -> dict:
-    # 1) Read export + detect columns
-    df_export, sheet_used = read_export_frame(export_path, sheet_name)
-    gl_col = find_gl_column(df_export)
-
-    # 2) mapping
-    number_to_name = load_mapping(mapping_path)
-
-    # 3) normalize and filter
-    df_export["_code"] = df_export[gl_col].apply(norm_code)
-    df_export_valid = df_export[df_export["_code"].notna()].copy()
-    df_export_valid = df_export_valid[df_export_valid["_code"].isin(number_to_name.keys())]
-
-    # 4) columns B..X
-    selected_cols = pick_columns_B_to_X(df_export)
-
-    # we also need indexes of B..X in the source sheet to copy header style later
-    src_col_indexes = [df_export.columns.get_loc(col) + 1 for col in selected_cols]  # 1-based for openpyxl
-
-    # 5) open workbook
-    wb = openpyxl.load_workbook(export_path)
-    src_ws = wb[sheet_used]  # header style source
-    # ---- Highlighting helpers (need selected_cols + wb) ----
-    code_to_title: dict[str, str] = {}
-
-    PREF_KEY_COLS = ["文件號碼", "過帳日期", "G/L科目", "國貨幣計算之金額"]
-
-    def _is_blank(v) -> bool:
-        # Treat None, empty, whitespace, and pandas NaN/NaT as blank
-        if v is None:
-            return True
-        # pandas/Excel NaN -> float('nan') or string 'nan'
-        try:
-            import math
-            if isinstance(v, float) and math.isnan(v):
-                return True
-        except Exception:
-            pass
-        s = str(v).strip()
-        return s == "" or s.lower() in {"nan", "nat"}
-
-
-    def _norm_scalar(x):
-        if x is None:
-            return ""
-        try:
-            dt = pd.to_datetime(x, errors="coerce")
-            if not pd.isna(dt):
-                return dt.date().isoformat()
-        except Exception:
-            pass
-        s = str(x).strip()
-        if s.endswith(".0"):
-            s = s[:-2]
-        return s
-
-    def _make_key_from_series(sr: pd.Series, key_cols: list[str]) -> tuple:
-        return tuple(_norm_scalar(sr.get(k)) for k in key_cols)
-
-    def _make_key_from_ws_row(ws_g, r: int, idx_map: dict[str, int]) -> tuple:
-        return tuple(_norm_scalar(ws_g.cell(row=r, column=cidx).value) for cidx in idx_map.values())
-
-    def _effective_key_cols(headers: list[str]) -> list[str]:
-        has = set(headers)
-        if {"文件號碼", "過帳日期"} <= has:
-            return ["文件號碼", "過帳日期"]
-        if "文件號碼" in has:
-            return ["文件號碼"]
-        return [h for h in PREF_KEY_COLS if h in has][:1]
-
-    def _col_indexes_map(headers: list[str], wants: list[str]) -> dict[str, int]:
-        return {h: headers.index(h) + 1 for h in wants if h in headers}
-
-    def _highlight_code_rows(code: str, df_sub: pd.DataFrame):
-        title = code_to_title.get(code)
-        if not title or title not in wb.sheetnames:
-            return
-        ws_g = wb[title]
-
+    # incremental: reuse account sheets of the previous output whose fingerprint is
+    # unchanged (see read_grouping_meta); never for --inplace.
+    # on_stage(name, rows) is called as each stage finishes with the export rows it
+    # covered, and once per account sheet ("account sheets", rows of that sheet), the
+    # same signature as merge_excels.write_merged_streaming (benchmark.py times them)
+    stage = on_stage or (lambda name, rows: None)
+
+    # 1) Open the export once: sheet list, header row and rows (in-memory frame /
+    #    sidecar when available) + detect columns
+    src = open_export(export_path, sheet_name, frame)
+    src_wb, sheet_used, df_export = src.wb, src.sheet, src.df
+    saved_to = str(export_path if inplace else output_path)
+    out = None
+    reuse, futures = {}, []
+    try:
+        gl_col = find_gl_column(df_export)
+
+        # 2) mapping (already loaded, or its workbook) + 說明 rules (parsed up front so a
+        #    bad rule file fails early)
+        number_to_name = mapping_path if isinstance(mapping_path, dict) else load_mapping(mapping_path)
+        if not isinstance(rules, dict):
+            rules = load_rules(rules)
+        stage("read", len(df_export))
+
+        # 3) typed columns (export_schema), converted once; filters below work on them
+        supplier_col = find_supplier_column(df_export)
+        typed = typed_export(df_export, gl_col, supplier_col)
+        df_export["_code"] = typed["code"]
+        df_export_valid = df_export[typed["code"].isin(number_to_name.keys()).to_numpy()]
+
+        # 4) columns B..X
+        selected_cols = pick_columns_B_to_X(df_export)
+
+        # we also need indexes of B..X in the source sheet to copy header style later
+        src_col_indexes = [df_export.columns.get_loc(col) + 1 for col in selected_cols]  # 1-based for openpyxl
+
+        # 5) output is built fresh and written in one streaming pass (write-only); from
+        #    the export only its header looks and any sheets that are kept are copied.
+        #    說明 is laid out in a scratch workbook sharing the output's style tables,
+        #    then streamed across.
+        out = new_arial_workbook(write_only=True)
+        wb = openpyxl.Workbook()
+        share_styles(wb, out)
+        src_ws = header_template(src, wb, max(src_col_indexes, default=1))  # header style source
+        date_cols_set = set(date_columns)
+
+        # Column looks shared by every account sheet: header style ids and column styles.
+        # They are registered in the output's cellXfs before anything else is written, so
+        # their ids are the same on every run (sheets kept from the previous output and
+        # sheets rendered in worker processes rely on it).
+        header_styles = []
+        for i in src_col_indexes:
+            tpl = src_ws.cell(row=1, column=i)
+            header_styles.append(copy(tpl._style) if tpl.has_style else None)
+        col_styles = []
+        for j, col in enumerate(selected_cols, start=1):
+            if j == 14:
+                col_styles.append(AMOUNT_STYLE)     # column N: amount format on every row
+            elif col in date_cols_set:
+                col_styles.append(DATE_STYLE)       # m/d/yyyy (no leading zero)
+            elif j == 12:
+                col_styles.append(AMOUNT_STYLE)     # column L follows N, for numeric cells
+            else:
+                col_styles.append("Normal")
+        looks = account_looks(out, col_styles)
+        highlight_dxf = highlight_dxf_id(out)
+        for a in [*header_styles, *looks.values()]:
+            if a is not None:
+                out._cell_styles.add(a)
+        cell_styles = [tuple(a) for a in out._cell_styles]
+        layout = hashlib.blake2b(json.dumps([GROUPING_META_VERSION, selected_cols, col_styles, cell_styles,
+                                             highlight_dxf]).encode(), digest_size=16).hexdigest()
+
+        # ---- Highlighting helpers (need selected_cols + wb) ----
+        code_to_title: dict[str, str] = {}
+
+        PREF_KEY_COLS = ["文件號碼", "過帳日期", "G/L科目", "國貨幣計算之金額"]
+
+        def _norm_scalar(x):
+            if x is None:
+                return ""
+            try:
+                dt = pd.to_datetime(x, errors="coerce")
+                if not pd.isna(dt):
+                    return dt.date().isoformat()
+            except Exception:
+                pass
+            s = str(x).strip()
+            if s.endswith(".0"):
+                s = s[:-2]
+            return s
+
+        _norm_memo: dict = {}
+
+        def _norm_cached(x):
+            # _norm_scalar per distinct value (pd.to_datetime per cell is the slow part)
+            k = (type(x), x)
+            try:
+                return _norm_memo[k]
+            except KeyError:
+                v = _norm_memo[k] = _norm_scalar(x)
+                return v
+            except TypeError:   # unhashable
+                return _norm_scalar(x)
+
+        def _make_keys(frame: pd.DataFrame, key_cols: list[str]) -> list[tuple]:
+            cols = [frame[k].map(_norm_cached) if k in frame.columns else [""] * len(frame) for k in key_cols]
+            return list(zip(*cols))
+
+        def _effective_key_cols(headers: list[str]) -> list[str]:
+            has = set(headers)
+            if {"文件號碼", "過帳日期"} <= has:
+                return ["文件號碼", "過帳日期"]
+            if "文件號碼" in has:
+                return ["文件號碼"]
+            return [h for h in PREF_KEY_COLS if h in has][:1]
+
+        # Per account: row key → sheet rows, recorded while the sheet is written
+        # (uncleared rows only), so highlighting is a lookup instead of a rescan.
         key_cols = _effective_key_cols(selected_cols)
-        if not key_cols:
-            return
-        idx_map = _col_indexes_map(selected_cols, key_cols)
-
-        keys = { _make_key_from_series(sr, key_cols) for _, sr in df_sub.iterrows() }
-
-        col_cleared = selected_cols.index("結清文件") + 1 if "結清文件" in selected_cols else None
-
-        for r in range(2, ws_g.max_row + 1):
-            if col_cleared:
-                cleared_val = ws_g.cell(row=r, column=col_cleared).value
-                if not _is_blank(cleared_val):
-                    continue
-            row_key = _make_key_from_ws_row(ws_g, r, idx_map)
-            if row_key in keys:
-                for c in range(1, ws_g.max_column + 1):
-                    ws_g.cell(row=r, column=c).fill = YELLOW_FILL
-
-    # 6) create grouped sheets and write data
-    used_titles = {ws.title for ws in wb.worksheets}
-    date_cols_set = set(date_columns)
-
-    for code, grp in df_export_valid.groupby("_code"):
-        name = number_to_name.get(code, "").strip()
-        base_title = f"{code} {name}".strip()
-        title = ensure_unique_title(base_title, used_titles)
-        used_titles.add(title)
-        code_to_title[code] = title
-
-        ws = wb.create_sheet(title=title)
-
-        # Header values
-        for j, col_name in enumerate(selected_cols, start=1):
-            ws.cell(row=1, column=j, value=str(col_name))
-
-        # Header style from export (B..X)
-        copy_header_style(src_ws, src_col_indexes, ws)
-
-        # Body rows
-        for i, row in enumerate(grp[selected_cols].itertuples(index=False, name=None), start=2):
-            for j, val in enumerate(row, start=1):
-                header = selected_cols[j-1]
-                if header in date_cols_set:
-                    v = to_date_value(val)
-                    ws.cell(row=i, column=j, value=v)
-                    # Apply Excel date format so it shows as m/d/yyyy (no leading zero)
-                    ws.cell(row=i, column=j).number_format = "m/d/yyyy"
-                else:
-                    ws.cell(row=i, column=j, value=val)
-        
-        _apply_common_sheet_format(ws)
-        _apply_groupings(ws)
-        _format_column_N(ws)
-
-    # ---- Build the “>30 days 未報銷 (未結清)” summary for 預付費用 ----
-    TARGET_CODES = {"12580100", "12680100"}    # 預付費用 + 其他預付款
-    DATE_COL = "過帳日期"
-    UNCLEARED_COL = "結清文件"                  # treat empty as 未結清
-
-    # Ensure needed columns exist
-    missing = [c for c in [DATE_COL, UNCLEARED_COL, gl_col] if c not in df_export.columns]
-    if not missing:
-        df_tmp = df_export.copy()
-
-        # normalize posting date to pure date
-        dt = pd.to_datetime(df_tmp[DATE_COL], errors="coerce")
-        df_tmp["_posting_date"] = dt.dt.date
-
+        row_index: dict[str, dict[tuple, list[int]]] = {}
+        highlighted: dict[str, set[int]] = {}
+
+        def _index_rows(code: str, body: pd.DataFrame, first_row: int):
+            index = row_index[code] = {}
+            if not key_cols:
+                return
+            uncleared = ~typed["cleared"].to_numpy()[body.index]
+            for r, (key, keep) in enumerate(zip(_make_keys(body, key_cols), uncleared), start=first_row):
+                if keep:
+                    index.setdefault(key, []).append(r)
+
+        def _highlight_code_rows(code: str, df_sub: pd.DataFrame):
+            # Only records the sheet rows; they are flagged when the sheet is streamed
+            if code not in code_to_title or not key_cols:
+                return
+            index = row_index.get(code, {})
+            highlighted.setdefault(code, set()).update(
+                r for key in set(_make_keys(df_sub, key_cols)) for r in index.get(key, ())
+            )
+
+        # 6) account sheets: titles + rows (date columns converted up front), written in step 7
+        used_titles = set(src_wb.sheetnames)
+        account_frames: dict[str, pd.DataFrame] = {}   # title → rows to write (also sizes the columns)
+        shown_dates: dict = {}      # cell value → what a date column shows, shared by every sheet
+
+        for code, grp in df_export_valid.groupby("_code", observed=True):
+            name = number_to_name.get(code, "").strip()
+            base_title = f"{code} {name}".strip()
+            title = ensure_unique_title(base_title, used_titles)
+            used_titles.add(title)
+            code_to_title[code] = title
+
+            body = grp[selected_cols].copy()
+            for col in selected_cols:
+                if col in date_cols_set:
+                    body[col] = to_date_values(body[col], shown_dates)
+            account_frames[title] = body
+            _index_rows(code, body, first_row=2)
+        stage("prepare", len(df_export_valid))
+
+        # ---- 說明 sheet: sections and the rows each block lists come from the rule file ----
+        DATE_COL = "過帳日期"
+        UNCLEARED_COL = "結清文件"                  # treat empty as 未結清
+        DATE_COLS = set(rules.get("date_columns", ["文件日期", "過帳日期"]))
+
+        # Posting age at the cutoff + 未結清, computed once for every rule
         co = cutoff_date or date.today()
-
-        # 未結清 if blank/NaN
-        uncleared_mask = df_tmp[UNCLEARED_COL].isna() | (df_tmp[UNCLEARED_COL].astype(str).str.strip() == "")
-
-        # 科目 in targets (normalized)
-        df_tmp["_code"] = df_tmp[gl_col].apply(norm_code)
-        code_mask = df_tmp["_code"].isin(TARGET_CODES)
-
-        # older than 30 days
-        age_mask = df_tmp["_posting_date"].notna() & (
-            (pd.to_datetime(co) - pd.to_datetime(df_tmp["_posting_date"]))
-            .dt.days > 30
-        )
-
-        summary = df_tmp[code_mask & uncleared_mask & age_mask].copy()
-
-        title = "說明"
-        if title in wb.sheetnames:
-            del wb[title]
-        ws = wb.create_sheet(title=title, index=0)
-
-        # === NEW: Section 1 header text (like the 0623 file) ===
-
-        row_ptr = 1
-
-        # === Section 1: 銀行存款 ===
-        cell = ws.cell(row=row_ptr, column=1, value="1. 銀行存款是否未含受限制存款或超過三個月以上定存")
-        cell.font = Font(bold=True)
-        row_ptr += 2
-
-        cell = ws.cell(row=row_ptr, column=1, value="2. 預付費用超過30天未報銷之項目，請說明原因。")
-        cell.font = Font(bold=True)
-        row_ptr += 1 # leave one blank line after the header
-
-        # Small lead-in line (same wording as screenshot)
-        ws.cell(row=row_ptr, column=1, value="→超過30天預付費用明細：")
-        row_ptr += 1
-
-        # Header for the first table starts here
-        hdr_row = row_ptr
-        for j, col_name in enumerate(selected_cols, start=1):
-            ws.cell(row=hdr_row, column=j, value=str(col_name))
-        copy_header_style(src_ws, [df_export.columns.get_loc(c) + 1 for c in selected_cols], ws, dst_row=hdr_row)
-
-        # Rows
-        data_start = hdr_row + 1
-        for i, row in enumerate(summary[selected_cols].itertuples(index=False, name=None), start=data_start):
-            for j, val in enumerate(row, start=1):
-                ws.cell(row=i, column=j, value=val)
-
-        # Apply m/d/yyyy to date columns if present
-        DATE_COLS = {"文件日期", "過帳日期"}
-        header_to_idx = {h: idx+1 for idx, h in enumerate(selected_cols)}
-        for h in DATE_COLS:
-            if h in header_to_idx:
-                cidx = header_to_idx[h]
-                for r in range(data_start, data_start + len(summary)):
-                    ws.cell(row=r, column=cidx).number_format = "m/d/yyyy"
-        
-        # Highlight matching rows in their original grouped sheets
-        # Group by GL code because the 'summary' may contain multiple codes from TARGET_CODES
-        for ccode, subgrp in summary.groupby("_code"):
-             _highlight_code_rows(ccode, subgrp)
-
-        rows_count = len(summary)
-        _append_shuoming_to_block(ws, header_row=hdr_row, rows_count=rows_count,
-                                start_col=1, num_cols=len(selected_cols))
-                    
-        # === NEW: Section 2 header text before 存出保證金 ===
-
-        # === Section 3: 預付費用 >1年 ===
-        row_ptr = ws.max_row + 2  # two blank lines after section 2 table
-        cell = ws.cell(row=row_ptr, column=1, value="3. 超過一年的預付費用流動性分類是否正確。")
-        cell.font = Font(bold=True)
-        row_ptr += 2  # leave one blank line after
-
-
-        row_ptr = ws.max_row + 2  # two blank lines after the above table
-        cell = ws.cell(row=row_ptr, column=1, value="4. 存出保證金是否應取回，以及流動性分類是否正確。")
-        cell.font = Font(bold=True)
-        row_ptr += 2  # one blank line before the next header
-
-        # ---- Append 存出保證金 (split into two sections: 11780300 then 18200100) ----
-        CODES_SEQ = [("11780300", "存出保證金-流動"), ("18200100", "存出保證金")]
-
-        for idx, (code, _label) in enumerate(CODES_SEQ):
-            sub = df_tmp[df_tmp["_code"] == code].copy()
-            if sub.empty:
-                continue
-
-            # leave 2 blank rows after whatever content already exists
-            start_row = ws.max_row + 2
-
-            # Header (repeat for each section)
+        missing = [c for c in [DATE_COL, UNCLEARED_COL] if c not in df_export.columns]
+        if missing:
+            print(f"[WARN] 說明: column(s) {', '.join(missing)} not found; age / 未結清 checks list no rows.")
+            age_days = np.full(len(df_export), -1)
+            is_open = np.zeros(len(df_export), dtype=bool)
+        else:
+            aging = row_aging(typed)
+            age_days = ages_at(aging, co)       # no posting date → negative, never "older than"
+            is_open = aging["open"]
+        matched = iter(match_rules(df_export["_code"], age_days, is_open, all_rules(rules)))
+
+        ws = wb.create_sheet(title="說明", index=0)
+        date_idx = [j for j, h in enumerate(selected_cols, start=1) if h in DATE_COLS]
+
+        def write_table(ws_, header_row: int, rows: pd.DataFrame) -> int:
+            """Export header + rows (dates as m/d/yyyy) + blank 說明 column; returns the last row written."""
             for j, col_name in enumerate(selected_cols, start=1):
-                ws.cell(row=start_row, column=j, value=str(col_name))
-            copy_header_style(src_ws, [df_export.columns.get_loc(c) + 1 for c in selected_cols], ws, dst_row=start_row)
-
-            # Rows
-            for i, row in enumerate(sub[selected_cols].itertuples(index=False, name=None), start=start_row + 1):
-                for j, val in enumerate(row, start=1):
-                    ws.cell(row=i, column=j, value=val)
-
-            # Date formatting for this section
-            for h in DATE_COLS:
-                if h in header_to_idx:
-                    cidx = header_to_idx[h]
-                    for r in range(start_row + 1, start_row + 1 + len(sub)):
-                        ws.cell(row=r, column=cidx).number_format = "m/d/yyyy"
-
-            # Highlight for this 保證金 code
-            _highlight_code_rows(code, sub)
-
-            rows_count = len(sub)
-            _append_shuoming_to_block(ws, header_row=start_row, rows_count=rows_count,
-                                    start_col=1, num_cols=len(selected_cols))
+                ws_.cell(row=header_row, column=j, value=str(col_name))
+            copy_header_style(src_ws, src_col_indexes, ws_, dst_row=header_row)
 
-
-
-    # ==== Step 5 (append to 說明): >90天 其他應收/其他應付/代收/代付款 ====
-
-    DATE_COL = "過帳日期"
-    UNCLEARED_COL = "結清文件"
-
-    RECEIVABLE_CODES = {
-        "11780100",  # 其他應收款-非聯屬公司
-        "11780200",  # 其他應收款-其他
-        "11880100",  # 其他應收款-聯屬公司
-    }
-    PAYABLE_CODES = {
-        "21710100",  # 應付薪資
-        "21710200",  # 應付獎金
-        "21710500",  # 暫估應付薪資
-        "21720100",  # 應付租金
-        "21740100",  # 暫估應付費用
-        "21780101",  # 應付費用-非聯屬
-        "21780102",  # 應付費用-聯屬
-        "21780300",  # 應付勞務
-        "21900202",  # 其他應付費用-聯屬
-        "22280201",  # 其他應付費用-非聯屬
-    }
-    COLLECTION_PAYMENT_CODES = {
-        "22820100",  # 代扣稅款
-        "22820200",  # 其他代收款
-        "22820205",  # 其他代收款-代扣五险一金
-        "12820100",  # 代付款
-    }
-
-    # Only run if columns exist
-    missing_cols_90 = [c for c in [DATE_COL, UNCLEARED_COL, gl_col] if c not in df_export.columns]
-    if not missing_cols_90:
-        # Build or reuse df_tmp with helper columns
-        if "df_tmp" not in locals():
-            df_tmp = df_export.copy()
-        if "_posting_date" not in df_tmp.columns:
-            dt = pd.to_datetime(df_tmp[DATE_COL], errors="coerce")
-            df_tmp["_posting_date"] = dt.dt.date
-        if "_code" not in df_tmp.columns:
-            df_tmp["_code"] = df_tmp[gl_col].apply(norm_code)
-
-        co = cutoff_date or date.today()
-        uncleared_mask = df_tmp[UNCLEARED_COL].isna() | (df_tmp[UNCLEARED_COL].astype(str).str.strip() == "")
-        age90_mask = df_tmp["_posting_date"].notna() & (
-            (pd.to_datetime(co) - pd.to_datetime(df_tmp["_posting_date"])).dt.days > 90
-        )
-
-        # Start appending to the same 說明 sheet: 2 blank rows after previous content
-        row_ptr = ws.max_row + 2
-
-        # Top-level title
-        cell = ws.cell(row=row_ptr, column=1, value="5. 超過90天之其他應收/其他應付/代收/代付款原因。")
-        cell.font = Font(bold=True)
-        row_ptr += 2  # one blank row before first subsection
-
-        def write_section_inline(ws_, start_row: int, section_title: str, codes: set[str]) -> int:
-            """
-            Writes a subsection inside 說明 at start_row.
-            Returns the next row index after the subsection plus one blank line.
-            """
-            # Subsection title
-            ws_.cell(row=start_row, column=1, value=f"— {section_title}")
-            # Filter rows
-            code_mask = df_tmp["_code"].isin(codes)
-            sub = df_tmp[uncleared_mask & age90_mask & code_mask].copy()
-
-            # If empty → write '無 ...'
-            if sub.empty:
-                ws_.cell(row=start_row + 1, column=1, value=f"無 {section_title}")
-                return start_row + 2 + 1  # (title + line) then +1 blank row
-
-            # If not empty → one blank row, then header + data
-            hdr_row = start_row + 2
-            for j, col_name in enumerate(selected_cols, start=1):
-                ws_.cell(row=hdr_row, column=j, value=str(col_name))
-            copy_header_style(src_ws, [df_export.columns.get_loc(c) + 1 for c in selected_cols], ws_, dst_row=hdr_row)
-
-            # Data
-            DATE_COLS = {"文件日期", "過帳日期"}
-            header_to_idx = {h: idx + 1 for idx, h in enumerate(selected_cols)}
-            r = hdr_row + 1
-            for row_vals in sub[selected_cols].itertuples(index=False, name=None):
+            body = rows[selected_cols].copy()
+            for j in date_idx:
+                body.isetitem(j - 1, to_date_values(body.iloc[:, j - 1], shown_dates))
+            for i, row_vals in enumerate(body.itertuples(index=False, name=None), start=header_row + 1):
                 for j, val in enumerate(row_vals, start=1):
-                    header = selected_cols[j - 1]
-                    v = to_date_value(val) if header in DATE_COLS else val
-                    ws_.cell(row=r, column=j, value=v)
+                    c = ws_.cell(row=i, column=j)
+                    if j in date_idx:
+                        set_style(c, DATE_STYLE)    # before the value, or openpyxl gives dates its own format
+                    c.value = val
+
+            _append_shuoming_to_block(ws_, header_row=header_row, rows_count=len(body),
+                                      start_col=1, num_cols=len(selected_cols))
+            return header_row + len(body)
+
+        def write_rule_block(ws_, start_row: int, rule: dict, rows: pd.DataFrame) -> int | None:
+            """One rule's block at start_row; returns its last row, or None when it is left out."""
+            if rows.empty and not (rule.get("empty_text") or rule.get("header_if_empty")):
+                return None
+            r = start_row
+            if rule.get("label"):
+                ws_.cell(row=r, column=1, value=rule["label"])
                 r += 1
+            if rows.empty and rule.get("empty_text"):
+                ws_.cell(row=r, column=1, value=rule["empty_text"])
+                return r
+            last = write_table(ws_, r + rule.get("gap", 0), rows)
 
-            # Date format
-            for h in DATE_COLS:
-                if h in header_to_idx:
-                    cidx = header_to_idx[h]
-                    for rr in range(hdr_row + 1, r):
-                        ws_.cell(row=rr, column=cidx).number_format = "m/d/yyyy"
-
-
-            # Highlight for all codes included in this sub-section
-            for ccode, subgrp in sub.groupby("_code"):
+            # Highlight the listed rows in their grouped sheets
+            for ccode, subgrp in rows.groupby("_code", observed=True):
                 _highlight_code_rows(ccode, subgrp)
-
-            # After you've produced rows up to r (exclusive), rows_count is:
-            rows_count = (r - (hdr_row + 1))
-            _append_shuoming_to_block(ws_, header_row=hdr_row, rows_count=rows_count,
-                                    start_col=1, num_cols=len(selected_cols))
-
-
-            # One blank row after the block
-            return r + 1
-
-        # Sections with ONE blank row between them
-        row_ptr = write_section_inline(ws, row_ptr, "超過90天其他應收未沖帳明細", RECEIVABLE_CODES)
-        row_ptr = write_section_inline(ws, row_ptr, "超過90天其他應付費用未沖帳明細", PAYABLE_CODES)
-        row_ptr = write_section_inline(ws, row_ptr, "超過90天其他代收/代付款未沖帳明細", COLLECTION_PAYMENT_CODES)
-
-    # ==== Step 6 (append to 說明): >30天 暫付款/暫收款 未能結清 ====
-    # Reuse df_tmp, selected_cols, src_ws, etc. in current scope.
-
-    ADVANCE_PAY_CODES = {"12810100", "12810200"}   # 暫付款
-    ADVANCE_REC_CODES = {"22810100", "22810200"}   # 暫收款
-
-    # Build 30-day mask
-    age30_mask = df_tmp["_posting_date"].notna() & (
-        (pd.to_datetime(co) - pd.to_datetime(df_tmp["_posting_date"])).dt.days > 30
-    )
-
-    # Start area (2 blank rows after whatever is already on 說明)
-    row_ptr = ws.max_row + 2
-    cell = ws.cell(row=row_ptr, column=1, value="6. 超過30天暫付款/暫收款未能結清的合理性。")
-    cell.font = Font(bold=True)
-    row_ptr += 2  # one blank row before first subsection
-
-    def write_section_30(ws_, start_row: int, section_title: str, codes: set[str]) -> int:
-        """
-        Writes a subsection for 30-day 未結清 with given codes at start_row.
-        Returns next row index after the block + one blank line.
-        """
-        ws_.cell(row=start_row, column=1, value=f"→{section_title}：")
-        code_mask = df_tmp["_code"].isin(codes)
-        sub = df_tmp[uncleared_mask & age30_mask & code_mask].copy()
-
-        if sub.empty:
-            ws_.cell(row=start_row + 1, column=1, value=f"無 {section_title}")
-            return start_row + 2 + 1  # title + line, then 1 blank
-
-        hdr_row = start_row + 1
-        # Header
-        for j, col_name in enumerate(selected_cols, start=1):
-            ws_.cell(row=hdr_row, column=j, value=str(col_name))
-        copy_header_style(src_ws, [df_export.columns.get_loc(c) + 1 for c in selected_cols], ws_, dst_row=hdr_row)
-
-        # Data
-        DATE_COLS = {"文件日期", "過帳日期"}
-        header_to_idx = {h: idx + 1 for idx, h in enumerate(selected_cols)}
-        r = hdr_row + 1
-        for row_vals in sub[selected_cols].itertuples(index=False, name=None):
-            for j, val in enumerate(row_vals, start=1):
-                header = selected_cols[j - 1]
-                v = to_date_value(val) if header in DATE_COLS else val
-                ws_.cell(row=r, column=j, value=v)
+            return last
+
+        # === 9. 補充交叉檢查：科目對之供應商號碼相同者 (supplier column found in step 3) ===
+        if supplier_col is not None:
+            # supplier × account incidence, built once for every pair / screen below
+            supplier_ids = typed["supplier"]
+            incidence = supplier_incidence(typed["code"], supplier_ids)
+            suppliers_of = incidence.groupby("code")["supplier"].agg(set).to_dict()
+
+        def _write_cross_block(ws_, start_row: int, title_text: str,
+                               left_code: str, right_code: str) -> int:
+            ws_.cell(row=start_row, column=1, value=f"→ {title_text}").font = BOLD
+            r = start_row + 1
+
+            if supplier_col is None:
+                ws_.cell(row=r, column=1, value="（找不到供應商欄位，已略過此檢查）")
+                return r
+
+            common_ids = sorted(suppliers_of.get(left_code, set()) & suppliers_of.get(right_code, set()))
+            if not common_ids:
+                ws_.cell(row=r, column=1, value="無相同供應商號碼")
+                return r
+
+            # --- Table: 列示相同供應商號碼清單 ---
+            ws_.cell(row=r, column=1, value="相同供應商號碼清單：")
             r += 1
-
-        # Date format
-        for h in DATE_COLS:
-            if h in header_to_idx:
-                cidx = header_to_idx[h]
-                for rr in range(hdr_row + 1, r):
-                    ws_.cell(row=rr, column=cidx).number_format = "m/d/yyyy"
-
-        # Highlight for all codes in this 30-day subsection
-        for ccode, subgrp in sub.groupby("_code"):
-            _highlight_code_rows(ccode, subgrp)
-
-        rows_count = (r - (hdr_row + 1))
-        _append_shuoming_to_block(ws_, header_row=hdr_row, rows_count=rows_count,
-                                start_col=1, num_cols=len(selected_cols))
-
-        return r + 1  # one blank row after the block
-
-    # Two subsections: 暫付款 / 暫收款
-    row_ptr = write_section_30(ws, row_ptr, "超過30天 暫付款未沖帳明細", ADVANCE_PAY_CODES)
-    row_ptr = write_section_30(ws, row_ptr, "超過30天 暫收款未沖帳明細", ADVANCE_REC_CODES)
-
-    # === Append manual-decision questions (no answers, just text) ===
-    row_ptr = ws.max_row + 2  # leave some blank space
-
-    manual_questions = [
-        "7. 關係人之應收/應付款是否逾期? 原因為何?",
-        "8. 關係人交易科目的餘額是否對帳一致?",
-        "9. 是否有預付/應付、應收/應付、暫付/應付等資產負債虛增之情況。",
-    ]
-
-    for q in manual_questions:
-        cell = ws.cell(row=row_ptr, column=1, value=q)
-        cell.font = Font(bold=True)
-        row_ptr += 2  # add a blank line after each question
-
-    # === 9. 補充交叉檢查：指定科目對之供應商號碼相同者 ===
-    # Pairs:
-    #   12580100 <-> 21780101
-    #   12810100 <-> 22280201
-    CROSS_PAIRS = [
-        ("12580100", "21780101", "12580100 與 21780101 供應商相同"),
-        ("12810100", "22280201", "12810100 與 22280201 供應商相同"),
-    ]
-
-    # Try to locate supplier-id column
-    SUPPLIER_CANDIDATES = ["供應商號碼", "供應商代碼", "供應商", "Vendor", "Vendor Code"]
-    supplier_col = next((c for c in SUPPLIER_CANDIDATES if c in df_tmp.columns), None)
-
-    # Section title
-    row_ptr = ws.max_row + 2
-    ws.cell(row=row_ptr, column=1, value="— 9. 補充交叉檢查（依供應商號碼交集）").font = Font(bold=True)
-    row_ptr += 2
-
-    def _write_cross_block(ws_, start_row: int, title_text: str,
-                           left_code: str, right_code: str) -> int:
-        ws_.cell(row=start_row, column=1, value=f"→ {title_text}").font = Font(bold=True)
-        r = start_row + 1
-
-        if supplier_col is None:
-            ws_.cell(row=r, column=1, value="（找不到供應商欄位，已略過此檢查）")
-            return r + 2
-
-        left  = df_tmp[df_tmp["_code"] == left_code].copy()
-        right = df_tmp[df_tmp["_code"] == right_code].copy()
-
-        # Normalize supplier values to strings for safe set ops
-        left_ids  = set(left[supplier_col].astype(str).str.strip().dropna())
-        right_ids = set(right[supplier_col].astype(str).str.strip().dropna())
-        common_ids = sorted(left_ids & right_ids)
-
-        if not common_ids:
-            ws_.cell(row=r, column=1, value="無相同供應商號碼")
-            return r + 2
-
-        # --- Table: 列示相同供應商號碼清單 ---
-        ws_.cell(row=r, column=1, value="相同供應商號碼清單：")
-        r += 1
-        ws_.cell(row=r, column=1, value=supplier_col)
-        ws_.cell(row=r, column=1).font = Font(bold=True)
-        r += 1
-        for sid in common_ids:
-            ws_.cell(row=r, column=1, value=sid)
+            ws_.cell(row=r, column=1, value=supplier_col)
+            ws_.cell(row=r, column=1).font = BOLD
             r += 1
+            for sid in common_ids:
+                ws_.cell(row=r, column=1, value=sid)
+                r += 1
 
-        # Leave one blank, then details for each side filtered by common supplier ids
-        r += 1
+            # Leave one blank, then details for each side filtered by common supplier ids
+            r += 1
+            shared = supplier_ids.isin(common_ids)
+            for code_label in (left_code, right_code):
+                ws_.cell(row=r, column=1, value=f"{code_label} 明細（僅相同供應商）")
+                df_show = df_export[shared & (df_export["_code"] == code_label)]
+                r = write_table(ws_, r + 1, df_show) + 2      # one blank line after
+            return r - 2
+
+        def cross_pairs(section: dict) -> list[tuple[str, str, str]]:
+            """Listed pairs, then screened pairs (most shared suppliers first) not listed already."""
+            pairs = [(str(p["left"]), str(p["right"]), p.get("title") or f"{p['left']} 與 {p['right']} 供應商相同")
+                     for p in section.get("cross_pairs", ())]
+            screen = section.get("cross_screen")
+            if screen and supplier_col is not None:
+                seen = {frozenset(p[:2]) for p in pairs}
+                for row in supplier_overlap(incidence, screen["left"], screen["right"],
+                                            screen["min_common"]).itertuples(index=False):
+                    if frozenset((row.left, row.right)) not in seen:
+                        pairs.append((row.left, row.right, f"{row.left} 與 {row.right} 供應商相同（{row.common} 家）"))
+            return pairs
+
+        # Sections: bold title; blocks one blank row apart; next section after one blank row
+        last = 0
+        for section in rules["sections"]:
+            title_row = last + 2 if last else 1
+            ws.cell(row=title_row, column=1, value=section["title"]).font = BOLD
+            last = title_row
+            start = title_row + (1 if section.get("compact") else 2)
+            for rule in section.get("rules", ()):
+                end = write_rule_block(ws, start, rule, df_export.iloc[next(matched)])
+                if end is not None:
+                    last, start = end, end + 2
+            for left_code, right_code, text in cross_pairs(section):
+                last = _write_cross_block(ws, start, text, left_code, right_code)
+                start = last + 2
+
+        # === 說明 sheet final touches (NO FILTER) ===
+        ws.freeze_panes = "A2"          # keep header frozen
+        ws.auto_filter.ref = None       # <-- remove filter from row 1
+        _apply_groupings_shuoming(ws)   # skip A–B; group D–E, G, K–L, U–W
+
+        # Optional numeric formatting
+        _format_column_N(ws)            # if you still want N formatted
+
+        # === Format columns L and N in 說明 (if they exist) ===
+
+        col_indexes = []
+        for target_col in ["L", "N"]:
+            try:
+                idx = openpyxl.utils.column_index_from_string(target_col)
+                if idx <= ws.max_column:  # only if column exists
+                    col_indexes.append(idx)
+            except Exception:
+                continue
 
-        def _write_details_block(df_side, code_label: str, row_start: int) -> int:
-            ws_.cell(row=row_start, column=1, value=f"{code_label} 明細（僅相同供應商）")
-            row_start += 1
+        for cidx in col_indexes:
+            for r in range(2, ws.max_row + 1):  # skip header row
+                cell = ws.cell(row=r, column=cidx)
+                # only format if numeric
+                if isinstance(cell.value, (int, float)):
+                    set_style(cell, AMOUNT_STYLE)
 
-            # Header
-            for j, col_name in enumerate(selected_cols, start=1):
-                ws_.cell(row=row_start, column=j, value=str(col_name))
-            copy_header_style(src_ws, [df_export.columns.get_loc(c) + 1 for c in selected_cols], ws_, dst_row=row_start)
-
-            # Rows
-            data_rows = 0
-            if supplier_col in df_side.columns:
-                df_show = df_side[df_side[supplier_col].astype(str).str.strip().isin(common_ids)]
-                for row_vals in df_show[selected_cols].itertuples(index=False, name=None):
-                    row_start += 1
-                    data_rows += 1
-                    for j, val in enumerate(row_vals, start=1):
-                        header = selected_cols[j-1]
-                        v = to_date_value(val) if header in {"文件日期", "過帳日期"} else val
-                        ws_.cell(row=row_start, column=j, value=v)
-
-                # Date formats
-                header_to_idx = {h: idx+1 for idx, h in enumerate(selected_cols)}
-                for h in {"文件日期", "過帳日期"}:
-                    if h in header_to_idx:
-                        cidx = header_to_idx[h]
-                        for rr in range(row_start - data_rows + 1, row_start + 1):
-                            ws_.cell(row=rr, column=cidx).number_format = "m/d/yyyy"
-
-                # Append 說明 column for this block
-                if data_rows:
-                    _append_shuoming_to_block(ws_, header_row=row_start - data_rows, rows_count=data_rows,
-                                              start_col=1, num_cols=len(selected_cols))
-
-            # one blank line after
-            return row_start + 2
-
-        # Details for left & right codes
-        r = _write_details_block(left,  f"{left_code}",  r)
-        r = _write_details_block(right, f"{right_code}", r)
-        return r
-
-    # Run both cross-checks
-    for (lc, rc, title_txt) in CROSS_PAIRS:
-        row_ptr = _write_cross_block(ws, row_ptr, title_txt, lc, rc)
-
-
-    # === 說明 sheet final touches (NO FILTER) ===
-    ws.freeze_panes = "A2"          # keep header frozen
-    ws.auto_filter.ref = None       # <-- remove filter from row 1
-    _apply_groupings_shuoming(ws)   # skip A–B; group D–E, G, K–L, U–W
-
-    # Optional numeric formatting
-    _format_column_N(ws)            # if you still want N formatted
-
-    # === Format columns L and N in 說明 (if they exist) ===
-    NUMBER_FMT = '#,##0;[Red](#,##0)'
-
-    col_indexes = []
-    for target_col in ["L", "N"]:
+        # === 說明 column width adjustment ===
         try:
-            idx = openpyxl.utils.column_index_from_string(target_col)
-            if idx <= ws.max_column:  # only if column exists
-                col_indexes.append(idx)
+            ws.column_dimensions["R"].width = 60   # or 70 if you want more space
         except Exception:
-            continue
-
-    for cidx in col_indexes:
-        for r in range(2, ws.max_row + 1):  # skip header row
-            cell = ws.cell(row=r, column=cidx)
-            # only format if numeric
-            if isinstance(cell.value, (int, float)):
-                cell.number_format = NUMBER_FMT
-
-    # === 說明 column width adjustment ===
-    try:
-        ws.column_dimensions["R"].width = 60   # or 70 if you want more space
-    except Exception:
-        pass
-
-    # 7) remove original sheets in the OUTPUT (not touching your source file if you chose a new file)
-    #    We will always save to output_path; if not inplace, that's a different file.
-    #    Either way, we delete the listed titles if present.
-    to_drop_ci = {t.lower() for t in drop_original_titles}
-    for ws in list(wb.worksheets):
-        if ws.title.lower() in to_drop_ci:
-            del wb[ws.title]
-
-    # 8) save
-    if inplace:
-        wb.save(export_path)
-        saved_to = str(export_path)
-    else:
-        wb.save(output_path)
-        saved_to = str(output_path)
+            pass
+        stage("說明", len(df_export_valid))
+
+        # 7) stream the OUTPUT: 說明, the original sheets not listed in drop_original_titles
+        #    (case-insensitive; your source file is not touched unless --inplace), then
+        #    one sheet per account.
+        to_drop_ci = {t.lower() for t in drop_original_titles}
+        if "說明" in wb.sheetnames and "說明" not in to_drop_ci:
+            stream_copy_sheet(wb["說明"], out.create_sheet("說明"))
+        for title in src_wb.sheetnames:
+            if title != "說明" and title.lower() not in to_drop_ci:
+                stream_copy_readonly(src_wb[title], out.create_sheet(title))
+        stage("copy sheets", len(df_export_valid))
+
+        # Column widths from the template; the grouped (hidden) columns
+        n_cols = len(selected_cols)
+        template_widths = [src_ws.column_dimensions[get_column_letter(i)].width for i in src_col_indexes]
+        hidden = {j for a, b in ACCOUNT_GROUPS for j in range(a, min(b, n_cols) + 1)}
+
+        sheets = []     # (title, write_account_sheet args after header/styles, fingerprint)
+        for code, title in code_to_title.items():
+            if title.lower() in to_drop_ci:
+                continue
+            body = account_frames[title]
+            widths = frame_column_widths({title: body})[title]
+            columns = []
+            for j, tw in enumerate(template_widths, start=1):
+                if j in hidden:
+                    columns.append((tw, True))
+                elif tw and (round(tw, 1) == 1 or tw > widths[j]):   # spacer / wider template width kept
+                    columns.append((tw, False))
+                else:
+                    columns.append((widths[j], False))
+            hl_rows = highlighted.get(code, set())
+            sheets.append((title, body, hl_rows, columns, account_fingerprint(title, body, hl_rows, columns)))
+
+        # Re-runs: sheets whose fingerprint matches the previous output's are copied
+        # from it as they are (their style ids are the same, see `layout`).
+        previous = read_grouping_meta(Path(saved_to), layout) if incremental and not inplace else {}
+        reuse = {title: previous[title]["part"] for title, *_, fp in sheets
+                 if previous.get(title, {}).get("fingerprint") == fp}
+        try:
+            reuse = extract_sheet_parts(saved_to, reuse)     # {title: XML part file}
+        except (KeyError, OSError, zipfile.BadZipFile):
+            reuse = {}
+
+        # Big outputs: account sheets are rendered as worksheet XML parts in worker
+        # processes and spliced into the saved package; they share the output's
+        # style table (ids registered in step 5).
+        to_render = [s for s in sheets if s[0] not in reuse]
+        workers = min(workers or os.cpu_count() or 1, len(to_render))
+        if sum(len(body) for _, body, *_ in to_render) < PARALLEL_MIN_ROWS:
+            workers = 1
+        header_ids = [tuple(a) if a is not None else None for a in header_styles]
+        look_ids = {k: tuple(a) if a is not None else None for k, a in looks.items()}
+        account_sheets = []     # (output sheet, fingerprint)
+        spliced = []            # (placeholder sheet, XML part file)
+        with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as ex:
+            for title, body, hl_rows, columns, fp in sheets:
+                ws_ = out.create_sheet(title)
+                account_sheets.append((ws_, fp))
+                if ex is None and title not in reuse:
+                    write_account_sheet(ws_, selected_cols, header_styles, body, col_styles, looks,
+                                        hl_rows, columns, highlight_dxf)
+                    stage("account sheets", len(body))
+                    continue
+                # empty placeholder keeps the sheet order (and the filter's defined name)
+                ws_.auto_filter.ref = account_filter_ref(n_cols, len(body), bool(hl_rows))
+                if title in reuse:
+                    spliced.append((ws_, reuse[title]))
+                    stage("account sheets", len(body))
+                else:
+                    futures.append((ws_, len(body),
+                                    ex.submit(render_account_part, cell_styles, title, selected_cols, header_ids,
+                                              body, col_styles, look_ids, hl_rows, columns, highlight_dxf)))
+            for ws_, n_rows, f in futures:
+                spliced.append((ws_, f.result()))
+                stage("account sheets", n_rows)
+
+        # 8) save
+        src_wb.close()
+        out.save(saved_to)
+        replace_sheet_parts(saved_to, {ws_.path[1:]: part for ws_, part in spliced})   # sheet paths are final once saved
+        if not inplace:     # an in-place output is the next run's input, nothing to reuse
+            write_grouping_meta(Path(saved_to), layout,
+                                {ws_.title: {"fingerprint": fp, "part": ws_.path[1:]} for ws_, fp in account_sheets})
+        stage("save", len(df_export_valid))
+    except BaseException:
+        # cancelled (on_stage raised) or failed: leave nothing half-written behind, neither
+        # the unsaved output's sheet files nor part files that were not spliced in
+        if out is not None:
+            discard_write_only(out)
+        rendered = [f.result() for *_, f in futures if f.done() and not f.cancelled() and f.exception() is None]
+        for part in chain(reuse.values(), rendered):
+            Path(part).unlink(missing_ok=True)
+        Path(saved_to + ".tmp").unlink(missing_ok=True)
+        raise
+    finally:
+        src_wb.close()
 
     return {
         "export_sheet": sheet_used,
         "gl_col": gl_col,
         "unique_accounts": int(df_export_valid["_code"].nunique()),
         "rows_grouped": int(len(df_export_valid)),
+        "sheets_reused": len(reuse),
         "saved_to": saved_to,
         "columns_B_to_X": selected_cols,
         "date_columns_formatted": sorted(date_cols_set),
@@ -898,6 +1108,115 @@ def group_export_by_account(
     }
 
 
+# ---------------- batch ----------------
+
+def load_manifest(path: Path) -> list[dict]:
+    """
+    Jobs of a batch manifest: JSON {"jobs": [{"export", "cutoff", "output", "sheet"}]}
+    (or just the list). Only "export" is required; cutoff defaults to today and
+    output to <export>_grouped.xlsx, or <export>_<cutoff>_grouped.xlsx when the
+    export is listed more than once. Relative paths are taken from the manifest's folder.
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    jobs = cfg.get("jobs") if isinstance(cfg, dict) else cfg
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError(f"{path.name}: 'jobs' must be a non-empty list")
+
+    out = []
+    for i, job in enumerate(jobs, start=1):
+        if not job.get("export"):
+            raise ValueError(f"{path.name}: job {i} has no 'export'")
+        try:
+            cutoff = datetime.strptime(job["cutoff"], "%Y-%m-%d").date() if job.get("cutoff") else date.today()
+        except ValueError:
+            raise ValueError(f"{path.name}: job {i} cutoff must be YYYY-MM-DD (e.g., 2025-06-30)") from None
+        export = (path.parent / job["export"]).expanduser().resolve()
+        output = (path.parent / job["output"]).expanduser().resolve() if job.get("output") else None
+        out.append({"n": i, "export": export, "cutoff": cutoff, "output": output, "sheet": job.get("sheet")})
+
+    listed = {}
+    for job in out:
+        listed[job["export"]] = listed.get(job["export"], 0) + 1
+    for job in out:
+        if job["output"] is None:
+            e = job["export"]
+            stem = e.stem if listed[e] == 1 else f"{e.stem}_{job['cutoff']:%Y%m%d}"
+            job["output"] = e.with_name(stem + "_grouped.xlsx")
+    seen = set()
+    for job in out:
+        if job["output"] in seen or job["output"] == job["export"]:
+            raise ValueError(f"{path.name}: output {job['output'].name} is used twice")
+        seen.add(job["output"])
+    return out
+
+def run_export_jobs(jobs: list[dict], mapping: dict[str, str], rules: dict, drop_original_titles: list[str],
+                    date_columns: list[str], workers: int | None = None,
+                    incremental: bool = True) -> list[tuple[dict, dict | str]]:
+    """
+    All jobs on one export (same sheet): its rows are parsed once and every
+    cutoff is grouped from that frame. Returns (job, stats or error text) per job.
+    """
+    results = []
+    try:
+        frame, _ = load_export_frame(jobs[0]["export"], jobs[0]["sheet"])
+    except Exception as e:
+        return [(job, f"{type(e).__name__}: {e}") for job in jobs]
+    for job in jobs:
+        try:
+            stats = group_export_by_account(
+                export_path=job["export"],
+                mapping_path=mapping,
+                output_path=job["output"],
+                sheet_name=job["sheet"],
+                inplace=False,
+                drop_original_titles=drop_original_titles,
+                date_columns=date_columns,
+                cutoff_date=job["cutoff"],
+                frame=frame,
+                rules=rules,
+                workers=workers,
+                incremental=incremental,
+            )
+            results.append((job, stats))
+        except Exception as e:
+            results.append((job, f"{type(e).__name__}: {e}"))
+    return results
+
+def run_batch(manifest_path: Path, mapping_path: Path, rules: Path | str | None,
+              drop_original_titles: list[str], date_columns: list[str],
+              workers: int | None = None, incremental: bool = True) -> list[tuple[dict, dict | str]]:
+    """
+    Run a manifest: the mapping and rules are loaded once, jobs are grouped per
+    export, and exports run side by side in a process pool (largest first).
+    With a single process, the account sheets of each job may use the pool instead.
+    """
+    jobs = load_manifest(manifest_path)
+    mapping = load_mapping(mapping_path)
+    rules = load_rules(rules)
+
+    by_export: dict[tuple, list[dict]] = {}
+    for job in jobs:
+        by_export.setdefault((job["export"], job["sheet"]), []).append(job)
+    groups = sorted(by_export.values(), key=lambda g: g[0]["export"].stat().st_size
+                    if g[0]["export"].exists() else 0, reverse=True)
+
+    n = min(workers or os.cpu_count() or 1, len(groups))
+    results = []
+    if n == 1:
+        for g in groups:
+            results.extend(run_export_jobs(g, mapping, rules, drop_original_titles, date_columns, workers,
+                                           incremental))
+    else:
+        with ProcessPoolExecutor(max_workers=n) as ex:
+            futures = [ex.submit(run_export_jobs, g, mapping, rules, drop_original_titles, date_columns, 1,
+                                 incremental) for g in groups]
+            for fut in as_completed(futures):
+                results.extend(fut.result())
+    return sorted(results, key=lambda r: r[0]["n"])
+
+
 # ---------------- CLI ----------------
 
 def main():
@@ -919,6 +1238,20 @@ def main():
     
     p.add_argument("--cutoff", default=None,
                help="Cutoff date for 'older than 30 days' checks, e.g. 2025-06-30. Defaults to today.")
+    p.add_argument("--sidecar", default=None,
+                   help="Parquet/pickle sidecar with the export rows (default: <export>.parquet when it was "
+                        "written for this workbook; a .pkl is only read when named here)")
+    p.add_argument("--rules", default=None,
+                   help="說明 rule file (JSON; default: shuoming_rules.json next to this script)")
+    p.add_argument("--workers", type=int, default=None,
+                   help=f"Processes rendering account sheets (default: CPU count; 1 = sequential). "
+                        f"Used from {PARALLEL_MIN_ROWS:,} grouped rows; with --batch, exports run side by side.")
+    p.add_argument("--batch", default=None,
+                   help="JSON manifest of (export, cutoff, output) jobs, run with one mapping load; "
+                        "--export/--output/--cutoff/--sheet/--sidecar/--inplace are ignored")
+    p.add_argument("--full", action="store_true",
+                   help="Re-render every account sheet, even those unchanged since the previous output "
+                        "(default: reuse them, see <output>.groups.json)")
     
     args = p.parse_args()
     if args.cutoff:
@@ -933,17 +1266,36 @@ def main():
 
     export_path = Path(args.export).expanduser().resolve()
     mapping_path = Path(args.mapping).expanduser().resolve()
+    drop_original_titles = [t.strip() for t in args.drop_sheets.split(",") if t.strip()]
+    date_columns = [t.strip() for t in args.date_cols.split(",") if t.strip()]
 
-    if not export_path.exists():
-        print(f"[ERROR] Export file not found: {export_path}", file=sys.stderr)
-        sys.exit(2)
     if not mapping_path.exists():
         print(f"[ERROR] Mapping file not found: {mapping_path}", file=sys.stderr)
         sys.exit(2)
 
+    if args.batch:
+        try:
+            results = run_batch(Path(args.batch), mapping_path, args.rules,
+                                drop_original_titles, date_columns, args.workers, not args.full)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(2)
+        failed = 0
+        for job, res in results:
+            if isinstance(res, dict):
+                print(f"[OK] {job['export'].name} @ {job['cutoff']} → {res['saved_to']} "
+                      f"({res['rows_grouped']:,} rows, {res['unique_accounts']} accounts)")
+            else:
+                failed += 1
+                print(f"[ERROR] {job['export'].name} @ {job['cutoff']}: {res}", file=sys.stderr)
+        print(f"[OK] Batch complete: {len(results) - failed}/{len(results)} jobs.")
+        sys.exit(1 if failed else 0)
+
+    if not export_path.exists():
+        print(f"[ERROR] Export file not found: {export_path}", file=sys.stderr)
+        sys.exit(2)
+
     output_path = choose_output_path(export_path, args.inplace, args.output)
-    drop_original_titles = [t.strip() for t in args.drop_sheets.split(",") if t.strip()]
-    date_columns = [t.strip() for t in args.date_cols.split(",") if t.strip()]
 
     stats = group_export_by_account(
         export_path=export_path,
@@ -954,6 +1306,10 @@ def main():
         cutoff_date=cutoff_date,  
         drop_original_titles=drop_original_titles,
         date_columns=date_columns,
+        frame=args.sidecar,
+        rules=args.rules,
+        workers=args.workers,
+        incremental=not args.full,
     )
 
     print("[OK] Grouping complete.")
@@ -1,16 +1,34 @@
 #!/usr/bin/env python3
+from __future__ import annotations
 import argparse
+import base64
+import binascii
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
 import sys
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
+from typing import Callable, NamedTuple
+import numpy as np
 import pandas as pd
+from lxml import etree
+from pandas.io.parsers import TextParser
 
-from openpyxl import load_workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from unicodedata import east_asian_width
+from openpyxl.cell import WriteOnlyCell
 
-
-from group_by_gl import group_export_by_account, choose_output_path
+from sheet_styles import (
+    HEADER_STYLE, _text_display_units, column_width, discard_write_only, max_display_units, new_arial_workbook,
+    set_column_widths_in_file,
+)
+from group_by_gl import group_export_by_account, SidecarWriter
 from datetime import datetime, date
 
 
@@ -18,192 +36,613 @@ from pathlib import Path
 import pandas as pd
 
 
-def _text_display_units(s: str) -> float:
+def _peek_bytes(path: Path, n=4096) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(n)
+
+def file_digest(path: Path) -> str:
+    """Content hash of a file (blake2b, streamed in 1 MB blocks)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FileFormat(NamedTuple):
+    kind: str                  # key into DECODERS
+    encoding: str | None = None
+    sep: str | None = None
+
+
+OLE2 = b"\xD0\xCF\x11\xE0"   # real .xls
+ZIP  = b"PK\x03\x04"         # real .xlsx
+MHTML_MARKERS = (b"mime-version", b"content-type: multipart")
+HTML_MARKERS  = (b"<html", b"<!doctype", b"<table", b"<pre")
+XML_MARKERS   = (b"<workbook", b"urn:schemas-microsoft-com:office:spreadsheet")
+
+DECODERS: dict[str, Callable[[Path, FileFormat], pd.DataFrame]] = {}
+
+
+def decoder(kind: str):
+    def register(fn):
+        DECODERS[kind] = fn
+        return fn
+    return register
+
+
+def _sniff_text_encoding(head: bytes) -> str:
+    if head.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    try:
+        head.decode("utf-8")
+        return "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # A multi-byte char cut off by the 4 KB window is still UTF-8
+        if e.start >= len(head) - 3:
+            return "utf-8-sig"
+    return "cp950"
+
+
+def sniff_format(head: bytes) -> FileFormat:
+    """Classify a file from its first bytes: ZIP/OLE2/MHTML/HTML/SpreadsheetML/TSV/CSV."""
+    if head.startswith(ZIP):
+        return FileFormat("xlsx")
+    if head.startswith(OLE2):
+        return FileFormat("xls")
+
+    encoding = _sniff_text_encoding(head)
+    low = head.decode(encoding if encoding != "utf-8-sig" else "utf-8", errors="ignore").lower().encode()
+    if any(k in low for k in MHTML_MARKERS):
+        return FileFormat("mhtml", encoding)
+    if any(k in low for k in HTML_MARKERS):
+        return FileFormat("html", encoding)
+    if any(k in low for k in XML_MARKERS):
+        return FileFormat("spreadsheetml", encoding)
+
+    first_line = low.split(b"\n", 1)[0]
+    return FileFormat("tsv" if b"\t" in first_line else "csv", encoding,
+                      "\t" if b"\t" in first_line else ",")
+
+
+def detect_format(path: Path) -> FileFormat:
+    """Format decision for `path`, from its first bytes only."""
+    return sniff_format(_peek_bytes(path))
+
+
+@decoder("xlsx")
+def _decode_xlsx(p: Path, fmt: FileFormat) -> pd.DataFrame:
+    return pd.read_excel(p, sheet_name=0, engine="openpyxl")
+
+@decoder("xls")
+def _decode_xls(p: Path, fmt: FileFormat) -> pd.DataFrame:
+    return pd.read_excel(p, sheet_name=0, engine="xlrd")
+
+READ_BLOCK = 1 << 16
+_WS = re.compile(r"[\r\n]+|\s{2,}")          # same whitespace folding as pd.read_html
+_CHARSET = re.compile(rb"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+
+
+def _html_encoding(head: bytes, fallback: str | None) -> str:
+    """<meta charset> / MIME charset if declared, else the sniffed text encoding."""
+    m = _CHARSET.search(head)
+    enc = m.group(1).decode("ascii") if m else (fallback or "utf-8")
+    return "utf-8" if enc.lower() in ("utf-8-sig", "utf8") else enc
+
+def _file_blocks(p: Path):
+    with open(p, "rb") as f:
+        yield from iter(lambda: f.read(READ_BLOCK), b"")
+
+def _mhtml_html_blocks(p: Path):
     """
-    Approximate Excel display width in 'character' units.
-    Count wide CJK as ~1.7x.
+    Bytes of the first text/html part of an MHTML file, decoded line by line
+    (quoted-printable / base64 / 7bit), without loading the whole file.
     """
-    if s is None:
-        return 0.0
-    s = str(s)
-    total = 0.0
-    for ch in s:
-        total += 1.7 if east_asian_width(ch) in ("W", "F") else 1.0
-    return total
-
-def enforce_arial_font(wb):
+    boundary = None
+    with open(p, "rb") as f:
+        # Top-level headers → boundary
+        for line in f:
+            m = re.search(rb'boundary\s*=\s*"?([^";\r\n]+)"?', line, re.I)
+            if m:
+                boundary = b"--" + m.group(1).strip()
+            if not line.strip() and boundary:
+                break
+        if boundary is None:
+            return
+        while True:
+            # Part headers
+            headers = {}
+            for line in f:
+                if not line.strip():
+                    if headers:
+                        break
+                    continue
+                if line.startswith(boundary):
+                    continue
+                k, _, v = line.decode("latin-1").partition(":")
+                headers[k.strip().lower()] = v.strip().lower()
+            else:
+                return
+            is_html = headers.get("content-type", "").startswith("text/html")
+            cte = headers.get("content-transfer-encoding", "")
+            decode = {"quoted-printable": binascii.a2b_qp, "base64": base64.b64decode}.get(cte, bytes)
+            buf, size = [], 0
+            for line in f:
+                if line.startswith(boundary):
+                    break
+                if not is_html:
+                    continue
+                # Decode whole lines in ~64 KB batches (QP soft breaks and base64 quanta never span lines)
+                buf.append(line.strip() if cte == "base64" else line)
+                size += len(line)
+                if size >= READ_BLOCK and (cte != "base64" or sum(map(len, buf)) % 4 == 0):
+                    yield decode(b"".join(buf))
+                    buf, size = [], 0
+            if is_html:
+                if buf:
+                    yield decode(b"".join(buf))
+                return
+
+def _cell_text(td) -> str:
+    t = (td.text or "") if len(td) == 0 else "".join(td.itertext())
+    return _WS.sub(" ", t).strip()
+
+def stream_widest_table(blocks, encoding: str) -> tuple[list[list[str]], str | None]:
     """
-    Switch only the font family to Arial, keep size/bold/italic/color/etc.
+    Incrementally parse HTML and return (rows of the widest <table>, first <pre> text).
+    Rows are collected as each </tr> closes and the element is dropped right away,
+    so no document tree is kept; only the best table's rows so far are held.
+    colspan / rowspan are expanded like pd.read_html does.
     """
-    for ws in wb.worksheets:
-        for row in ws.iter_rows():
-            for cell in row:
-                f = cell.font
-                # Only change if needed; Font is immutable → create a new one.
-                if f is None or f.name != "Arial":
-                    cell.font = Font(
-                        name="Arial",
-                        sz=f.sz if f else None,
-                        b=f.b if f else None,
-                        i=f.i if f else None,
-                        color=f.color if f else None,
-                        underline=f.u if f else None,
-                        strike=f.strike if f else None,
-                        vertAlign=f.vertAlign if f else None
-                    )
-
-def autofit_columns(ws, min_width=6, max_width=60, padding=2.0, skip_widths={1}):
+    parser = etree.HTMLPullParser(events=("end",), tag=("tr", "table", "pre"), encoding=encoding, recover=True)
+    tables: dict[int, dict] = {}      # id(<table>) → {"rows": [...], "spans": [...]}
+    best, best_width, pre_text = [], 0, None
+
+    def handle(event, el):
+        nonlocal best, best_width, pre_text
+        tag = el.tag
+        if tag == "tr":
+            table = next(el.iterancestors("table"), None)
+            if table is None:
+                return
+            st = tables.setdefault(id(table), {"rows": [], "spans": []})
+            texts, spans, idx = [], [], 0
+            pending = list(st["spans"])       # (col index, text, rows left) from rowspans above
+            for td in el:
+                if not isinstance(td.tag, str) or td.tag not in ("td", "th"):
+                    continue
+                while pending and pending[0][0] <= idx:
+                    i, t, left = pending.pop(0)
+                    texts.append(t)
+                    if left > 1:
+                        spans.append((i, t, left - 1))
+                    idx += 1
+                text = _cell_text(td)
+                rowspan = int(td.get("rowspan") or 1)
+                for _ in range(int(td.get("colspan") or 1)):
+                    texts.append(text)
+                    if rowspan > 1:
+                        spans.append((idx, text, rowspan - 1))
+                    idx += 1
+            for i, t, left in pending:
+                texts.append(t)
+                if left > 1:
+                    spans.append((i, t, left - 1))
+            st["rows"].append(texts)
+            st["spans"] = spans
+            el.clear()
+            el.getparent().remove(el)
+        elif tag == "table":
+            st = tables.pop(id(el), None)
+            if st and st["rows"]:
+                width = max(len(r) for r in st["rows"])
+                if width > best_width:
+                    best, best_width = st["rows"], width
+            el.clear()
+        elif tag == "pre" and pre_text is None:
+            pre_text = "".join(el.itertext())
+            el.clear()
+
+    for block in blocks:
+        parser.feed(block)
+        for event, el in parser.read_events():
+            handle(event, el)
+    parser.close()
+    for event, el in parser.read_events():
+        handle(event, el)
+
+    for row in best:                   # ragged rows are padded, as in read_html
+        row.extend([""] * (best_width - len(row)))
+    return best, pre_text
+
+@decoder("html")
+@decoder("mhtml")
+def _decode_html(p: Path, fmt: FileFormat) -> pd.DataFrame:
+    if fmt.kind == "mhtml":
+        blocks = _mhtml_html_blocks(p)
+        head = next(blocks, b"")
+        encoding = _html_encoding(_peek_bytes(p) + head[:4096], fmt.encoding)
+        blocks = (b for part in ([head], blocks) for b in part)
+    else:
+        encoding = _html_encoding(_peek_bytes(p), fmt.encoding)
+        blocks = _file_blocks(p)
+    rows, pre_text = stream_widest_table(blocks, encoding)
+
+    if not rows or len(rows[0]) == 1:
+        # Sometimes it's actually tab-delimited text in <pre>
+        if pre_text is not None:
+            return pd.read_csv(io.StringIO(pre_text), sep="\t", engine="python")
+        if not rows:
+            raise ValueError(f"No table found in HTML export {p.name}")
+    # Same typing (numbers, thousands separators, blanks → NaN) as pd.read_html
+    with TextParser(rows, header=0, thousands=",") as tp:
+        return tp.read()
+
+@decoder("spreadsheetml")
+def _decode_spreadsheetml(p: Path, fmt: FileFormat) -> pd.DataFrame:
+    # Excel 2003 XML (rare). Often better to open in Excel and Save As .xlsx
+    try:
+        return pd.read_xml(p, encoding=fmt.encoding)
+    except Exception as e:
+        raise ValueError(f"Excel 2003 XML detected; please Save As .xlsx. ({e})")
+
+@decoder("tsv")
+@decoder("csv")
+def _decode_text(p: Path, fmt: FileFormat) -> pd.DataFrame:
+    # The encoding was sniffed from the first 4 KB only: a cp950 file whose head is
+    # plain ASCII (header + numeric rows) looks like UTF-8 there, so fall back.
+    encodings = list(dict.fromkeys([fmt.encoding or "utf-8-sig", "utf-8-sig", "cp950"]))
+    for enc in encodings[:-1]:
+        try:
+            return pd.read_csv(p, sep=fmt.sep or ",", engine="python", encoding=enc)
+        except UnicodeError:
+            pass
+    return pd.read_csv(p, sep=fmt.sep or ",", engine="python", encoding=encodings[-1])
+
+
+def read_first_sheet(path: Path) -> pd.DataFrame:
+    p = Path(path)
+    fmt = detect_format(p)
+    return DECODERS[fmt.kind](p, fmt)
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = [str(c).strip() for c in df.columns]
+    return df
+
+def _path_key(p) -> Path:
+    return Path(p).expanduser().resolve()
+
+def _load_one(path: Path) -> pd.DataFrame:
+    return normalize_columns(read_first_sheet(path))
+
+def iter_inputs(paths, workers: int | None = None, cache: dict[Path, pd.DataFrame] | None = None):
     """
-    Auto-size visible columns based on header + cell content.
-    - Respects hidden columns.
-    - Skips columns explicitly set to very narrow spacer widths (e.g., 1).
-    - Preserves merged cells/number formats/wrap.
+    Yield (resolved path, DataFrame) for each distinct file in `paths`, in order.
+    Decoding runs in a process pool with at most `workers` files in flight, so only
+    those frames (plus whatever is in `cache`) are held in memory at once.
+    Frames already in `cache` are yielded without being read again.
     """
-    dims = ws.column_dimensions
-    # Figure header row (first row with any value; fallback to row 1)
-    header_row_idx = 1
-    try:
-        for r in range(1, ws.max_row + 1):
-            if any(ws.cell(r, c).value not in (None, "") for c in range(1, ws.max_column + 1)):
-                header_row_idx = r
-                break
-    except Exception:
-        header_row_idx = 1
-
-    for col_idx in range(1, ws.max_column + 1):
-        col_letter = ws.cell(row=1, column=col_idx).column_letter
-        cd = dims[col_letter] if col_letter in dims else None
-
-        # Skip hidden columns
-        if cd and getattr(cd, "hidden", False):
-            continue
-        # Skip spacer columns: width explicitly set to ~1
-        if cd and cd.width is not None and round(cd.width, 1) in {float(w) for w in skip_widths}:
-            continue
-
-        # Measure header + all non-empty cells
-        max_units = 0.0
-        header_val = ws.cell(header_row_idx, col_idx).value
-        max_units = max(max_units, _text_display_units(header_val))
-
-        for row in ws.iter_rows(min_row=header_row_idx + 1,
-                                max_row=ws.max_row,
-                                min_col=col_idx, max_col=col_idx):
-            cell = row[0]
-            val = cell.value
-            if val is None or val == "":
+    unique = list(dict.fromkeys(_path_key(p) for p in paths))
+    cache = cache or {}
+    todo = [p for p in unique if p not in cache]
+    workers = min(workers or os.cpu_count() or 1, max(len(todo), 1))
+
+    if workers == 1:
+        for p in unique:
+            yield p, cache[p] if p in cache else _load_one(p)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        pending = deque()
+        queue = iter(todo)
+        for p in islice(queue, workers):
+            pending.append((p, ex.submit(_load_one, p)))
+        for p in unique:
+            if p in cache:
+                yield p, cache[p]
                 continue
-            # Use number/date displayed text length approximation
-            text = str(val)
-            max_units = max(max_units, _text_display_units(text))
+            q, fut = pending.popleft()
+            nxt = next(queue, None)
+            if nxt is not None:
+                pending.append((nxt, ex.submit(_load_one, nxt)))
+            yield q, fut.result()
 
-        # Convert to Excel width units (rough heuristic)
-        desired = max_units + padding
-        desired = max(min_width, min(max_width, desired))
+DATE_COLS = ["文件日期", "過帳日期"]
+CHUNK_ROWS = 50_000
 
-        # Don’t shrink columns that already have a larger explicit width
-        if cd and cd.width and cd.width > desired:
-            continue
 
-        dims[col_letter].width = desired
 
+def _format_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for col in DATE_COLS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce").dt.strftime("%Y-%m-%d")
+    return df
 
-def _first_numeric_format(ws, col_letter, start_row=2):
-    for r in range(start_row, ws.max_row + 1):
-        v = ws[f"{col_letter}{r}"].value
-        if isinstance(v, (int, float)):
-            fmt = ws[f"{col_letter}{r}"].number_format
-            if fmt and fmt != "General":
-                return fmt
-    return None
-
-def _apply_number_format(ws, col_letter, number_format, start_row=2):
-    for r in range(start_row, ws.max_row + 1):
-        c = ws[f"{col_letter}{r}"]
-        if isinstance(c.value, (int, float)):
-            c.number_format = number_format
+# A date as text in any export: 2020/05/03, 2020-5-3, 2020.05.03, 2020-05-03 00:00:00
+_DATE_TEXT = re.compile(r"^(\d{4})[/.-](\d{1,2})[/.-](\d{1,2})(?:[ T]00:00:00)?$")
 
-def align_col_L_to_col_N(ws):
-    fmt = _first_numeric_format(ws, "N") or "#,##0;[Red](#,##0)"
-    _apply_number_format(ws, "L", fmt)
+def _iso_date(m: re.Match) -> str:
+    return f"{m[1]}-{int(m[2]):02d}-{int(m[3]):02d}"
 
+def _normalized_for_fingerprint(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Canonical text per cell so the same SAP value hashes the same whichever
+    export it came from: stripped strings, 100001646.0 → '100001646',
+    dates → YYYY-MM-DD (datetime columns, datetimes in object columns read
+    from xlsx, and date text such as 2020/05/03 from HTML / text exports),
+    blanks/NaN → ''.
+    """
+    out = {}
+    for c in df.columns:
+        col = df[c]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            txt = col.dt.strftime("%Y-%m-%d")
+        else:
+            txt = col.astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+            txt = txt.str.replace(_DATE_TEXT, _iso_date, regex=True)
+        out[c] = txt.where(col.notna(), "")
+    return pd.DataFrame(out, index=df.index)
+
+
+class RowDeduper:
+    """
+    Streaming exact-duplicate filter over 64-bit row fingerprints.
 
-def _peek_bytes(path: Path, n=4096) -> bytes:
-    with open(path, "rb") as f:
-        return f.read(n)
+    Fingerprints of rows already seen are kept as a sorted uint64 array; once
+    it exceeds `memory_budget` entries it is spilled to a sorted .npy run on
+    disk (memory-mapped for lookups) and a fresh in-memory array is started.
+    Memory is therefore bounded by `memory_budget * 8` bytes plus one chunk.
+    Duplicates dropped are counted per input name.
+    """
 
-def read_first_sheet(path: Path) -> pd.DataFrame:
-    p = Path(path)
-    head = _peek_bytes(p)
-    suffix = p.suffix.lower()
-
-    OLE2 = b"\xD0\xCF\x11\xE0"   # real .xls
-    ZIP  = b"PK\x03\x04"         # real .xlsx
-    html_markers = (b"<html", b"<!doctype", b"mhtml", b"mime-ver", b"content-type:", b"<table")
-    xml_markers  = (b"<?xml", b"<Workbook", b"urn:schemas-microsoft-com:office:spreadsheet")
-
-    # 1) True Excel
-    if head.startswith(ZIP) or suffix == ".xlsx":
-        return pd.read_excel(p, sheet_name=0, engine="openpyxl")
-    if head.startswith(OLE2) and suffix == ".xls":
-        return pd.read_excel(p, sheet_name=0, engine="xlrd")
-
-    # 2) HTML/MHTML "fake .xls"
-    if any(k in head.lower() for k in html_markers):
-        tables = pd.read_html(p, header=0)  # take first row as header
-        df = max(tables, key=lambda t: t.shape[1])  # widest table
-        if df.shape[1] == 1:
-            # Sometimes it's actually tab-delimited text in <pre>
-            try:
-                return pd.read_csv(p, sep="\t", engine="python", encoding="utf-8-sig")
-            except Exception:
-                try:
-                    return pd.read_csv(p, sep="\t", engine="python", encoding="cp950")
-                except Exception:
-                    pass
-        return df
-
-    # 3) Excel 2003 XML (rare)
-    if any(k in head for k in xml_markers):
-        # Often better to open in Excel and Save As .xlsx; we can try xml:
+    def __init__(self, memory_budget: int = 4_000_000, spill_dir: Path | None = None):
+        self.memory_budget = memory_budget
+        self._spill_root = spill_dir
+        self._spill_dir = None
+        self._mem = np.empty(0, dtype=np.uint64)
+        self._runs: list[np.ndarray] = []
+        self.dropped: dict[str, int] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._runs = []
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+    @staticmethod
+    def fingerprints(df: pd.DataFrame) -> np.ndarray:
+        return pd.util.hash_pandas_object(_normalized_for_fingerprint(df), index=False).to_numpy(np.uint64)
+
+    @staticmethod
+    def _contains(sorted_arr: np.ndarray, fps: np.ndarray) -> np.ndarray:
+        if len(sorted_arr) == 0:
+            return np.zeros(len(fps), dtype=bool)
+        idx = np.searchsorted(sorted_arr, fps)
+        idx[idx == len(sorted_arr)] = 0
+        return np.asarray(sorted_arr[idx]) == fps
+
+    def _spill(self):
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix="merge_dedup_", dir=self._spill_root))
+        run_path = self._spill_dir / f"run{len(self._runs):04d}.npy"
+        np.save(run_path, self._mem)
+        self._runs.append(np.load(run_path, mmap_mode="r"))
+        self._mem = np.empty(0, dtype=np.uint64)
+
+    def filter(self, df: pd.DataFrame, source: str = "") -> pd.DataFrame:
+        """Return the rows of `df` not seen before (in this chunk or any earlier one)."""
+        if df.empty:
+            return df
+        fps = self.fingerprints(df)
+        dup = pd.Series(fps).duplicated().to_numpy(copy=True)   # repeats inside this chunk
+        dup |= self._contains(self._mem, fps)
+        for run in self._runs:
+            dup |= self._contains(run, fps)
+
+        new = np.unique(fps[~dup])
+        self._mem = np.union1d(self._mem, new)
+        if len(self._mem) > self.memory_budget:
+            self._spill()
+
+        n_dup = int(dup.sum())
+        if n_dup:
+            self.dropped[source] = self.dropped.get(source, 0) + n_dup
+        return df[~dup]
+
+
+def _excel_rows(df: pd.DataFrame):
+    """Rows as plain tuples with NaN/NA/NaT → None, ready for a write-only sheet."""
+    obj = df.astype(object)
+    return obj.where(obj.notna(), None).itertuples(index=False, name=None)
+
+
+def write_merged_streaming(frames, ref_cols: list[str], out_path: Path,
+                           deduper: RowDeduper | None = None, chunk_size: int = CHUNK_ROWS,
+                           sheet_name: str = "Sheet1", sidecar: bool = True,
+                           on_stage: Callable[[str, int], None] | None = None) -> int:
+    """
+    Project each (name, frame) from `frames` onto `ref_cols` and append it,
+    `chunk_size` rows at a time, to a write-only workbook. Only the current
+    chunk is materialised for output, so peak memory is bounded by the largest
+    input plus one chunk rather than by the total merged row count.
+    Rows are passed through `deduper` (if given) as they flow by.
+    Fonts (Arial) and autofit widths are emitted here, so the file is written once.
+    With `sidecar`, each written chunk is also appended to a Parquet file next to
+    `out_path` (see group_by_gl.SidecarWriter), so grouping does not parse the
+    xlsx again.
+    `on_stage(name, rows)` is called after each step on a chunk ("merge":
+    projected, "dedup", "write": appended to the sheet and sidecar) and once
+    the file is saved ("save"), so benchmark.py can time the interleaved stages.
+    Returns the number of data rows written.
+    """
+    stage = on_stage or (lambda name, rows: None)
+    wb = new_arial_workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    units = [_text_display_units(c) for c in ref_cols]
+
+    header = []
+    for col in ref_cols:
+        c = WriteOnlyCell(ws, value=col)
+        c.style = HEADER_STYLE      # group_by_gl copies this look onto account sheets
+        header.append(c)
+    ws.append(header)
+
+    written = 0
+    side = SidecarWriter(out_path) if sidecar else None
+    try:
         try:
-            return pd.read_xml(p)
-        except Exception as e:
-            raise ValueError(f"Excel 2003 XML detected; please Save As .xlsx. ({e})")
+            for name, df in frames:
+                for start in range(0, len(df), chunk_size):
+                    chunk = df.iloc[start:start + chunk_size].reindex(columns=ref_cols)
+                    chunk = _format_date_columns(chunk)      # before dedup: one date text for every format
+                    stage("merge", len(chunk))
+                    if deduper is not None:
+                        chunk = deduper.filter(chunk, source=name)
+                        stage("dedup", len(chunk))
+                    for j, col in enumerate(ref_cols):
+                        units[j] = max(units[j], max_display_units(chunk.iloc[:, j]))
+                    for row in _excel_rows(chunk):
+                        ws.append(row)
+                    written += len(chunk)
+                    if side is not None:
+                        side.write(chunk)
+                    stage("write", len(chunk))
+        except BaseException:   # e.g. a cancelled GUI run: drop the half-written sheet
+            discard_write_only(wb)
+            raise
+        wb.save(out_path)
+        # Widths are only known after the last row; patch them into the saved sheet
+        set_column_widths_in_file(out_path, {j: column_width(u) for j, u in enumerate(units, start=1)})
+    except BaseException:
+        if side is not None:
+            side.abort()
+        raise
+    if side is not None:
+        side.close()
+    stage("save", written)
+    return written
+
+
+def print_dedup_report(deduper: RowDeduper | None):
+    if deduper is None:
+        return
+    total = sum(deduper.dropped.values())
+    print(f"[DEDUP] {total:,} duplicate rows dropped")
+    for name, n in deduper.dropped.items():
+        print(f"  - {name}: {n:,}")
+
+
+class MergeStore:
+    """
+    Persistent merge state in a directory, so a re-run only decodes what changed:
 
-    # 4) Try tab-delimited / CSV fallbacks
-    for enc in ("utf-8-sig", "cp950"):
-        try:
-            return pd.read_csv(p, sep="\t", engine="python", encoding=enc)
-        except Exception:
-            pass
-    for enc in ("utf-8-sig", "cp950"):
-        try:
-            return pd.read_csv(p, encoding=enc)
-        except Exception:
-            pass
+        manifest.json   reference columns + {input path: size, mtime, content hash, part}
+        <hash>.pkl      that input's rows, column-normalized and projected onto the reference
 
-    # 5) Last resort
-    return pd.read_excel(p, sheet_name=0)
+    sync() ingests new or changed inputs and forgets removed ones; frames()
+    then replays every input from its part file, so the outputs can be
+    regenerated without touching a single Excel export.
+    """
 
+    MANIFEST = "manifest.json"
 
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    df.columns = [str(c).strip() for c in df.columns]
-    return df
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        try:
+            self.manifest = json.loads((self.root / self.MANIFEST).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.manifest = {}
+        self.manifest.setdefault("ref", {})
+        self.manifest.setdefault("inputs", {})
+
+    @staticmethod
+    def _stat(p: Path) -> dict:
+        st = p.stat()
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def _digest(self, p: Path, entry: dict | None) -> str:
+        """Content hash; skipped when size and mtime match the recorded entry."""
+        if entry and all(entry.get(k) == v for k, v in self._stat(p).items()):
+            return entry["digest"]
+        return file_digest(p)
+
+    def _save(self):
+        tmp = self.root / (self.MANIFEST + ".tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(self.root / self.MANIFEST)
+
+    def reference(self, ref_path: Path) -> tuple[list[str], dict[Path, pd.DataFrame]]:
+        """
+        Reference columns, read from the manifest while the reference file is
+        unchanged. Returns (ref_cols, cache); cache holds the decoded reference
+        frame when it had to be read, for reuse if it is also an input.
+        """
+        key = _path_key(ref_path)
+        ref = self.manifest["ref"]
+        digest = self._digest(key, ref if ref.get("path") == str(key) else None)
+        if ref.get("path") == str(key) and ref.get("digest") == digest:
+            return ref["cols"], {}
+        df = next(iter_inputs([key], workers=1))[1]
+        cols = list(df.columns)
+        if cols != ref.get("cols"):
+            # Projection changed: every stored part is stale
+            self._drop(list(self.manifest["inputs"]))
+        self.manifest["ref"] = {"path": str(key), "digest": digest, "cols": cols, **self._stat(key)}
+        self._save()
+        return cols, {key: df}
+
+    def _drop(self, keys):
+        inputs = self.manifest["inputs"]
+        for k in keys:
+            part = inputs.pop(k)["part"]
+            if not any(e["part"] == part for e in inputs.values()):
+                (self.root / part).unlink(missing_ok=True)
+
+    def sync(self, paths, ref_cols: list[str], workers: int | None = None,
+             cache: dict[Path, pd.DataFrame] | None = None) -> dict[str, int]:
+        """Bring the store in line with `paths`; returns counts of added/changed/removed/reused inputs."""
+        inputs = self.manifest["inputs"]
+        keys = list(dict.fromkeys(_path_key(p) for p in paths))
+        wanted = {str(k) for k in keys}
+        removed = [k for k in inputs if k not in wanted]
+        self._drop(removed)
+
+        todo, digests = [], {}
+        for k in keys:
+            entry = inputs.get(str(k))
+            digests[k] = self._digest(k, entry)
+            if entry is None or entry["digest"] != digests[k] or not (self.root / entry["part"]).exists():
+                todo.append(k)
+
+        counts = {"added": 0, "changed": 0, "removed": len(removed), "reused": len(keys) - len(todo)}
+        for k, df in iter_inputs(todo, workers=workers, cache=cache):
+            print(f"[STORE] ingest {k.name}: shape={df.shape}")
+            part = f"{digests[k]}.pkl"
+            df.reindex(columns=ref_cols).to_pickle(self.root / part)
+            counts["changed" if str(k) in inputs else "added"] += 1
+            old = inputs.get(str(k), {}).get("part")
+            inputs[str(k)] = {"digest": digests[k], "part": part, "rows": len(df), **self._stat(k)}
+            if old and old != part and not any(e["part"] == old for e in inputs.values()):
+                (self.root / old).unlink(missing_ok=True)
+            self._save()   # after each file, so an interrupted run keeps what it finished
+        self._save()
+        return counts
+
+    def frames(self, paths):
+        """Yield (file name, projected rows) for `paths`, in order, from the store."""
+        for k in dict.fromkeys(_path_key(p) for p in paths):
+            yield k.name, pd.read_pickle(self.root / self.manifest["inputs"][str(k)]["part"])
 
-def merge_dataframes(dfs, ref_cols, drop_duplicates=True):
-    # Keep only columns in ref and follow exact order
-    cleaned = []
-    for df in dfs:
-        # Add any missing ref cols as empty
-        for col in ref_cols:
-            if col not in df.columns:
-                df[col] = pd.NA
-        cleaned.append(df[ref_cols])
-    merged = pd.concat(cleaned, ignore_index=True)
-    if drop_duplicates:
-        merged = merged.drop_duplicates()
-    return merged
 
 def collect_input_files(args) -> list[Path]:
     files = []
@@ -233,6 +672,11 @@ def main_cli():
     ap.add_argument("--keep-duplicates", action="store_true", help="Keep duplicate rows (default: drop exact duplicates)")
     ap.add_argument("--gui", action="store_true", help="Open a simple GUI to pick files")
     ap.add_argument("--cutoff", default=None, help="Cutoff date (YYYY-MM-DD) for 30/90-day tests. Defaults to today.")
+    ap.add_argument("--dedup-memory", type=int, default=4_000_000,
+                    help="Row fingerprints kept in RAM before spilling to disk (8 bytes each; default 4,000,000)")
+    ap.add_argument("--workers", type=int, default=None, help="Processes used to read inputs and render account sheets (default: CPU count; 1 = sequential)")
+    ap.add_argument("--store", default=None,
+                    help="Merge store directory; re-runs only read new/changed inputs (e.g. merge_store)")
     args = ap.parse_args()
 
 
@@ -256,46 +700,45 @@ def main_cli():
         print("No input files specified. Use --inputs or --dir/--pattern, or run with --gui.", file=sys.stderr)
         sys.exit(2)
 
-    # 🔍 Debug preview for each input
-    for f in inputs:
-        df = read_first_sheet(Path(f))
-        df = normalize_columns(df)
-        print(f"[DEBUG] {Path(f).name}: shape={df.shape}")
-        print(df.head(2).to_string(index=False))
-
-    # Load reference file (strongly recommended)
-    if args.ref:
-        ref_df = read_first_sheet(Path(args.ref))
-    else:
-        # If no reference, use the first input as reference
-        ref_df = read_first_sheet(inputs[0])
+    # Reference file (strongly recommended); if none, use the first input
+    ref_path = Path(args.ref) if args.ref else inputs[0]
+    if not args.ref:
         print(f"[Info] No --ref provided. Using first input as reference: {inputs[0].name}")
 
-    ref_df = normalize_columns(ref_df)
-    ref_cols = list(ref_df.columns)
-
-    # Load all input files
-    dataframes = []
-    for f in inputs:
-        df = read_first_sheet(f)
-        df = normalize_columns(df)
-        dataframes.append(df)
-
-    merged = merge_dataframes(dataframes, ref_cols, drop_duplicates=not args.keep_duplicates)
-
-    # 👉 Format date columns
-    for col in ["文件日期", "過帳日期"]:
-        if col in merged.columns:
-            merged[col] = pd.to_datetime(merged[col], errors="coerce").dt.strftime("%Y-%m-%d")
-
-    # Write output (single sheet)
+    if args.store:
+        # Incremental: only new/changed inputs are decoded, everything else comes from the store
+        store = MergeStore(Path(args.store))
+        ref_cols, cache = store.reference(ref_path)
+        counts = store.sync(inputs, ref_cols, workers=args.workers, cache=cache)
+        print(f"[STORE] {args.store}: " + ", ".join(f"{k} {v}" for k, v in counts.items()))
+        frames = lambda: store.frames(inputs)
+    else:
+        # Decode each file exactly once: the reference is kept for the whole run,
+        # inputs are streamed (parallel decode) straight into the output writer.
+        ref_key = _path_key(ref_path)
+        cache = {ref_key: next(iter_inputs([ref_path], workers=1))[1]}
+        ref_cols = list(cache[ref_key].columns)
+
+        def frames():
+            for p, df in iter_inputs(inputs, workers=args.workers, cache=cache):
+                # 🔍 Debug preview for each input
+                print(f"[DEBUG] {p.name}: shape={df.shape}")
+                print(df.head(2).to_string(index=False))
+                yield p.name, df
+
+    # Write output (single sheet), date columns as YYYY-MM-DD text
     out_path = Path(args.out)
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        merged.to_excel(writer, index=False, sheet_name="Sheet1")
+    deduper = None if args.keep_duplicates else RowDeduper(memory_budget=args.dedup_memory)
+    try:
+        rows = write_merged_streaming(frames(), ref_cols, out_path, deduper=deduper)
+    finally:
+        if deduper is not None:
+            deduper.close()
+    print_dedup_report(deduper)
 
-    print(f"✅ Merged {len(inputs)} files → {out_path}")
+    print(f"✅ Merged {len(inputs)} files ({rows:,} rows) → {out_path}")
 
-    # === Immediately run grouping ===
+    # === Immediately run grouping (reads the sidecar written next to out_path) ===
     mapping_path = Path("會計科目對照表.xlsx")  # adjust path if needed
     output_path = out_path.with_name(out_path.stem + "_grouped.xlsx")
 
@@ -307,41 +750,105 @@ def main_cli():
         inplace=False,
         drop_original_titles=["Sheet1","Sheet2","Sheet3"],
         date_columns=["文件日期","過帳日期"],
-        cutoff_date=cutoff_date
+        cutoff_date=cutoff_date,
+        workers=args.workers,
     )
 
     print(f"✅ Grouped output written to {output_path}")
 
-    # --- Post-merge formatting: Arial + Autofit ---
-    # Format the merged file
-    wb = load_workbook(out_path)
-    enforce_arial_font(wb)
-    for ws in wb.worksheets:
-        autofit_columns(ws, min_width=6, max_width=60, padding=2.0, skip_widths={1})
-    wb.save(out_path)
-
-    # Format the grouped file
-    gwb = load_workbook(output_path)
-    enforce_arial_font(gwb)
-    for ws in gwb.worksheets:
-        if ws.title.startswith("說明"):   # skip documentation sheets
-            continue
-        align_col_L_to_col_N(ws)          # <-- add this
-        autofit_columns(ws, min_width=6, max_width=60, padding=2.0, skip_widths={1})
-    gwb.save(output_path)
+    # Arial, autofit and number formats are applied while writing both files (no reload/restyle pass)
 
     for k, v in stats.items():
         print(f"- {k}: {v}")
 
 
 
+class MergeCancelled(Exception):
+    """Raised at the next checkpoint of run_merge_job once the user pressed Cancel."""
+
+
+# Grouping stages reported by group_export_by_account(on_stage=...), in order
+GROUP_STAGES = ["read", "prepare", "說明", "copy sheets", "account sheets", "save"]
+
+def run_merge_job(files: list, ref, out_path: Path, cutoff: date, keep_duplicates: bool,
+                  report: Callable[[str, float], None], stop: threading.Event) -> str:
+    """
+    The GUI's merge + grouping run (meant for a worker thread). `report(text, step)`
+    is called once per input file read, once per grouping stage (step 1) and
+    once per account sheet written (step: its share of the grouped rows, so the
+    account sheets add up to one step); `stop` is checked at each of those points
+    and raises MergeCancelled, so a run stops between files / stages / sheets,
+    never half-way through saving one. Returns the summary.
+    """
+    def checkpoint(text, step=1.0):
+        if stop.is_set():
+            raise MergeCancelled()
+        report(text, step)
+
+    # Reference (or fallback) is one of `files`, so it is decoded only once
+    checkpoint("Reading reference file...")
+    ref_key = _path_key(ref)
+    cache = {ref_key: next(iter_inputs([ref_key], workers=1))[1]}
+    ref_cols = list(cache[ref_key].columns)
+
+    def frames():
+        total = 0
+        for i, (p, df) in enumerate(iter_inputs(files, cache=cache), start=1):
+            total += len(df)
+            checkpoint(f"Read {i}/{len(files)}: {p.name} ({len(df):,} rows, {total:,} so far)")
+            yield p.name, df
+
+    deduper = None if keep_duplicates else RowDeduper()
+    try:
+        rows = write_merged_streaming(frames(), ref_cols, out_path, deduper=deduper)
+    finally:
+        if deduper is not None:
+            deduper.close()
+    print_dedup_report(deduper)
+    checkpoint(f"Merged {rows:,} rows → {out_path.name}; grouping...")
+
+    grouped = {"rows": 0, "written": 0}
+
+    def on_stage(name, rows):
+        if name == "prepare":
+            grouped["rows"] = rows
+        if name == "account sheets":
+            grouped["written"] += rows
+            checkpoint(f"Grouping: account sheets {grouped['written']:,}/{grouped['rows']:,} rows",
+                       rows / grouped["rows"] if grouped["rows"] else 0.0)
+        elif name != "save":      # the grouped file is complete once saved
+            checkpoint(f"Grouping: {name} done")
+
+    mapping_path = Path("會計科目對照表.xlsx")  # adjust path if needed
+    output_path = out_path.with_name(out_path.stem + "_grouped.xlsx")
+    stats = group_export_by_account(
+        export_path=out_path,
+        mapping_path=mapping_path,
+        output_path=output_path,
+        sheet_name=None,
+        inplace=False,
+        drop_original_titles=["Sheet1", "Sheet2", "Sheet3"],
+        date_columns=["文件日期", "過帳日期"],
+        cutoff_date=cutoff,
+        on_stage=on_stage,
+    )
+    report("Grouping: save done", 1.0)
+
+    # Nice feedback: show how many went in and how many rows came out
+    return (f"Merged {len(files)} files → {out_path}\n"
+            f"Rows: {rows:,}   Columns: {len(ref_cols)}\n"
+            f"Grouped: {stats['unique_accounts']} account sheets "
+            f"({stats['sheets_reused']} unchanged) → {output_path}")
+
+
 def run_gui():
+    import queue
     import tkinter as tk
-    from tkinter import filedialog, messagebox
+    from tkinter import filedialog, messagebox, ttk
 
     root = tk.Tk()
     root.title("Merge Excel files for group_by_gl.py")
-    root.geometry("560x320")
+    root.geometry("560x400")
 
     state = {"ref": None, "inputs": []}
 
@@ -363,99 +870,88 @@ def run_gui():
             state["inputs"] = list(ps)
             inputs_var.set("\n".join(ps))
 
-    def do_merge():
+    # The run happens on a worker thread; it only talks to the window through
+    # this queue (Tk is not thread-safe), polled from the Tk event loop.
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def worker(files, ref, out_path, cutoff_dt, keep_dups):
         try:
-            if not state["inputs"]:
-                messagebox.showerror("Error", "Please choose at least one input file.")
-                return
-            out = out_entry.get().strip() or "combined.xlsx"
-
-            cutoff_str = cutoff_entry.get().strip()
-            if cutoff_str:
-                try:
-                    cutoff_dt = datetime.strptime(cutoff_str, "%Y-%m-%d").date()
-                except ValueError:
-                    messagebox.showerror("Error", "Cutoff date must be YYYY-MM-DD (e.g., 2025-06-30).")
-                    return
-            else:
-                cutoff_dt = date.today()        
+            summary = run_merge_job(files, ref, out_path, cutoff_dt, keep_dups,
+                                    report=lambda text, step: events.put(("progress", (text, step))), stop=stop)
+            events.put(("done", summary))
+        except MergeCancelled:
+            events.put(("cancelled", None))
+        except Exception as e:
+            events.put(("error", str(e)))
 
-            # Load reference (or fallback)
-            if state["ref"]:
-                ref_df = read_first_sheet(Path(state["ref"]))
-            else:
-                ref_df = read_first_sheet(Path(state["inputs"][0]))
-
-            ref_df = normalize_columns(ref_df)
-            ref_cols = list(ref_df.columns)
-
-            # 👉 Auto-include the reference file in inputs if not already selected
-            files = list(state["inputs"])
-            if state["ref"] and state["ref"] not in files:
-                files.insert(0, state["ref"])
-
-            dfs = []
-            for p in files:
-                df = read_first_sheet(Path(p))
-                df = normalize_columns(df)
-                dfs.append(df)
-
-            merged = merge_dataframes(dfs, ref_cols, drop_duplicates=(not keep_dups_var.get()))
-            
-            # 👈 paste here
-            for col in ["文件日期", "過帳日期"]:
-                if col in merged.columns:
-                    merged[col] = pd.to_datetime(merged[col], errors="coerce").dt.strftime("%Y-%m-%d")
-
-            out_path = Path(out)
-            with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-                merged.to_excel(writer, index=False, sheet_name="Sheet1")
-
-
-            # === Immediately run group_by_gl.py on merged file ===
-            from group_by_gl import group_export_by_account
-
-
-            mapping_path = Path("會計科目對照表.xlsx")  # adjust path if needed
-            output_path = out_path.with_name(out_path.stem + "_grouped.xlsx")
-
-            stats = group_export_by_account(
-                export_path=out_path,
-                mapping_path=mapping_path,
-                output_path=output_path,
-                sheet_name=None,
-                inplace=False,
-                drop_original_titles=["Sheet1", "Sheet2", "Sheet3"],
-                date_columns=["文件日期", "過帳日期"],
-                cutoff_date=cutoff_dt
-            )
-
-
-            # --- Post-merge formatting: Arial + Autofit ---
-            wb = load_workbook(out_path)
-            enforce_arial_font(wb)
-            for ws in wb.worksheets:
-                autofit_columns(ws, min_width=6, max_width=60, padding=2.0, skip_widths={1})
-            wb.save(out_path)
-
-            gwb = load_workbook(output_path)
-            enforce_arial_font(gwb)
-            for ws in gwb.worksheets:
-                if ws.title.startswith("說明"):
+    def set_running(running: bool):
+        merge_btn.config(state="disabled" if running else "normal")
+        cancel_btn.config(state="normal" if running else "disabled")
+
+    def poll():
+        try:
+            while True:
+                kind, payload = events.get_nowait()
+                if kind == "progress":
+                    text, step = payload
+                    status_var.set(text)
+                    progress.step(step)
                     continue
-                align_col_L_to_col_N(ws)  
-                autofit_columns(ws, min_width=6, max_width=60, padding=2.0, skip_widths={1})
-            gwb.save(output_path)
-
-            # Nice feedback: show how many went in and how many rows came out
-            import tkinter
-            messagebox.showinfo(
-                "Done",
-                f"Merged {len(files)} files → {out_path}\n"
-                f"Rows: {len(merged):,}   Columns: {len(merged.columns)}"
-            )
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+                set_running(False)
+                if kind == "done":
+                    progress["value"] = progress["maximum"]
+                    status_var.set("Done.")
+                    messagebox.showinfo("Done", payload)
+                elif kind == "cancelled":
+                    status_var.set("Cancelled.")
+                else:
+                    status_var.set("Failed.")
+                    messagebox.showerror("Error", payload)
+                return
+        except queue.Empty:
+            pass
+        root.after(100, poll)
+
+    def do_merge():
+        if not state["inputs"]:
+            messagebox.showerror("Error", "Please choose at least one input file.")
+            return
+        out = out_entry.get().strip() or "combined.xlsx"
+
+        cutoff_str = cutoff_entry.get().strip()
+        if cutoff_str:
+            try:
+                cutoff_dt = datetime.strptime(cutoff_str, "%Y-%m-%d").date()
+            except ValueError:
+                messagebox.showerror("Error", "Cutoff date must be YYYY-MM-DD (e.g., 2025-06-30).")
+                return
+        else:
+            cutoff_dt = date.today()
+
+        # 👉 Auto-include the reference file in inputs if not already selected
+        files = list(state["inputs"])
+        if state["ref"] and state["ref"] not in files:
+            files.insert(0, state["ref"])
+
+        stop.clear()
+        # one step per report: reference, each input, merged, each grouping stage
+        progress.config(maximum=len(files) + 2 + len(GROUP_STAGES), value=0)
+        status_var.set("Starting...")
+        set_running(True)
+        threading.Thread(target=worker, daemon=True,
+                         args=(files, state["ref"] or state["inputs"][0], Path(out), cutoff_dt,
+                               keep_dups_var.get())).start()
+        root.after(100, poll)
+
+    def do_cancel():
+        stop.set()
+        cancel_btn.config(state="disabled")
+        status_var.set("Cancelling after the current step...")
+
+    def do_close():
+        stop.set()      # a running job stops at its next checkpoint; the thread is a daemon
+        root.destroy()
 
 
     # UI
@@ -488,9 +984,20 @@ def run_gui():
 
     tk.Checkbutton(frm, text="Keep duplicate rows", variable=keep_dups_var).grid(row=8, column=0, sticky="w", pady=(10,0))
 
-    tk.Button(frm, text="Merge", command=do_merge).grid(row=9, column=0, pady=12, sticky="w")
-    tk.Button(frm, text="Close", command=root.destroy).grid(row=9, column=1, pady=12, sticky="w")
+    buttons = tk.Frame(frm)
+    buttons.grid(row=9, column=0, columnspan=3, pady=12, sticky="w")
+    merge_btn = tk.Button(buttons, text="Merge", command=do_merge)
+    merge_btn.pack(side="left")
+    cancel_btn = tk.Button(buttons, text="Cancel", command=do_cancel, state="disabled")
+    cancel_btn.pack(side="left", padx=6)
+    tk.Button(buttons, text="Close", command=do_close).pack(side="left")
+
+    progress = ttk.Progressbar(frm, mode="determinate")
+    progress.grid(row=10, column=0, columnspan=3, sticky="we")
+    status_var = tk.StringVar(value="Ready.")
+    tk.Label(frm, textvariable=status_var, anchor="w").grid(row=11, column=0, columnspan=3, sticky="we", pady=(4, 0))
 
+    root.protocol("WM_DELETE_WINDOW", do_close)
     root.mainloop()
 
 
@@ -0,0 +1,335 @@
+"""
+Shared Excel styling for merge_excels.py and group_by_gl.py.
+
+Everything here is meant to be applied while a workbook is being generated
+(fonts by reference, widths computed from the data being written), so each
+output is serialized once instead of written, reloaded, restyled and saved.
+
+This works on openpyxl's style tables directly (Workbook._fonts, _cell_styles,
+_named_styles, ..., Cell._style) and on write-only sheet internals
+(ws._writer, openpyxl.worksheet._writer.ALL_TEMP_FILES), as group_by_gl.py
+does too. They are not public API: requirements.txt keeps openpyxl below 3.2,
+and test_sheet_styles.py checks they are still there.
+"""
+from __future__ import annotations
+import re
+import shutil
+import tempfile
+import zipfile
+from xml.etree import ElementTree
+from copy import copy
+from functools import lru_cache
+from pathlib import Path
+from unicodedata import east_asian_width
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.formatting.rule import Rule
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.differential import DifferentialStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.indexed_list import IndexedList
+
+ARIAL = "Arial"
+AMOUNT_FORMAT = "#,##0;[Red](#,##0)"
+DATE_FORMAT = "m/d/yyyy"
+
+
+@lru_cache(maxsize=None)
+def arial(f: Font | None) -> Font:
+    """Same font with the family switched to Arial (size/bold/italic/color/etc. kept)."""
+    return Font(
+        name=ARIAL,
+        sz=f.sz if f else None,
+        b=f.b if f else None,
+        i=f.i if f else None,
+        color=f.color if f else None,
+        underline=f.u if f else None,
+        strike=f.strike if f else None,
+        vertAlign=f.vertAlign if f else None
+    )
+
+BOLD = arial(Font(bold=True))
+HIGHLIGHT_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+
+# Named styles: each distinct look is defined once per workbook and cells
+# point at it by xfId, instead of every cell cloning Font/Fill/Border objects.
+HEADER_STYLE = "Export Header"      # pandas 2.x to_excel header look (bold, thin border, centered)
+DATE_STYLE   = "Date Cell"
+AMOUNT_STYLE = "Amount"
+_BODY_STYLES = ("Normal", DATE_STYLE, AMOUNT_STYLE)
+
+
+def use_arial_fonts(wb):
+    """
+    Switch every font in the workbook's font table to Arial in place.
+    Cells reference fonts by index, so this restyles all existing cells in
+    O(#fonts) instead of touching each cell. Fonts added afterwards should
+    already be Arial (see arial()).
+    """
+    fonts = IndexedList()
+    for i, f in enumerate(wb._fonts):
+        a = arial(f)
+        list.append(fonts, a)           # keep indices even if two fonts now coincide
+        fonts._dict.setdefault(a, i)
+    fonts.clean = True
+    wb._fonts = fonts
+    for ns in wb._named_styles:
+        ns.font = arial(ns.font)
+
+def register_styles(wb):
+    """
+    Add the shared named styles to `wb` (once; existing ones are kept).
+    Body cells need no style of their own: Normal is Arial after use_arial_fonts().
+    """
+    font = arial(wb._named_styles["Normal"].font)
+    thin = Side(style="thin")
+    defs = [
+        NamedStyle(HEADER_STYLE, font=BOLD, border=Border(thin, thin, thin, thin),
+                   alignment=Alignment(horizontal="center", vertical="top")),
+        NamedStyle(DATE_STYLE, font=font, number_format=DATE_FORMAT),
+        NamedStyle(AMOUNT_STYLE, font=font, number_format=AMOUNT_FORMAT),
+    ]
+    names = set(wb.named_styles)
+    for ns in defs:
+        if ns.name not in names:
+            wb.add_named_style(ns)
+
+def new_arial_workbook(write_only: bool = False) -> Workbook:
+    """Fresh workbook whose default (Normal) font is Arial, with the shared named styles registered."""
+    wb = Workbook(write_only=write_only)
+    use_arial_fonts(wb)
+    register_styles(wb)
+    return wb
+
+def _is_plain(cell) -> bool:
+    """True if the cell's look is exactly its named style (no per-cell overrides)."""
+    if not cell.has_style:
+        return True
+    return cell._style == cell.parent.parent._named_styles[cell._style.xfId].as_tuple()
+
+def set_style(cell, name: str):
+    """
+    Point a body cell at a registered named style (date / amount). Cells with
+    any other look (copied headers, bold titles) only take its number format.
+    """
+    if _is_plain(cell) and cell.style in _BODY_STYLES:
+        cell.style = name
+    else:
+        cell.number_format = cell.parent.parent._named_styles[name].number_format
+
+# Account sheets flag highlighted rows in a hidden column; one conditional
+# format per sheet colours them (instead of a yellow style on every cell).
+FLAG_HEADER = "標示"
+
+def highlight_dxf_id(wb) -> int:
+    """Index of the yellow highlight among wb's differential (conditional format) styles."""
+    return wb._differential_styles.add(DifferentialStyle(fill=HIGHLIGHT_FILL))
+
+def add_flag_highlight(ws, last_col: int, last_row: int, flag_col: int, dxf_id: int):
+    """
+    Colour rows 2..last_row (columns A..last_col) where column flag_col holds 1.
+    The rule points at differential style `dxf_id` (see highlight_dxf_id), so
+    it can be written by a workbook that only shares the output's style ids.
+    """
+    flag = get_column_letter(flag_col)
+    rule = Rule(type="expression", dxfId=dxf_id, formula=[f"${flag}2=1"])
+    ws.conditional_formatting.add(f"A2:{get_column_letter(last_col)}{max(last_row, 2)}", rule)
+
+def copy_cell_style(src, dst):
+    """Share src's style ids with dst (same workbook) instead of cloning each style object."""
+    dst._style = copy(src._style)
+
+def copy_cell_look(src, dst):
+    """
+    Clone src's formatting onto dst in another workbook (e.g. a read-only
+    source into a write-only output), switching the font to Arial.
+    """
+    if not getattr(src, "has_style", False):     # read-only EmptyCell has no style at all
+        return
+    dst.font = arial(src.font)
+    dst.fill = copy(src.fill)
+    dst.border = copy(src.border)
+    dst.alignment = copy(src.alignment)
+    dst.protection = copy(src.protection)
+    dst.number_format = src.number_format
+    # keep the named style reference (e.g. Export Header) when dst's workbook has it
+    xf = getattr(src, "style_array", None) or src._style
+    src_names = src.parent.parent._named_styles
+    dst_names = dst.parent.parent._named_styles
+    if xf.xfId < len(src_names) and src_names[xf.xfId].name in dst_names.names:
+        dst._style.xfId = dst_names.names.index(src_names[xf.xfId].name)
+
+def named_style_array(wb, name: str):
+    """
+    Style ids of a registered named style, for assigning to many cells at
+    once: cell._style = copy(array).
+    """
+    return wb._named_styles[name].as_tuple()
+
+_STYLE_TABLES = (
+    "_fonts", "_fills", "_borders", "_alignments", "_protections", "_number_formats",
+    "_date_formats", "_timedelta_formats", "_cell_styles", "_named_styles",
+    "_differential_styles", "_table_styles",
+)
+
+def share_styles(wb, other):
+    """
+    Make `wb` use `other`'s style tables, so cells built in a scratch workbook
+    can be streamed into a write-only one with copy_cell_style().
+    """
+    for attr in _STYLE_TABLES:
+        setattr(wb, attr, getattr(other, attr))
+
+def discard_write_only(wb):
+    """
+    Give up on a write-only workbook that will not be saved: finish the
+    sheets still open and remove their temp files.
+    """
+    for ws in wb.worksheets:
+        if ws._writer is not None and not ws.closed:
+            ws.close()
+            Path(ws._writer.out).unlink(missing_ok=True)
+
+
+def _cell_text(v) -> str:
+    """Text Excel shows for a written value (integral floats without the trailing .0)."""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+@lru_cache(maxsize=None)
+def _char_units(ch: str) -> float:
+    """Width of one character: wide/fullwidth (CJK) ≈ 1.7, everything else 1. Cached per codepoint."""
+    return 1.7 if east_asian_width(ch) in ("W", "F") else 1.0
+
+def max_display_units(values) -> float:
+    """
+    Widest _text_display_units over a column of values (blanks ignored).
+    Duplicates are dropped in pandas first, so each distinct value is measured
+    once: ASCII text by len(), the rest through the cached per-codepoint table.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    best = 0.0
+    for v in s.dropna().drop_duplicates():      # iterating a Series keeps Timestamps boxed
+        t = _cell_text(v)
+        best = max(best, float(len(t)) if t.isascii() else sum(map(_char_units, t)))
+    return best
+
+def column_width(max_units: float, min_width=6, max_width=60, padding=2.0) -> float:
+    """Text units + padding, clamped."""
+    return max(min_width, min(max_width, max_units + padding))
+
+def frame_column_widths(frames: dict, header=True, min_width=6, max_width=60, padding=2.0) -> dict:
+    """
+    {sheet title: DataFrame about to be written} → {sheet title: {1-based column: width}},
+    all sheets in one pass. Header text (column labels) is measured too unless header=False.
+    """
+    out = {}
+    for title, df in frames.items():
+        widths = {}
+        for j in range(df.shape[1]):
+            units = max_display_units(df.iloc[:, j])
+            if header:
+                units = max(units, _text_display_units(df.columns[j]))
+            widths[j + 1] = column_width(units, min_width, max_width, padding)
+        out[title] = widths
+    return out
+
+def set_column_widths_in_file(xlsx_path: Path, widths: dict[int, float], sheet_part="xl/worksheets/sheet1.xml"):
+    """
+    Insert <cols> widths into an already-saved sheet (e.g. one streamed in
+    write-only mode, where widths must be known before the first row).
+    The sheet XML is copied through in blocks; nothing is parsed.
+    """
+    if not widths:
+        return
+    cols = "<cols>" + "".join(
+        f'<col min="{i}" max="{i}" width="{w:g}" customWidth="1"/>' for i, w in sorted(widths.items())
+    ) + "</cols>"
+    xlsx_path = Path(xlsx_path)
+    tmp = xlsx_path.with_name(xlsx_path.name + ".tmp")
+    with zipfile.ZipFile(xlsx_path) as zin, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            if item.filename != sheet_part:
+                zout.writestr(item, zin.read(item.filename))
+                continue
+            with zin.open(item) as src, zout.open(item.filename, "w") as dst:
+                head = src.read(1 << 16)   # sheet header (<sheetData> starts well within this)
+                head = re.sub(rb"<cols>.*?</cols>", b"", head, count=1, flags=re.S)
+                head = head.replace(b"<sheetData", cols.encode("utf-8") + b"<sheetData", 1)
+                dst.write(head)
+                shutil.copyfileobj(src, dst, 1 << 20)
+    tmp.replace(xlsx_path)
+
+def replace_sheet_parts(xlsx_path: Path, parts: dict[str, str]):
+    """
+    Swap worksheet parts of an already-saved package for ready-made XML files
+    ({part name: file}, e.g. sheets rendered in other processes against the
+    same style table). The files are streamed in and then removed, also when
+    the swap fails (the package is then left as saved).
+    """
+    if not parts:
+        return
+    xlsx_path = Path(xlsx_path)
+    tmp = xlsx_path.with_name(xlsx_path.name + ".tmp")
+    try:
+        with zipfile.ZipFile(xlsx_path) as zin, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zout:
+            for item in zin.infolist():
+                if item.filename not in parts:
+                    zout.writestr(item, zin.read(item.filename))
+                    continue
+                with open(parts[item.filename], "rb") as src, zout.open(item.filename, "w") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+        tmp.replace(xlsx_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+        for f in parts.values():
+            Path(f).unlink(missing_ok=True)
+
+
+def extract_sheet_parts(xlsx_path: Path, parts: dict) -> dict:
+    """
+    Copy worksheet parts out of a saved package into temporary files
+    ({key: part name} → {key: file}), e.g. sheets to carry over into the
+    next save with replace_sheet_parts.
+    """
+    files = {}
+    try:
+        with zipfile.ZipFile(xlsx_path) as zin:
+            for key, name in parts.items():
+                fd, files[key] = tempfile.mkstemp(suffix=".xml")
+                with zin.open(name) as src, open(fd, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+    except Exception:
+        for f in files.values():
+            Path(f).unlink(missing_ok=True)
+        raise
+    return files
+
+
+def read_column_widths(ws) -> dict[int, float]:
+    """
+    {1-based column: width} from the <cols> of a read-only worksheet, which
+    has no column_dimensions. Only the sheet header is parsed.
+    """
+    widths = {}
+    with ws.parent._archive.open(ws._worksheet_path) as fh:
+        for _, el in ElementTree.iterparse(fh, events=("start",)):
+            tag = el.tag.rsplit("}", 1)[-1]
+            if tag == "sheetData":
+                break
+            if tag == "col" and el.get("width"):
+                for i in range(int(el.get("min")), int(el.get("max", el.get("min"))) + 1):
+                    widths[i] = float(el.get("width"))
+    return widths
+
+
+def _text_display_units(s: str) -> float:
+    """
+    Approximate Excel display width in 'character' units.
+    Count wide CJK as ~1.7x.
+    """
+    if s is None:
+        return 0.0
+    s = str(s)
+    return float(len(s)) if s.isascii() else sum(map(_char_units, s))
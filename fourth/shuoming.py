@@ -0,0 +1,118 @@
+"""
+Declarative 說明 checks for group_by_gl.py.
+
+The sections of the 說明 sheet come from a JSON rule file (default:
+shuoming_rules.json next to this script). A section has a bold "title" and
+optionally:
+
+  "compact": true      – first block starts right under the title (no blank row)
+  "rules": [...]       – row lists, each rendered as one table block:
+      "accounts"         G/L codes (list, or {code: note} for readability)
+      "older_than"       only rows posted more than N days before the cutoff
+      "uncleared"        only rows whose 結清文件 is blank
+      "label"            line written above the table
+      "gap"              blank rows between label and table (default 0)
+      "empty_text"       line written instead of the table when nothing matches
+      "header_if_empty"  write the bare table header when nothing matches
+                         (with neither, an empty block is left out)
+  "cross_pairs": [{"left", "right", "title"}]  – supplier cross-checks, always listed
+  "cross_screen": {"left": [prefixes], "right": [prefixes], "min_common": N}
+                       – also list every other account pair (left code starting
+                         with a left prefix, right with a right prefix) sharing at
+                         least N suppliers, e.g. all asset ("1") × liability ("2")
+
+Rule matching looks at each account's rows once, however many rules name it.
+"""
+from __future__ import annotations
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+DEFAULT_RULES = Path(__file__).with_name("shuoming_rules.json")
+
+
+def _codes(accounts) -> list[str]:
+    return [str(c).strip() for c in accounts]
+
+def load_rules(path: Path | str | None = None) -> dict:
+    """Read and check a rule file; account codes come back as a list of strings."""
+    path = Path(path) if path else DEFAULT_RULES
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    sections = cfg.get("sections")
+    if not isinstance(sections, list):
+        raise ValueError(f"{path.name}: 'sections' must be a list")
+    for i, sec in enumerate(sections, start=1):
+        if not sec.get("title"):
+            raise ValueError(f"{path.name}: section {i} has no 'title'")
+        for rule in sec.get("rules", ()):
+            if not rule.get("accounts"):
+                raise ValueError(f"{path.name}: a rule in section '{sec['title']}' has no 'accounts'")
+            rule["accounts"] = _codes(rule["accounts"])
+            if rule.get("older_than") is not None:
+                rule["older_than"] = int(rule["older_than"])
+        for pair in sec.get("cross_pairs", ()):
+            if not (pair.get("left") and pair.get("right")):
+                raise ValueError(f"{path.name}: cross pair in section '{sec['title']}' needs 'left' and 'right'")
+        screen = sec.get("cross_screen")
+        if screen is not None:
+            screen["left"] = _codes(screen.get("left") or [""])
+            screen["right"] = _codes(screen.get("right") or [""])
+            screen["min_common"] = max(int(screen.get("min_common", 1)), 1)
+    return cfg
+
+def all_rules(cfg: dict) -> list[dict]:
+    """Every table rule, in sheet order."""
+    return [rule for sec in cfg["sections"] for rule in sec.get("rules", ())]
+
+
+def match_rules(codes: pd.Series, age_days: np.ndarray, is_open: np.ndarray, rules: list[dict]) -> list[np.ndarray]:
+    """
+    Row positions (export order) listed by each rule. Rows are grouped by
+    account once; a rule only touches the rows of its own accounts.
+    """
+    by_code = pd.Series(np.arange(len(codes))).groupby(codes.to_numpy()).indices
+    empty = np.empty(0, dtype=np.int64)
+    out = []
+    for rule in rules:
+        pos = np.sort(np.concatenate([by_code.get(c, empty) for c in rule["accounts"]]))
+        keep = np.ones(len(pos), dtype=bool)
+        if rule.get("older_than") is not None:
+            keep &= age_days[pos] > rule["older_than"]
+        if rule.get("uncleared"):
+            keep &= is_open[pos]
+        out.append(pos[keep])
+    return out
+
+
+def supplier_incidence(codes: pd.Series, suppliers: pd.Series) -> pd.DataFrame:
+    """
+    Distinct (code, supplier) pairs: the nonzero cells of the supplier × account
+    incidence matrix. `suppliers` as export_schema.supplier_ids gives them
+    (stripped text, blank → missing); blank suppliers are left out.
+    """
+    keep = (codes.notna() & suppliers.notna()).to_numpy()
+    inc = pd.DataFrame({"code": np.asarray(codes, dtype=object)[keep],
+                        "supplier": np.asarray(suppliers, dtype=object)[keep]})
+    return inc.drop_duplicates(ignore_index=True)
+
+def supplier_overlap(inc: pd.DataFrame, left=("",), right=("",), min_common: int = 1) -> pd.DataFrame:
+    """
+    Common suppliers of every account pair, left code starting with one of
+    `left`, right code with one of `right`: the nonzero entries of Bᵀ·B for
+    the incidence matrix B, as a join on supplier so only pairs that share a
+    supplier are ever built. Columns: left, right, common, suppliers (sorted),
+    most shared first.
+    """
+    lhs = inc[inc["code"].str.startswith(tuple(left))]
+    rhs = inc[inc["code"].str.startswith(tuple(right))]
+    pairs = lhs.merge(rhs, on="supplier", suffixes=("_l", "_r"))
+    # a pair eligible both ways round (overlapping prefixes) is kept once, smaller code left
+    mirrored = pairs["code_l"].str.startswith(tuple(right)) & pairs["code_r"].str.startswith(tuple(left))
+    pairs = pairs[(pairs["code_l"] != pairs["code_r"]) & (~mirrored | (pairs["code_l"] < pairs["code_r"]))]
+    g = pairs.groupby(["code_l", "code_r"])["supplier"]
+    out = pd.DataFrame({"common": g.size(), "suppliers": g.agg(sorted)}).reset_index()
+    out = out.rename(columns={"code_l": "left", "code_r": "right"})
+    out = out[out["common"] >= min_common]
+    return out.sort_values(["common", "left", "right"], ascending=[False, True, True], ignore_index=True)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Synthetic SAP 科餘 exports for load-testing merge_excels.py and group_by_gl.py.
+
+Rows look like the real download: the same 24 columns, account codes from
+the mapping (the 說明 rule accounts first, so every section has data), a
+few accounts holding most rows, suppliers on about a third of the rows
+(mostly each account's own, a few shared), part of the rows cleared, and a
+zero subtotal line closing each account. The rows can be split over
+several files, in any of the formats merge_excels reads.
+
+    python synthetic_export.py --rows 200000 --files 4 --format xlsx --out bench
+    python synthetic_export.py --rows 50000 --format html --cleared-ratio 0.6 --start 2020-01-01
+
+Formats: xlsx, html (SAP's "Excel" download: an HTML table saved as .xls),
+mhtml (.xls, web archive) and tsv (unconverted text).
+"""
+from __future__ import annotations
+import argparse
+import html
+import quopri
+from datetime import date, datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from openpyxl.cell import WriteOnlyCell
+
+from sheet_styles import HEADER_STYLE, new_arial_workbook
+
+COLUMNS = [
+    "已結清/未結項目符號", "公司代碼", "年度/月份", "文件號碼", "文件類型", "文件日期", "過帳日期",
+    "G/L科目", "供應商", "客戶", "貿易夥伴", "文件幣別", "文件幣別金額", "LCurr", "以本國貨幣計算之金額",
+    "訂單", "利潤中心", "成本中心", "內文", "結清文件", "結清日期", "功能範圍", "指派", "參考",
+]
+FORMATS = {"xlsx": ".xlsx", "html": ".xls", "mhtml": ".xls", "tsv": ".txt"}
+XLSX_MAX_ROWS = 1_048_575           # below the header row
+
+DOC_TYPES = (["SA", "AB", "KB", "K1", "KE", "DZ", "SU", "KR", "RV", "UE", "DA"],
+             [.59, .08, .06, .06, .055, .037, .034, .025, .005, .004, .004])
+PROFIT_CENTERS = ["WF110", "WT000", "TF0210", "TF0000", "WF000"]
+TEXTS = ["預付費用攤銷", "暫付款轉應付福利費", "定存息代扣稅額", "專案退稅->應收退稅款",
+         "重分類 存出保證金", "CPA調整分錄", "沖->應收退稅款", "活存半年息代扣稅款"]
+
+
+def account_codes(accounts: int, mapping: Path | None = None) -> list[str]:
+    """`accounts` G/L codes: the 說明 rule accounts first, then mapping codes in order."""
+    from shuoming import all_rules, load_rules
+
+    cfg = load_rules()
+    codes = [c for rule in all_rules(cfg) for c in rule["accounts"]]
+    for sec in cfg["sections"]:
+        for pair in sec.get("cross_pairs", ()):
+            codes += [str(pair["left"]), str(pair["right"])]
+    if mapping is not None and mapping.exists():
+        from group_by_gl import load_mapping
+        codes += list(load_mapping(mapping))
+    codes = list(dict.fromkeys(codes))
+    for n in range(accounts - len(codes)):       # no mapping: made-up codes (not grouped)
+        codes.append(str(19900000 + n))
+    return codes[:accounts]
+
+def make_frame(rows: int, codes: list[str], suppliers: int = 500, cleared_ratio: float = 0.15,
+               start: date = date(2015, 1, 1), end: date = date(2025, 6, 30), seed: int = 0) -> pd.DataFrame:
+    """`rows` export rows (plus one subtotal per account), grouped by account like SAP lists them."""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, len(codes) + 1)           # a few accounts hold most rows
+    code_idx = np.sort(rng.choice(len(codes), size=rows, p=weights / weights.sum()))
+
+    span = max((pd.Timestamp(end) - pd.Timestamp(start)).days, 0)
+    posted = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, span + 1, rows), unit="D")
+    doc_date = posted - pd.to_timedelta(rng.integers(0, 6, rows), unit="D")
+    cleared = rng.random(rows) < cleared_ratio
+    cleared_on = posted + pd.to_timedelta(rng.integers(1, 121, rows), unit="D")
+
+    amount = np.round(rng.lognormal(9, 2, rows)).astype(np.int64) * np.where(rng.random(rows) < .3, -1, 1)
+    usd = rng.random(rows) < .05
+    doc_amount = amount.astype(object)
+    doc_amount[usd] = np.round(amount[usd] / 30.5, 2)
+    has_supplier = rng.random(rows) < .33
+    # each account mostly books its own suppliers; a few rows share across accounts
+    suppliers = max(suppliers, 1)
+    pool = max(suppliers // len(codes), 1)
+    sup_idx = (code_idx * pool + rng.integers(0, pool, rows)) % suppliers
+    shared = rng.random(rows) < .01
+    sup_idx[shared] = rng.integers(0, suppliers, int(shared.sum()))
+    supplier_ids = np.array([str(100000 + i) for i in range(suppliers)], dtype=object)
+
+    def maybe(mask, values):
+        out = np.full(rows, np.nan, dtype=object)
+        out[mask] = np.asarray(values, dtype=object)[mask]
+        return out
+
+    doc_no = (2300000000 + rng.integers(0, 99_999_999, rows)).astype(str)
+    df = pd.DataFrame({
+        "已結清/未結項目符號": np.nan,
+        "公司代碼": "1000",
+        "年度/月份": posted.strftime("%Y/%m"),
+        "文件號碼": doc_no,
+        "文件類型": rng.choice(DOC_TYPES[0], size=rows, p=np.array(DOC_TYPES[1]) / sum(DOC_TYPES[1])),
+        "文件日期": doc_date.to_pydatetime(),
+        "過帳日期": posted.to_pydatetime(),
+        "G/L科目": np.array(codes, dtype=object)[code_idx],
+        "供應商": maybe(has_supplier, supplier_ids[sup_idx]),
+        "客戶": np.nan,
+        "貿易夥伴": np.nan,
+        "文件幣別": np.where(usd, "USD", "NTD"),
+        "文件幣別金額": doc_amount,
+        "LCurr": "NTD",
+        "以本國貨幣計算之金額": amount.astype(object),
+        "訂單": np.nan,
+        "利潤中心": maybe(rng.random(rows) < .55, rng.choice(PROFIT_CENTERS, size=rows)),
+        "成本中心": np.nan,
+        "內文": rng.choice(TEXTS, size=rows),
+        "結清文件": maybe(cleared, (2300000000 + rng.integers(0, 99_999_999, rows)).astype(str)),
+        "結清日期": maybe(cleared, cleared_on.to_pydatetime()),
+        "功能範圍": np.nan,
+        "指派": posted.strftime("%Y%m%d"),
+        "參考": maybe(rng.random(rows) < .13, ("TP-" + posted.strftime("%y%m%d")).to_numpy()),
+    }, columns=COLUMNS)
+
+    # zero subtotal line after each account, as in the SAP list
+    ends = np.flatnonzero(np.r_[code_idx[1:] != code_idx[:-1], True])
+    sub = pd.DataFrame({c: [np.nan] * len(ends) for c in COLUMNS})
+    sub["文件幣別"] = sub["LCurr"] = "NTD"
+    sub["文件幣別金額"] = sub["以本國貨幣計算之金額"] = 0
+    sub.index = ends + 0.5
+    return pd.concat([df, sub]).sort_index(kind="stable").reset_index(drop=True)
+
+
+# ---------------- writers ----------------
+
+def _cell_text(v) -> str:
+    if v is None or pd.isna(v):
+        return ""
+    if isinstance(v, datetime):
+        return v.strftime("%Y/%m/%d")
+    return str(v)
+
+def _html_table(df: pd.DataFrame):
+    yield "<html><head><meta charset='utf-8'></head><body><table border='1'>\n<tr>"
+    yield "".join(f"<th>{html.escape(c)}</th>" for c in df.columns) + "</tr>\n"
+    for row in df.itertuples(index=False, name=None):
+        yield "<tr>" + "".join(f"<td>{html.escape(_cell_text(v))}</td>" for v in row) + "</tr>\n"
+    yield "</table></body></html>\n"
+
+def write_xlsx(df: pd.DataFrame, path: Path):
+    if len(df) > XLSX_MAX_ROWS:
+        raise ValueError(f"{path.name}: {len(df):,} rows do not fit one sheet; use more --files")
+    wb = new_arial_workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    header = []
+    for col in df.columns:
+        c = WriteOnlyCell(ws, value=col)
+        c.style = HEADER_STYLE
+        header.append(c)
+    ws.append(header)
+    obj = df.astype(object)
+    for row in obj.where(obj.notna(), None).itertuples(index=False, name=None):
+        ws.append(row)
+    for title in ("Sheet2", "Sheet3"):            # SAP downloads come with empty extra sheets
+        wb.create_sheet(title)
+    wb.save(path)
+
+def write_html(df: pd.DataFrame, path: Path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(_html_table(df))
+
+def write_mhtml(df: pd.DataFrame, path: Path):
+    with open(path, "wb") as f:
+        f.write(b'MIME-Version: 1.0\r\nContent-Type: multipart/related; boundary="----=_NextPart_01"\r\n\r\n'
+                b'------=_NextPart_01\r\nContent-Location: file:///C:/export.htm\r\n'
+                b'Content-Transfer-Encoding: quoted-printable\r\n'
+                b'Content-Type: text/html; charset="utf-8"\r\n\r\n')
+        for chunk in _html_table(df):
+            f.write(quopri.encodestring(chunk.encode("utf-8")).replace(b"\n", b"\r\n"))
+        f.write(b"\r\n------=_NextPart_01--\r\n")
+
+def write_tsv(df: pd.DataFrame, path: Path):
+    df.map(_cell_text).to_csv(path, sep="\t", index=False, encoding="utf-8")
+
+WRITERS = {"xlsx": write_xlsx, "html": write_html, "mhtml": write_mhtml, "tsv": write_tsv}
+
+
+def generate(out_dir: Path, rows: int, files: int = 1, fmt: str = "xlsx", accounts: int = 30,
+             suppliers: int = 500, cleared_ratio: float = 0.15, start: date = date(2015, 1, 1),
+             end: date = date(2025, 6, 30), mapping: Path | None = None, seed: int = 0) -> list[Path]:
+    """Write `rows` rows split over `files` exports in `out_dir`; returns their paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    codes = account_codes(accounts, mapping)
+    paths = []
+    for i in range(files):
+        n = rows // files + (1 if i < rows % files else 0)
+        df = make_frame(n, codes, suppliers, cleared_ratio, start, end, seed=seed + i)
+        path = out_dir / f"export-synthetic-{i + 1:02d}{FORMATS[fmt]}"
+        WRITERS[fmt](df, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    p = argparse.ArgumentParser(description="Write synthetic SAP 科餘 exports for benchmarking.")
+    p.add_argument("--rows", type=int, default=100_000, help="Data rows in total (default: 100,000)")
+    p.add_argument("--files", type=int, default=1, help="Split the rows over this many exports (default: 1)")
+    p.add_argument("--format", choices=list(FORMATS), default="xlsx", help="File format (default: xlsx)")
+    p.add_argument("--accounts", type=int, default=30, help="Distinct G/L科目 (default: 30)")
+    p.add_argument("--suppliers", type=int, default=500, help="Distinct supplier numbers (default: 500)")
+    p.add_argument("--cleared-ratio", type=float, default=0.15, help="Share of rows with a 結清文件 (default: 0.15)")
+    p.add_argument("--start", default="2015-01-01", help="First posting date, YYYY-MM-DD (default: 2015-01-01)")
+    p.add_argument("--end", default="2025-06-30", help="Last posting date, YYYY-MM-DD (default: 2025-06-30)")
+    p.add_argument("--mapping", default="會計科目對照表.xlsx",
+                   help="Mapping whose codes are used (default: ./會計科目對照表.xlsx, if present)")
+    p.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    p.add_argument("--out", default="synthetic", help="Output folder (default: ./synthetic)")
+    args = p.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end = datetime.strptime(args.end, "%Y-%m-%d").date()
+    paths = generate(Path(args.out), args.rows, max(args.files, 1), args.format, args.accounts,
+                     args.suppliers, args.cleared_ratio, start, end, Path(args.mapping), args.seed)
+    for path in paths:
+        print(f"[OK] {path} ({path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Aging tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+from datetime import date
+
+import pandas as pd
+
+from aging import BUCKET_LABELS, ages_at, aging_matrix, month_end_cutoffs, row_aging
+
+#            code  posted        cleared  cleared_on    amount
+ROWS = [("A", "2025-06-20", False, None,         100.0),
+        ("A", "2025-03-01", False, None,         200.0),
+        ("B", "2024-01-01", True,  "2025-05-01", 300.0),   # open until May
+        ("B", "2025-07-05", False, None,         400.0),   # posted after every cutoff
+        ("A", "2024-01-01", True,  None,         500.0)]   # cleared, date unknown: never open
+
+
+def typed_rows() -> pd.DataFrame:
+    df = pd.DataFrame(ROWS, columns=["code", "posted", "cleared", "cleared_on", "amount"])
+    df["posted"] = pd.to_datetime(df["posted"])
+    df["cleared_on"] = pd.to_datetime(df["cleared_on"])
+    return df
+
+
+def test_ages_at_cutoff():
+    aging = row_aging(typed_rows())
+    assert ages_at(aging, date(2025, 6, 30))[:4].tolist() == [10, 121, 546, -5]
+    assert aging["open"].tolist() == [True, True, False, True, False]
+
+
+def test_aging_matrix_buckets_open_rows_per_cutoff():
+    typed = typed_rows()
+    m = aging_matrix(row_aging(typed), typed["code"], [date(2025, 3, 31), date(2025, 6, 30)], typed["amount"])
+
+    assert m.index.tolist() == [(date(2025, 3, 31), "A"), (date(2025, 3, 31), "B"), (date(2025, 6, 30), "A")]
+    assert m["rows"].to_numpy().tolist() == [[1, 0, 0, 0], [0, 0, 0, 1], [1, 0, 1, 0]]
+    assert m["amount"].to_numpy().tolist() == [[200, 0, 0, 0], [0, 0, 0, 300], [100, 0, 200, 0]]
+    assert list(m["rows"].columns) == BUCKET_LABELS
+
+
+def test_month_end_cutoffs():
+    assert month_end_cutoffs("2025-06-15", 3) == [date(2025, 4, 30), date(2025, 5, 31), date(2025, 6, 15)]
@@ -0,0 +1,45 @@
+"""
+Typed export tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from export_schema import compact_frame, find_supplier_column, typed_export
+
+
+def test_typed_export_converts_the_filter_columns():
+    df = pd.DataFrame({
+        "G/L科目": [11780100.0, " 1,178,0200 ", None, "21780101"],
+        "供應商號碼": [" V01 ", "", None, 12],
+        "過帳日期": [datetime(2025, 6, 1), "2025/05/02", "not a date", None],
+        "以本國貨幣計算之金額": [1500, "-20.5", "", None],
+        "結清文件": [None, "2300000001", " ", "nan"],
+    })
+    typed = typed_export(df, "G/L科目", find_supplier_column(df))
+
+    assert typed.index.equals(df.index)
+    assert typed["code"].astype(object).tolist()[:2] == ["11780100", "11780200"]
+    assert typed["code"].isna().tolist() == [False, False, True, False]
+    assert typed["supplier"].astype(object).where(typed["supplier"].notna(), None).tolist() == ["V01", None, None, "12"]
+    assert typed["posted"].tolist()[:2] == [pd.Timestamp(2025, 6, 1), pd.Timestamp(2025, 5, 2)]
+    assert typed["posted"].isna().tolist() == [False, False, True, True]
+    assert np.allclose(typed["amount"].to_numpy(), [1500, -20.5, np.nan, np.nan], equal_nan=True)
+    assert typed["cleared"].tolist() == [False, True, False, False]
+
+
+def test_typed_export_without_optional_columns():
+    typed = typed_export(pd.DataFrame({"G/L科目": ["11780100"]}), "G/L科目")
+    assert typed["supplier"].isna().all() and typed["posted"].isna().all() and typed["amount"].isna().all()
+    assert typed["cleared"].tolist() == [False]
+
+
+def test_compact_frame_keeps_cell_values():
+    df = pd.DataFrame({"幣別": ["NTD"] * 4, "內文": ["a", "b", "c", "d"], "金額": [1, 2, 3, 4]},
+                      dtype=object)             # as the export is read (cell values as read)
+    compact_frame(df)
+    assert isinstance(df["幣別"].dtype, pd.CategoricalDtype)
+    assert not isinstance(df["內文"].dtype, pd.CategoricalDtype)
+    assert df["幣別"].astype(object).tolist() == ["NTD"] * 4
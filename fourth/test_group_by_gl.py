@@ -0,0 +1,180 @@
+"""
+Grouping tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+import json
+import multiprocessing as mp
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+import group_by_gl
+from synthetic_export import account_codes, make_frame, write_xlsx
+
+HERE = Path(__file__).parent
+MAPPING = HERE / "會計科目對照表.xlsx"
+
+
+@pytest.fixture
+def spawn_start_method():
+    """Pool workers started the Windows / macOS way (fresh interpreter, own atexit)."""
+    old = mp.get_start_method(allow_none=True)
+    mp.set_start_method("spawn", force=True)
+    yield
+    mp.set_start_method(old, force=True)
+
+
+def test_parallel_account_sheets_under_spawn(tmp_path, monkeypatch, spawn_start_method):
+    export = tmp_path / "export.xlsx"
+    frame = make_frame(600, account_codes(8, MAPPING), suppliers=40)
+    write_xlsx(frame, export)
+    out = tmp_path / "export_grouped.xlsx"
+    monkeypatch.setattr(group_by_gl, "PARALLEL_MIN_ROWS", 0)
+
+    stats = group_by_gl.group_export_by_account(
+        export_path=export,
+        mapping_path=MAPPING,
+        output_path=out,
+        sheet_name=None,
+        inplace=False,
+        drop_original_titles=["Sheet1", "Sheet2", "Sheet3"],
+        date_columns=["文件日期", "過帳日期"],
+        cutoff_date=date(2025, 6, 30),
+        workers=2,
+        incremental=False,
+    )
+
+    wb = openpyxl.load_workbook(out, read_only=True)
+    account_sheets = [t for t in wb.sheetnames if t != "說明"]
+    assert len(account_sheets) == stats["unique_accounts"] > 1
+    rows = sum(sum(1 for _ in wb[t].iter_rows(min_row=2)) for t in account_sheets)
+    wb.close()
+    assert rows == stats["rows_grouped"]
+    assert not out.with_name(out.name + ".tmp").exists()
+
+
+def test_sidecar_only_used_for_the_workbook_it_was_written_with(tmp_path):
+    pytest.importorskip("pyarrow")
+    from merge_excels import write_merged_streaming
+    frame = make_frame(300, account_codes(4, MAPPING), suppliers=10)
+    merged = tmp_path / "merged.xlsx"
+    write_merged_streaming([("export", frame)], list(frame.columns), merged, chunk_size=70)
+
+    assert group_by_gl.sidecar_for(merged) == merged.with_suffix(".parquet")
+    assert len(group_by_gl.read_sidecar(merged.with_suffix(".parquet"))) == len(frame)
+    frame.to_pickle(merged.with_suffix(".pkl"))
+    merged.write_bytes(merged.read_bytes())          # same bytes, newer mtime: hashed, still the same
+    assert group_by_gl.sidecar_for(merged) == merged.with_suffix(".parquet")
+    data = bytearray(merged.read_bytes())
+    data[-30] ^= 1                                   # same size, other content
+    merged.write_bytes(bytes(data))
+    assert group_by_gl.sidecar_for(merged) is None
+
+
+def test_sidecar_trusts_size_and_mtime_without_hashing(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from merge_excels import write_merged_streaming
+    frame = make_frame(100, account_codes(2, MAPPING), suppliers=5)
+    merged = tmp_path / "merged.xlsx"
+    write_merged_streaming([("export", frame)], list(frame.columns), merged)
+
+    def no_hash(path):
+        raise AssertionError("hashed although size and mtime match")
+    monkeypatch.setattr(group_by_gl, "file_identity", no_hash)
+    assert group_by_gl.sidecar_for(merged) == merged.with_suffix(".parquet")
+
+
+class Cancelled(Exception):
+    pass
+
+@pytest.mark.parametrize("at", ["read", "prepare", "說明", "copy sheets", "account sheets", "save"])
+def test_cancel_leaves_no_temp_files(tmp_path, monkeypatch, at):
+    export = tmp_path / "export.xlsx"
+    write_xlsx(make_frame(300, account_codes(4, MAPPING), suppliers=10), export)
+    out = tmp_path / "export_grouped.xlsx"
+    args = dict(export_path=export, mapping_path=MAPPING, output_path=out, sheet_name=None, inplace=False,
+                drop_original_titles=["Sheet1", "Sheet2", "Sheet3"], date_columns=["文件日期", "過帳日期"],
+                cutoff_date=date(2025, 6, 30), workers=1)
+    group_by_gl.group_export_by_account(**args)      # previous output: its sheets are reused below
+
+    def stop(name, rows):
+        if name == at:
+            raise Cancelled(name)
+
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(scratch))
+    with pytest.raises(Cancelled):
+        group_by_gl.group_export_by_account(**args, on_stage=stop)
+    assert list(scratch.iterdir()) == []
+    assert not out.with_name(out.name + ".tmp").exists()
+    export.unlink()         # the export workbook was closed
+
+
+def test_one_stage_event_per_account_sheet(tmp_path):
+    frame = make_frame(300, account_codes(4, MAPPING), suppliers=10)
+    write_xlsx(frame, tmp_path / "export.xlsx")
+    events = []
+    stats = group_by_gl.group_export_by_account(
+        export_path=tmp_path / "export.xlsx", mapping_path=MAPPING, output_path=tmp_path / "out.xlsx",
+        sheet_name=None, inplace=False, drop_original_titles=["Sheet1", "Sheet2", "Sheet3"],
+        date_columns=["文件日期", "過帳日期"], cutoff_date=date(2025, 6, 30), workers=1,
+        on_stage=lambda name, rows: events.append((name, rows)))
+
+    sheets = [rows for name, rows in events if name == "account sheets"]
+    assert len(sheets) == stats["unique_accounts"]
+    assert sum(sheets) == stats["rows_grouped"]
+    assert [name for name, _ in events if name != "account sheets"] == ["read", "prepare", "說明", "copy sheets", "save"]
+
+
+def test_rerun_reuses_unchanged_account_sheets(tmp_path):
+    frame = make_frame(300, account_codes(4, MAPPING), suppliers=10)
+    export, out = tmp_path / "export.xlsx", tmp_path / "export_grouped.xlsx"
+    args = dict(export_path=export, mapping_path=MAPPING, output_path=out, sheet_name=None, inplace=False,
+                drop_original_titles=["Sheet1", "Sheet2", "Sheet3"], date_columns=["文件日期", "過帳日期"],
+                cutoff_date=date(2025, 6, 30), workers=1)
+    write_xlsx(frame, export)
+    first = group_by_gl.group_export_by_account(**args)
+    assert first["sheets_reused"] == 0 and group_by_gl.grouping_meta_path(out).exists()
+    assert group_by_gl.group_export_by_account(**args)["sheets_reused"] == first["unique_accounts"]
+
+    code = frame["G/L科目"].dropna().iloc[0]
+    frame.loc[frame.index[frame["G/L科目"] == code][0], "以本國貨幣計算之金額"] = 123456   # one account changes
+    write_xlsx(frame, export)
+    assert group_by_gl.group_export_by_account(**args)["sheets_reused"] == first["unique_accounts"] - 1
+
+    out.write_bytes(out.read_bytes())         # output re-saved since: nothing is reused
+    assert group_by_gl.group_export_by_account(**args)["sheets_reused"] == 0
+    assert group_by_gl.group_export_by_account(**args, incremental=False)["sheets_reused"] == 0
+
+
+def test_manifest_defaults_and_duplicate_outputs(tmp_path):
+    (tmp_path / "m.json").write_text(json.dumps({"jobs": [
+        {"export": "a.xlsx", "cutoff": "2025-03-31"},
+        {"export": "a.xlsx", "cutoff": "2025-06-30"},
+        {"export": "sub/b.xlsx", "output": "b_out.xlsx", "sheet": "Data"},
+    ]}), encoding="utf-8")
+    jobs = group_by_gl.load_manifest(tmp_path / "m.json")
+
+    root = tmp_path.resolve()
+    assert [(j["n"], j["export"], j["output"]) for j in jobs] == [
+        (1, root / "a.xlsx", root / "a_20250331_grouped.xlsx"),
+        (2, root / "a.xlsx", root / "a_20250630_grouped.xlsx"),
+        (3, root / "sub" / "b.xlsx", root / "b_out.xlsx")]
+    assert jobs[0]["cutoff"] == date(2025, 3, 31) and jobs[2]["cutoff"] == date.today()
+    assert jobs[2]["sheet"] == "Data"
+
+
+@pytest.mark.parametrize("jobs, error", [
+    ([], "non-empty"),
+    ([{"cutoff": "2025-06-30"}], "no 'export'"),
+    ([{"export": "a.xlsx", "cutoff": "30/06/2025"}], "YYYY-MM-DD"),
+    ([{"export": "a.xlsx", "output": "x.xlsx"}, {"export": "b.xlsx", "output": "x.xlsx"}], "used twice"),
+])
+def test_manifest_errors(tmp_path, jobs, error):
+    (tmp_path / "m.json").write_text(json.dumps({"jobs": jobs}), encoding="utf-8")
+    with pytest.raises(ValueError, match=error):
+        group_by_gl.load_manifest(tmp_path / "m.json")
@@ -0,0 +1,134 @@
+"""
+Merge tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import merge_excels
+from merge_excels import RowDeduper, iter_inputs, write_merged_streaming
+from synthetic_export import account_codes, make_frame, write_html, write_xlsx
+
+HERE = Path(__file__).parent
+MAPPING = HERE / "會計科目對照表.xlsx"
+
+
+def test_same_rows_from_xlsx_and_html_are_merged_once(tmp_path):
+    frame = make_frame(200, account_codes(3, MAPPING), suppliers=10)
+    write_xlsx(frame, tmp_path / "export.xlsx")
+    write_html(frame, tmp_path / "export.xls")      # the same period, downloaded as HTML
+    inputs = [(p.name, df) for p, df in iter_inputs([tmp_path / "export.xlsx", tmp_path / "export.xls"],
+                                                    workers=1)]
+    ref_cols = list(inputs[0][1].columns)
+
+    with RowDeduper() as deduper:
+        rows = write_merged_streaming(inputs, ref_cols, tmp_path / "merged.xlsx", deduper=deduper, sidecar=False)
+        assert deduper.dropped["export.xls"] == len(frame)
+    assert rows == len(frame) - deduper.dropped.get("export.xlsx", 0)
+
+
+def test_fingerprint_dates_agree_across_formats():
+    xlsx = pd.DataFrame({"結清日期": [datetime(2016, 3, 23), None], "文件號碼": [2300000001.0, "A"]}, dtype=object)
+    html = pd.DataFrame({"結清日期": ["2016/03/23", None], "文件號碼": ["2300000001", " A "]}, dtype=object)
+    assert merge_excels._normalized_for_fingerprint(xlsx).equals(merge_excels._normalized_for_fingerprint(html))
+
+
+def test_cp950_text_export_with_ascii_head(tmp_path):
+    head = "DocNo\tAmount\tText\n" + "".join(f"{2300000000 + i}\t{i * 10}\tA\n" for i in range(300))
+    assert len(head.encode("ascii")) > 4096
+    path = tmp_path / "export.txt"
+    path.write_bytes((head + "2399999999\t5\t應付帳款\n").encode("cp950"))
+
+    df = merge_excels.read_first_sheet(path)
+    assert len(df) == 301
+    assert df["Text"].iloc[-1] == "應付帳款"
+
+
+HTML_EXPORT = """<html><head><meta charset="utf-8"></head><body>
+<table><tr><td>公司代碼</td><td>1000</td></tr></table>
+<table>
+<thead><tr><th>G/L科目</th><th>文件號碼</th><th colspan="2">金額</th><th>內文</th></tr></thead>
+<tbody>
+<tr><td rowspan="2">11780100</td><td>2300000001</td><td>1,500</td><td>NTD</td><td>first  line
+ wrapped</td></tr>
+<tr><td>2300000002</td><td colspan="2">-20</td><td></td></tr>
+<tr><td>21780101</td><td rowspan="2">2300000003</td><td>7</td><td>NTD</td><td>x</td></tr>
+<tr><td>21780101</td><td>8</td><td>NTD</td></tr>
+</tbody></table>
+</body></html>"""
+
+
+def test_html_export_parses_like_read_html(tmp_path):
+    import io
+    path = tmp_path / "export.xls"
+    path.write_text(HTML_EXPORT, encoding="utf-8")
+
+    rows, pre = merge_excels.stream_widest_table([HTML_EXPORT.encode()[i:i + 50] for i in range(0, 2000, 50)],
+                                                 "utf-8")
+    assert pre is None and len(rows) == 5 and {len(r) for r in rows} == {5}
+    expected = max(pd.read_html(io.StringIO(HTML_EXPORT)), key=lambda t: t.shape[1])
+    got = merge_excels.read_first_sheet(path)
+    assert list(got.columns) == ["G/L科目", "文件號碼", "金額", "金額.1", "內文"]
+    assert got.to_numpy().tolist() == pd.DataFrame(expected.to_numpy()).to_numpy().tolist()
+
+
+def test_html_pre_block_is_read_as_tab_separated(tmp_path):
+    path = tmp_path / "export.xls"
+    path.write_text("<html><body><pre>A\tB\n1\t2\n3\t4\n</pre></body></html>", encoding="utf-8")
+    assert merge_excels.read_first_sheet(path).to_numpy().tolist() == [[1, 2], [3, 4]]
+
+
+@pytest.mark.parametrize("head, kind, encoding, sep", [
+    (b"PK\x03\x04rest", "xlsx", None, None),
+    (b"\xD0\xCF\x11\xE0rest", "xls", None, None),
+    (b"MIME-Version: 1.0\r\nContent-Type: multipart/related", "mhtml", "utf-8-sig", None),
+    ("<html><table><tr><td>科目</td></tr>".encode("cp950"), "html", "cp950", None),
+    (b"\xef\xbb\xbf<?xml version='1.0'?><Workbook xmlns='urn:schemas-microsoft-com:office:spreadsheet'>",
+     "spreadsheetml", "utf-8-sig", None),
+    ("科目\t金額\n1\t2\n".encode("utf-8"), "tsv", "utf-8-sig", "\t"),
+    ("科目,金額\n1,2\n".encode("cp950"), "csv", "cp950", ","),
+    ("A,B\n".encode("utf-16"), "csv", "utf-16", ","),
+])
+def test_sniff_format(head, kind, encoding, sep):
+    assert merge_excels.sniff_format(head) == (kind, encoding, sep)
+
+
+def test_utf8_char_cut_by_the_sniff_window_is_still_utf8():
+    head = ("A" * 4094 + "應").encode("utf-8")[:4096]
+    assert merge_excels.sniff_format(head).encoding == "utf-8-sig"
+
+
+def test_deduper_drops_repeats_within_and_across_chunks_and_spills(tmp_path):
+    df = pd.DataFrame({"文件號碼": [1, 2, 2, 3], "金額": [10.0, 20.0, 20.0, 30.0]})
+    with RowDeduper(memory_budget=2, spill_dir=tmp_path) as deduper:
+        assert deduper.filter(df, "a.xlsx")["文件號碼"].tolist() == [1, 2, 3]
+        assert deduper._runs                                    # 3 fingerprints > budget of 2
+        more = pd.DataFrame({"文件號碼": [3, 4], "金額": [30.0, 40.0]})
+        assert deduper.filter(more, "b.xlsx")["文件號碼"].tolist() == [4]
+        assert deduper.dropped == {"a.xlsx": 1, "b.xlsx": 1}
+    assert list(tmp_path.iterdir()) == []                       # spill runs removed on close
+
+
+def test_merge_store_reuses_unchanged_inputs(tmp_path):
+    codes = account_codes(2, MAPPING)
+    a, b = tmp_path / "a.xlsx", tmp_path / "b.xlsx"
+    frame_a, frame_b = make_frame(30, codes, suppliers=5, seed=1), make_frame(40, codes, suppliers=5, seed=2)
+    write_xlsx(frame_a, a)
+    write_xlsx(frame_b, b)
+    store = merge_excels.MergeStore(tmp_path / "store")
+    ref_cols, cache = store.reference(a)
+
+    assert store.sync([a, b], ref_cols, workers=1, cache=cache) == {"added": 2, "changed": 0, "removed": 0,
+                                                                      "reused": 0}
+    assert [len(df) for _, df in store.frames([a, b])] == [len(frame_a), len(frame_b)]
+
+    store = merge_excels.MergeStore(tmp_path / "store")               # next run, same inputs
+    assert store.reference(a) == (ref_cols, {})
+    assert store.sync([a, b], ref_cols, workers=1)["reused"] == 2
+
+    write_xlsx(make_frame(50, codes, suppliers=5, seed=3), b)
+    assert store.sync([b], ref_cols, workers=1) == {"added": 0, "changed": 1, "removed": 1, "reused": 0}
+    assert [p.name for p in (tmp_path / "store").glob("*.pkl")] == [store.manifest["inputs"][str(b)]["part"]]
@@ -0,0 +1,65 @@
+"""
+Styling tests; run with `python -m pytest -q` from this folder.
+
+The first tests pin down the openpyxl internals sheet_styles.py and
+group_by_gl.py rely on, so an openpyxl upgrade that moves them fails here
+rather than producing broken workbooks.
+"""
+from __future__ import annotations
+from pathlib import Path
+
+import openpyxl
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet._writer import ALL_TEMP_FILES
+
+import sheet_styles
+from sheet_styles import (AMOUNT_STYLE, discard_write_only, named_style_array, new_arial_workbook,
+                          set_style, share_styles)
+
+
+def test_style_tables_are_where_sheet_styles_expects_them():
+    wb = openpyxl.Workbook()
+    for attr in sheet_styles._STYLE_TABLES:
+        assert hasattr(wb, attr), attr
+    assert isinstance(wb._cell_styles, IndexedList) and isinstance(wb._fonts, IndexedList)
+    assert hasattr(wb._fonts, "_dict") and hasattr(wb._fonts, "clean")
+    assert isinstance(wb._named_styles["Normal"].as_tuple(), StyleArray)
+    cell = wb.active["A1"]
+    assert not cell.has_style
+    cell.number_format = "0.00"
+    assert isinstance(cell._style, StyleArray) and cell._style.xfId == 0
+
+
+def test_write_only_sheets_keep_their_temp_file_on_the_writer():
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("s")
+    ws.append([1, 2])
+    out = ws._writer.out
+    assert Path(out).exists() and out in ALL_TEMP_FILES
+    discard_write_only(wb)
+    assert ws.closed and not Path(out).exists()
+
+
+def test_new_arial_workbook_registers_the_shared_styles():
+    wb = new_arial_workbook()
+    assert all(f.name == "Arial" for f in wb._fonts)
+    assert {"Normal", AMOUNT_STYLE} <= set(wb.named_styles)
+    cell = wb.active["A1"]
+    cell.value = 1500
+    set_style(cell, AMOUNT_STYLE)
+    assert cell.style == AMOUNT_STYLE and cell._style == named_style_array(wb, AMOUNT_STYLE)
+
+
+def test_shared_style_tables_round_trip(tmp_path):
+    styled = new_arial_workbook()
+    out = new_arial_workbook(write_only=True)
+    share_styles(out, styled)
+    ws = out.create_sheet("s")
+    cell = openpyxl.cell.WriteOnlyCell(ws, 1500)
+    cell.style = AMOUNT_STYLE
+    ws.append([cell])
+    out.save(tmp_path / "out.xlsx")
+
+    back = openpyxl.load_workbook(tmp_path / "out.xlsx")["s"]["A1"]
+    assert back.value == 1500 and back.style == AMOUNT_STYLE and back.font.name == "Arial"
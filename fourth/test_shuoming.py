@@ -0,0 +1,63 @@
+"""
+說明 rule tests; run with `python -m pytest -q` from this folder.
+"""
+from __future__ import annotations
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from shuoming import load_rules, match_rules, supplier_incidence, supplier_overlap
+
+
+def test_match_rules_filters_each_accounts_rows():
+    codes = pd.Series(["11780100", "12580100", "11780100", "21780101", "11780100"])
+    age = np.array([120, 40, 10, 200, 95])
+    is_open = np.array([True, True, True, False, False])
+    rules = [{"accounts": ["11780100"], "older_than": 90, "uncleared": True},
+             {"accounts": ["21780101", "12580100"]},
+             {"accounts": ["99999999"]}]
+
+    got = match_rules(codes, age, is_open, rules)
+    assert [g.tolist() for g in got] == [[0], [1, 3], []]
+
+
+def test_supplier_overlap_counts_shared_suppliers_per_pair():
+    inc = supplier_incidence(
+        pd.Series(["12580100", "12580100", "12580100", "21780101", "21780101", "22280201", "11780100", None]),
+        pd.Series(["S1", "S2", "S2", "S1", "S2", "S2", None, "S3"]))
+    assert len(inc) == 5                    # repeats, blank suppliers and blank codes left out
+
+    pairs = supplier_overlap(inc, left=["1"], right=["2"])
+    assert pairs[["left", "right", "common"]].to_numpy().tolist() == [["12580100", "21780101", 2],
+                                                                      ["12580100", "22280201", 1]]
+    assert pairs["suppliers"].iloc[0] == ["S1", "S2"]
+    assert supplier_overlap(inc, left=["1"], right=["2"], min_common=2)["right"].tolist() == ["21780101"]
+
+
+def test_supplier_overlap_lists_a_pair_once_when_prefixes_overlap():
+    inc = pd.DataFrame({"code": ["21780101", "22280201"], "supplier": ["S1", "S1"]})
+    assert supplier_overlap(inc, left=["2"], right=["2"])[["left", "right"]].to_numpy().tolist() == [
+        ["21780101", "22280201"]]
+
+
+def test_load_rules_normalizes_and_checks(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"sections": [{
+        "title": "9.",
+        "rules": [{"accounts": {"12580100": "預付費用"}, "older_than": "30"}],
+        "cross_screen": {"left": ["1"], "min_common": 0}}]}), encoding="utf-8")
+    cfg = load_rules(path)
+    sec = cfg["sections"][0]
+    assert sec["rules"][0]["accounts"] == ["12580100"] and sec["rules"][0]["older_than"] == 30
+    assert sec["cross_screen"] == {"left": ["1"], "right": [""], "min_common": 1}
+
+    path.write_text(json.dumps({"sections": [{"title": "x", "rules": [{"older_than": 30}]}]}), encoding="utf-8")
+    with pytest.raises(ValueError, match="no 'accounts'"):
+        load_rules(path)
+
+
+def test_default_rules_screen_with_a_threshold():
+    screens = [sec["cross_screen"] for sec in load_rules()["sections"] if "cross_screen" in sec]
+    assert screens and all(s["min_common"] >= 2 for s in screens)
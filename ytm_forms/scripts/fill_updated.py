@@ -10,6 +10,7 @@ from datetime import datetime
 from copy import copy as copy_style
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.cell_range import CellRange
+from unicodedata import east_asian_width
 
 # Base = ytm_forms/
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -22,6 +23,21 @@ OUTPUT_DIR = PROJECT_ROOT / "ytm_forms" / "data" / "output"
 def ensure_parent(p: Path):
     p.parent.mkdir(parents=True, exist_ok=True)
 
+def display_width(val) -> float:
+    """Approximate Excel width of a value: wide/fullwidth (CJK) characters ≈ 1.7, others 1."""
+    s = str(val)
+    return float(len(s)) if s.isascii() else sum(1.7 if east_asian_width(ch) in ("W", "F") else 1.0 for ch in s)
+
+def fit_column_widths(ws, max_row, padding=2):
+    """Widest value per column over rows 1..max_row, read in one pass, + padding (no clamp)."""
+    widest = [0.0] * ws.max_column
+    for row in ws.iter_rows(min_row=1, max_row=max_row, max_col=ws.max_column, values_only=True):
+        for j, val in enumerate(row):
+            if val is not None:
+                widest[j] = max(widest[j], display_width(val))
+    for j, w in enumerate(widest, start=1):
+        ws.column_dimensions[get_column_letter(j)].width = w + padding
+
 def copy_cell_full(src_cell, dst_cell):
     dst_cell.value = src_cell.value
     dst_cell.number_format = src_cell.number_format
@@ -557,17 +573,7 @@ def prepare_month_structure(wb_or_path, sheet_name=SHEET_NAME, period_yyyymm: st
     ws.delete_cols(9)
     
 
-    for col in range(1, ws.max_column + 1):
-        max_length = 0
-        col_letter = get_column_letter(col)
-        for row in range(1, max_row + 1):
-            val = ws.cell(row, col).value
-            if val is not None:
-                val = str(val)
-                if len(val) > max_length:
-                    max_length = len(val)
-        # add a little padding
-        ws.column_dimensions[col_letter].width = max_length + 2
+    fit_column_widths(ws, max_row)
 
     # --- Column C formulas (差異值) for new month block (A–H) ---
     row = 4